@@ -0,0 +1,332 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Consistency checks: runs pipeline variants that must give the same results offline on a
+synthetic city (see fixtures.py) and compares them. Usage:
+
+    python benchmarks/checks.py                     # run all checks
+    python benchmarks/checks.py --checks "fetch*"   # pick checks (glob patterns)
+    python benchmarks/checks.py --size 10000        # pick the fixture size (number of features)
+"""
+
+import os
+import sys
+import json
+import fnmatch
+import threading
+import argparse
+import warnings
+from typing import Callable, Dict, List, Optional
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shapely
+import prettymaps
+from matplotlib import pyplot as plt
+from matplotlib.colors import to_hex
+from prettymaps.fetch import get_perimeter, PerimeterContext, fetch_layers
+from prettymaps.sources import OverpassSource
+from fixtures import SyntheticSource, CENTER
+
+DEFAULT_SIZE = 3000
+
+# Layers fetched with a single features query in combined mode: 'True' tags, list-valued
+# tags and features matching two layers (forests are both 'green' and 'forest')
+COMBINED_LAYERS = {
+    "building": {"tags": {"building": True}},
+    "green": {
+        "tags": {"leisure": ["park", "garden"], "landuse": ["grass", "forest"]},
+        "columns": True,
+    },
+    "forest": {"tags": {"landuse": "forest", "natural": "wood"}, "columns": True},
+    "parking": {"tags": "amenity"},
+}
+
+
+def compare_fetches(perimeter: PerimeterContext, source) -> List[str]:
+    """
+    Fetch COMBINED_LAYERS from 'source' separately and in combined mode, and compare the
+    rows (and columns) of each layer
+    """
+    fetched = {
+        combined: fetch_layers(
+            perimeter,
+            COMBINED_LAYERS,
+            combined_fetch=combined,
+            source=source,
+        )
+        for combined in [False, True]
+    }
+
+    errors = []
+    for layer in COMBINED_LAYERS:
+        separate, combined = fetched[False][layer], fetched[True][layer]
+        if "error" in separate.attrs or "error" in combined.attrs:
+            errors.append(
+                f"{layer}: failed to fetch "
+                f"({separate.attrs.get('error') or combined.attrs.get('error')!r})"
+            )
+        elif len(separate) == 0:
+            errors.append(f"{layer}: no features (the check would be vacuous)")
+        elif not separate.index.sort_values().equals(combined.index.sort_values()):
+            errors.append(
+                f"{layer}: {len(separate)} rows fetched separately, "
+                f"{len(combined)} in combined mode"
+            )
+        elif sorted(separate.columns) != sorted(combined.columns):
+            errors.append(
+                f"{layer}: columns {sorted(separate.columns)} fetched separately, "
+                f"{sorted(combined.columns)} in combined mode"
+            )
+        elif not shapely.equals(
+            separate.geometry.values, combined.loc[separate.index].geometry.values
+        ).all():
+            errors.append(f"{layer}: geometries differ in combined mode")
+    # Features matching two layers must be in both of them
+    if (
+        len(fetched[True]["green"].index.intersection(fetched[True]["forest"].index))
+        == 0
+    ):
+        errors.append("green, forest: no shared features (the check would be vacuous)")
+    return errors
+
+
+def check_combined_fetch(source: SyntheticSource) -> List[str]:
+    """
+    A combined fetch must return the same rows (and columns) per layer as separate fetches
+    """
+    perimeter = PerimeterContext(
+        get_perimeter(CENTER, radius=source.radius * 0.8, source=source)
+    )
+    return compare_fetches(perimeter, source)
+
+
+def overpass_response(source: SyntheticSource, polygon) -> dict:
+    """
+    Overpass API JSON response holding the fixture's features intersecting 'polygon':
+    tagged nodes for points, and ways (made of untagged nodes) for lines and polygons
+    """
+    gdf = source.gdf.iloc[source.tree.query(polygon, predicate="intersects")]
+    tags = gdf.drop(columns=["geometry", "element_type", "osmid"])
+    elements = []
+    node_id = int(source.gdf["osmid"].max()) + 1
+    for (_, row), geometry, element_type, osmid in zip(
+        tags.iterrows(), gdf.geometry, gdf["element_type"], gdf["osmid"]
+    ):
+        element = dict(type=element_type, id=int(osmid), tags=row.dropna().to_dict())
+        if element_type == "node":
+            element.update(lat=geometry.y, lon=geometry.x)
+        else:
+            coords = (
+                geometry.exterior.coords
+                if geometry.geom_type == "Polygon"
+                else geometry.coords
+            )
+            ids = list(range(node_id, node_id + len(coords)))
+            if geometry.geom_type == "Polygon":
+                # Closed ways end with their first node
+                ids[-1] = ids[0]
+            node_id += len(coords)
+            elements += [
+                dict(type="node", id=i, lat=y, lon=x) for i, (x, y) in zip(ids, coords)
+            ]
+            element["nodes"] = ids
+        elements.append(element)
+    return dict(version=0.6, elements=elements)
+
+
+def check_overpass_combined_fetch(source: SyntheticSource) -> List[str]:
+    """
+    Same as check_combined_fetch(), through osmnx (OverpassSource) against a local stand-in
+    Overpass API serving the fixture, so that osmnx's parsing of the (merged) query results
+    and their splitting into layers are checked too
+    """
+    import osmnx as ox
+
+    perimeter = PerimeterContext(
+        get_perimeter(CENTER, radius=source.radius * 0.4, source=source)
+    )
+    response = json.dumps(
+        overpass_response(source, perimeter.bbox(0).buffer(0.001))
+    ).encode()
+    requests = []
+
+    class OverpassHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            requests.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OverpassHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings = dict(
+        overpass_url=f"http://127.0.0.1:{server.server_port}/api",
+        overpass_rate_limit=False,
+        use_cache=False,
+    )
+    previous = {name: getattr(ox.settings, name) for name in settings}
+    try:
+        for name, value in settings.items():
+            setattr(ox.settings, name, value)
+        errors = compare_fetches(perimeter, OverpassSource())
+    finally:
+        for name, value in previous.items():
+            setattr(ox.settings, name, value)
+        server.shutdown()
+        server.server_close()
+
+    # One request per layer, plus one for the combined fetch
+    if len(requests) != len(COMBINED_LAYERS) + 1:
+        errors.append(
+            f"{len(requests)} Overpass requests, expected {len(COMBINED_LAYERS) + 1}"
+        )
+    return errors
+
+
+# Buildings drawn with a palette, and tile size (in meters) splitting most of them
+PALETTE = ["#ff0000", "#0000ff", "#00ff00"]
+TILE_SIZE = 150
+
+
+def get_fill_colors(ax, gdf) -> Dict[tuple, set]:
+    """
+    Palette colors of the fills drawn onto 'ax' (as patches or collections) for each feature
+    of 'gdf', located by a point of each fill
+    """
+    fills = [
+        (patch.get_path(), patch.get_facecolor())
+        for patch in ax.patches
+        if patch.get_fill()
+    ] + [
+        (path, facecolor)
+        for collection in ax.collections
+        for path, facecolor in zip(
+            collection.get_paths(),
+            list(collection.get_facecolors()) * len(collection.get_paths()),
+        )
+    ]
+    tree = shapely.STRtree(gdf.geometry.values)
+    colors = {}
+    for path, facecolor in fills:
+        color = to_hex(facecolor)
+        if color not in PALETTE:
+            continue
+        point = shapely.Polygon(path.to_polygons()[0]).representative_point()
+        for i in tree.query(point, predicate="intersects"):
+            colors.setdefault(gdf.index[i], set()).add(color)
+    return colors
+
+
+def check_tiled_colors(source: SyntheticSource) -> List[str]:
+    """
+    A tiled render must give each feature the same palette color on every tile, and the same
+    color as an untiled render with the same seed
+    """
+    kwargs = dict(
+        layers={"perimeter": {}, "building": {"tags": {"building": True}}},
+        style={"building": {"palette": PALETTE, "ec": "#000000", "lw": 0.5}},
+        radius=4 * TILE_SIZE,
+        source=source,
+        figsize=(6, 6),
+        dpi=100,
+        credit=False,
+        show=False,
+        seed=3,
+    )
+    untiled = prettymaps.plot(CENTER, **kwargs)
+    gdf = untiled.geodataframes["building"]
+    expected = get_fill_colors(untiled.ax, gdf)
+    plt.close("all")
+
+    errors = []
+    if len(expected) == 0:
+        errors.append("no buildings drawn (the check would be vacuous)")
+    for collections in [False, True]:
+        tiled = prettymaps.plot(
+            CENTER, tile_size=TILE_SIZE, collections=collections, **kwargs
+        )
+        colors = get_fill_colors(tiled.ax, gdf)
+        plt.close("all")
+        name = "tiled" + (" (collections)" if collections else "")
+        split = sum(len(c) > 1 for c in colors.values())
+        if split:
+            errors.append(f"{name}: {split} features drawn with several colors")
+        differ = sum(colors.get(key, c) != c for key, c in expected.items())
+        if differ:
+            errors.append(f"{name}: {differ} features colored unlike the untiled map")
+    return errors
+
+
+CHECKS: Dict[str, Callable[[SyntheticSource], List[str]]] = {
+    "fetch[combined]": check_combined_fetch,
+    "fetch[combined-overpass]": check_overpass_combined_fetch,
+    "plot[tiled-colors]": check_tiled_colors,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Run prettymaps consistency checks on a synthetic OSM fixture"
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=DEFAULT_SIZE,
+        help=f"Fixture size, in number of features (default: {DEFAULT_SIZE})",
+    )
+    parser.add_argument(
+        "--checks",
+        nargs="+",
+        default=None,
+        help="Checks to run, as glob patterns (default: all)",
+    )
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    source = SyntheticSource(args.size)
+    failed = 0
+    for name, check in CHECKS.items():
+        # Square brackets in patterns are literal (as in "fetch[combined]")
+        if args.checks is not None and not any(
+            fnmatch.fnmatchcase(name, p.replace("[", "[[]")) for p in args.checks
+        ):
+            continue
+        # Imports made by checks (such as osmnx's HTTP stack) may reset warning filters
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            errors = check(source)
+        failed += bool(errors)
+        print(f"{name:<36}{'failed' if errors else 'ok'}", file=sys.stderr)
+        for error in errors:
+            print(f"    {error}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+import shapely
+import pandas as pd
+from geopandas import GeoDataFrame
+from shapely.geometry import box
+from prettymaps.sources import (
+    DataSource,
+    NoFeaturesError,
+    filter_tags,
+    filter_custom,
+    parse_tags,
+)
+
+# Synthetic city center (Porto Alegre) and its UTM CRS
+CENTER = (-30.0325, -51.2304)
+CRS = "EPSG:32722"
+
+# City block side (in meters)
+BLOCK = 100
+
+# Tags of the non-building polygons, cycled through blocks (covers the bundled presets' layers)
+AREA_TAGS = [
+    {"leisure": "park"},
+    {"natural": "water"},
+    {"landuse": "forest"},
+    {"landuse": "grass"},
+    {"natural": "beach"},
+    {"amenity": "parking"},
+    {"leisure": "garden"},
+    {"natural": "wood"},
+    {"amenity": "school"},
+    {"leisure": "pitch"},
+]
+
+
+def synthetic_city(n_features: int, seed: int = 0) -> GeoDataFrame:
+    """
+    Generate a synthetic city with about 'n_features' OSM features: a grid of streets
+    (one edge per block side, with a few primary and secondary avenues), a railway and a river
+    crossing it, one building footprint (or park, water, forest, ... area) per block and
+    building entrances (points)
+
+    Args:
+        n_features (int): Approximate number of features
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        GeoDataFrame: Features (in EPSG:4326), indexed like prettymaps.sources.ExtractSource's
+    """
+    rng = np.random.default_rng(seed)
+
+    # Each block adds two street edges, one area and (every other block) one point
+    k = max(2, int(np.sqrt(n_features / 3.5)))
+    center = (
+        GeoDataFrame(geometry=shapely.points([CENTER[::-1]]), crs=4326)
+        .to_crs(CRS)
+        .geometry.iloc[0]
+    )
+    x0, y0 = center.x - k * BLOCK / 2, center.y - k * BLOCK / 2
+    columns = []
+
+    # Streets: horizontal and vertical edges between grid nodes
+    i, j = np.meshgrid(np.arange(k + 1), np.arange(k + 1), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    horizontal = i < k
+    vertical = j < k
+    starts = np.concatenate(
+        [
+            np.stack([i[horizontal], j[horizontal]], 1),
+            np.stack([i[vertical], j[vertical]], 1),
+        ]
+    )
+    ends = starts + np.concatenate(
+        [np.tile([1, 0], (horizontal.sum(), 1)), np.tile([0, 1], (vertical.sum(), 1))]
+    )
+    street_lines = shapely.linestrings(
+        np.stack([starts, ends], 1) * BLOCK + np.array([x0, y0])
+    )
+    line_index = np.where(
+        np.concatenate([np.zeros(horizontal.sum()), np.ones(vertical.sum())]),
+        starts[:, 0],
+        starts[:, 1],
+    )
+    highway = np.where(
+        line_index % 10 == 0,
+        "primary",
+        np.where(
+            line_index % 5 == 0,
+            "secondary",
+            rng.choice(
+                ["residential", "residential", "tertiary", "service"], len(starts)
+            ),
+        ),
+    )
+    columns.append(
+        pd.DataFrame({"geometry": street_lines, "highway": highway, "name": "Street"})
+    )
+
+    # Railway and river (one line each, crossing the whole city)
+    columns.append(
+        pd.DataFrame(
+            {
+                "geometry": [
+                    shapely.LineString(
+                        [(x0, y0 + k * BLOCK / 3), (x0 + k * BLOCK, y0 + k * BLOCK / 2)]
+                    ),
+                    shapely.LineString(
+                        [
+                            (
+                                x0 + k * BLOCK * t,
+                                y0 + k * BLOCK * (0.7 + 0.05 * np.sin(20 * t)),
+                            )
+                            for t in np.linspace(0, 1, 200)
+                        ]
+                    ),
+                ],
+                "railway": ["rail", None],
+                "waterway": [None, "river"],
+            }
+        )
+    )
+
+    # Areas: one building (or other area) per block, slightly jittered
+    bi, bj = np.meshgrid(np.arange(k), np.arange(k), indexing="ij")
+    bi, bj = bi.ravel(), bj.ravel()
+    margin = rng.uniform(10, 30, (len(bi), 2))
+    areas = shapely.box(
+        x0 + bi * BLOCK + margin[:, 0],
+        y0 + bj * BLOCK + margin[:, 1],
+        x0 + (bi + 1) * BLOCK - margin[:, 0],
+        y0 + (bj + 1) * BLOCK - margin[:, 1],
+    )
+    kind = rng.integers(0, 4 * len(AREA_TAGS), len(areas))
+    area_columns = pd.DataFrame({"geometry": areas})
+    area_columns["building"] = np.where(kind >= len(AREA_TAGS), "yes", None)
+    for n, tags in enumerate(AREA_TAGS):
+        for key, value in tags.items():
+            column = area_columns.get(key, pd.Series(None, index=area_columns.index))
+            area_columns[key] = column.where(kind != n, value)
+    columns.append(area_columns)
+
+    # Points: building entrances
+    points = shapely.points(
+        x0 + bi[::2] * BLOCK + BLOCK / 2, y0 + bj[::2] * BLOCK + margin[::2, 1]
+    )
+    columns.append(pd.DataFrame({"geometry": points, "entrance": "yes"}))
+
+    df = pd.concat(columns, ignore_index=True)
+    gdf = GeoDataFrame(df, geometry="geometry", crs=CRS).to_crs(4326)
+    gdf["element_type"] = np.where(gdf.geom_type == "Point", "node", "way")
+    gdf["osmid"] = np.arange(len(gdf))
+    return gdf
+
+
+class SyntheticSource(DataSource):
+    """
+    Offline data source serving a synthetic city (see synthetic_city()). Attributes:
+    - gdf: features (in EPSG:4326)
+    - radius: radius of the city (in meters)
+    """
+
+    def __init__(self, n_features: int, seed: int = 0):
+        self.n_features = n_features
+        self.seed = seed
+        self.gdf = synthetic_city(n_features, seed)
+        self.tree = shapely.STRtree(self.gdf.geometry.values)
+        self.streets = np.flatnonzero(self.gdf["highway"].notna().to_numpy())
+        self.radius = int(np.sqrt(n_features / 3.5)) * BLOCK / 2
+
+    def cache_key(self):
+        return f"{type(self).__name__}:{self.n_features}:{self.seed}"
+
+    def query(self, polygon, positions=None) -> GeoDataFrame:
+        hits = self.tree.query(polygon, predicate="intersects")
+        if positions is not None:
+            hits = np.intersect1d(hits, positions)
+        gdf = self.gdf.iloc[np.sort(hits)]
+        if len(gdf) > 0:
+            gdf = gdf.dropna(axis="columns", how="all")
+        return gdf.set_index(["element_type", "osmid"])
+
+    def graph_edges(self, polygon, custom_filter=None):
+        if custom_filter is None:
+            gdf = self.query(polygon, self.streets)
+        else:
+            gdf = filter_custom(self.query(polygon), custom_filter)
+            gdf = gdf[gdf.geom_type == "LineString"]
+        if len(gdf) == 0:
+            raise NoFeaturesError("No graph edges found")
+        return gdf
+
+    def features(self, polygon, tags):
+        gdf = filter_tags(self.query(polygon), parse_tags(tags))
+        if len(gdf) == 0:
+            raise NoFeaturesError(f"No features matching {tags}")
+        return gdf
+
+    def geocode(self, query):
+        return CENTER
+
+    def geocode_to_gdf(self, query, by_osmid=False, **kwargs):
+        return GeoDataFrame(geometry=[box(*self.gdf.total_bounds)], crs=4326)
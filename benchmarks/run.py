@@ -0,0 +1,494 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Benchmark suite: runs each pipeline stage (and plot() end to end with each bundled preset)
+offline on synthetic cities of several sizes (see fixtures.py), recording time and peak
+memory, and compares results with a stored baseline. Usage:
+
+    python benchmarks/run.py                                  # compare with benchmarks/baseline.json
+    python benchmarks/run.py --sizes 1000 100000 1000000      # pick fixture sizes (number of features)
+    python benchmarks/run.py --stages plot_gdf "plot[*]"      # pick stages (glob patterns)
+    python benchmarks/run.py --save benchmarks/baseline.json  # store a new baseline
+    python benchmarks/run.py --stages import                  # only check 'import prettymaps'
+
+Each benchmark runs in its own (forked) process. Time is the best of '--repeat' runs;
+peak memory is the peak of Python-tracked allocations (numpy arrays included, GEOS
+geometries excluded) during one more run, and max RSS is the process' maximum resident size.
+The 'import' benchmark times 'import prettymaps' in fresh interpreters, and fails if it takes
+longer than IMPORT_BUDGET or loads any of HEAVY_MODULES (which must be imported lazily).
+"""
+
+import io
+import os
+import sys
+import gc
+import json
+import time
+import fnmatch
+import platform
+import argparse
+import resource
+import subprocess
+import warnings
+import tracemalloc
+import multiprocessing
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from matplotlib import pyplot as plt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prettymaps
+from prettymaps.fetch import get_gdf, get_gdfs, get_perimeter, PerimeterContext
+from prettymaps.render import encode_image
+from prettymaps.draw import (
+    transform_gdfs,
+    graph_to_shapely,
+    geometries_to_shapely,
+    PolygonPatch,
+    plot_gdf,
+    presets_directory,
+    read_preset,
+)
+from fixtures import SyntheticSource, CENTER
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+
+# Modules that 'import prettymaps' must not load, and its time budget (in seconds)
+HEAVY_MODULES = [
+    "matplotlib",
+    "pandas",
+    "geopandas",
+    "osmnx",
+    "IPython",
+    "vsketch",
+]
+IMPORT_BUDGET = 0.25
+
+# Style parameters only supported in plotter mode
+PLOTTER_STYLE = {"draw", "stroke", "penWidth"}
+
+WIDTHS = {
+    "primary": 5,
+    "secondary": 4,
+    "tertiary": 3.5,
+    "residential": 3,
+    "service": 2,
+}
+LAYERS = {
+    "streets": {"width": WIDTHS},
+    "building": {"tags": {"building": True}},
+    "green": {"tags": {"leisure": "park", "landuse": "grass"}},
+}
+STYLE = {
+    "streets": {"fc": "#2F3737", "ec": "#475657", "lw": 1, "zorder": 3},
+    "building": {"palette": ["#433633", "#FF5E5B"], "ec": "#2F3737", "lw": 0.5},
+    "green": {"fc": "#8BB174", "ec": "#2F3737", "lw": 1, "zorder": 1},
+}
+
+
+class Benchmark:
+    """
+    A benchmark: 'setup' prepares the (untimed) arguments of 'run' from a fixture context
+    """
+
+    def __init__(self, name: str, setup: Callable, run: Callable):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def get_context(source: SyntheticSource) -> dict:
+    """
+    Shared (untimed) fixture data: perimeter covering the whole city and its layers
+    """
+    perimeter = PerimeterContext(
+        get_perimeter(CENTER, radius=source.radius, source=source)
+    )
+    gdfs = get_gdfs(CENTER, LAYERS, source.radius, 0, source=source)
+    return dict(source=source, perimeter=perimeter, gdfs=gdfs)
+
+
+def new_ax():
+    fig = plt.figure(figsize=(6, 6), dpi=100)
+    ax = plt.subplot(111, aspect="equal")
+    ax.axis("off")
+    return fig, ax
+
+
+def draw_layers(context: dict):
+    fig, ax = new_ax()
+    for layer, gdf in context["gdfs"].items():
+        if layer in STYLE:
+            plot_gdf(
+                layer,
+                gdf,
+                ax,
+                width=LAYERS[layer].get("width"),
+                collections=True,
+                **STYLE[layer],
+            )
+    ax.autoscale()
+    return fig
+
+
+def savefig(fig):
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+
+
+def plot_preset(preset: str, source: SyntheticSource, mode: str = "matplotlib"):
+    result = prettymaps.plot(
+        CENTER,
+        preset=preset,
+        radius=source.radius,
+        source=source,
+        mode=mode,
+        figsize=(6, 6),
+        credit=False,
+        show=True,
+    )
+    if mode == "matplotlib":
+        savefig(result.fig)
+    else:
+        encode_image(result.image)
+
+
+def get_benchmarks() -> List[Benchmark]:
+    benchmarks = [
+        Benchmark(
+            "get_gdf[streets]",
+            lambda c: (c["perimeter"], c["source"]),
+            lambda perimeter, source: get_gdf(
+                "streets", perimeter, width=WIDTHS, source=source
+            ),
+        ),
+        Benchmark(
+            "get_gdf[building]",
+            lambda c: (c["perimeter"], c["source"]),
+            lambda perimeter, source: get_gdf(
+                "building", perimeter, tags={"building": True}, source=source
+            ),
+        ),
+        Benchmark(
+            "transform_gdfs",
+            lambda c: (c["gdfs"],),
+            lambda gdfs: transform_gdfs(gdfs, x=100, y=100, rotation=30),
+        ),
+        Benchmark(
+            "graph_to_shapely",
+            lambda c: (c["gdfs"]["streets"],),
+            lambda gdf: graph_to_shapely(gdf, WIDTHS),
+        ),
+        Benchmark(
+            "geometries_to_shapely",
+            lambda c: (c["gdfs"]["building"],),
+            lambda gdf: geometries_to_shapely(gdf),
+        ),
+        Benchmark(
+            "PolygonPatch",
+            lambda c: (list(c["gdfs"]["building"].geometry),),
+            lambda shapes: [PolygonPatch(shape) for shape in shapes],
+        ),
+        Benchmark(
+            "plot_gdf",
+            lambda c: (c["gdfs"]["building"], new_ax()),
+            lambda gdf, fig_ax: (
+                plot_gdf("building", gdf, fig_ax[1], **STYLE["building"]),
+                plt.close(fig_ax[0]),
+            ),
+        ),
+        Benchmark(
+            "plot_gdf[collections]",
+            lambda c: (c["gdfs"]["building"], new_ax()),
+            lambda gdf, fig_ax: (
+                plot_gdf(
+                    "building", gdf, fig_ax[1], collections=True, **STYLE["building"]
+                ),
+                plt.close(fig_ax[0]),
+            ),
+        ),
+        Benchmark("savefig", lambda c: (draw_layers(c),), savefig),
+    ]
+    for file in sorted(os.listdir(presets_directory())):
+        preset = file.split(".")[0]
+        # Skip presets meant for pen plotters (vsketch style parameters)
+        style = read_preset(preset).get("style", {})
+        if any(PLOTTER_STYLE & set(params) for params in style.values()):
+            continue
+        benchmarks.append(
+            Benchmark(
+                f"plot[{preset}]",
+                lambda c, preset=preset: (preset, c["source"]),
+                plot_preset,
+            )
+        )
+    benchmarks.append(
+        Benchmark(
+            "plot[default:raster]",
+            lambda c: ("default", c["source"], "raster"),
+            plot_preset,
+        )
+    )
+    return benchmarks
+
+
+def measure_import(repeat: int) -> dict:
+    """
+    Time 'import prettymaps' in fresh interpreters (best of 'repeat' runs)
+    """
+    code = (
+        "import sys, json, time; t = time.perf_counter(); import prettymaps; "
+        "t = time.perf_counter() - t; "
+        f"print(json.dumps([t, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        t, loaded = json.loads(output.splitlines()[-1])
+        times.append(t)
+
+    error = None
+    if loaded:
+        error = f"'import prettymaps' loads {', '.join(loaded)}"
+    elif min(times) > IMPORT_BUDGET:
+        error = (
+            f"'import prettymaps' takes {min(times):.3f}s (budget: {IMPORT_BUDGET}s)"
+        )
+    return dict(time=min(times), peak_mb=None, max_rss_mb=None, error=error)
+
+
+# Fixture context of the current size, inherited by forked benchmark processes
+_context = {}
+
+
+def measure(benchmark: Benchmark, repeat: int, queue) -> None:
+    warnings.simplefilter("ignore")
+    try:
+        # Time (best of 'repeat' runs)
+        times = []
+        for _ in range(repeat):
+            args = benchmark.setup(_context)
+            gc.collect()
+            start = time.perf_counter()
+            benchmark.run(*args)
+            times.append(time.perf_counter() - start)
+            del args
+
+        # Peak memory (one more run, traced)
+        args = benchmark.setup(_context)
+        gc.collect()
+        tracemalloc.start()
+        benchmark.run(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            max_rss *= 1024
+        queue.put(
+            dict(
+                time=min(times),
+                peak_mb=peak / 2**20,
+                max_rss_mb=max_rss / 2**20,
+                error=None,
+            )
+        )
+    except Exception as e:
+        queue.put(dict(time=None, peak_mb=None, max_rss_mb=None, error=repr(e)))
+
+
+def run_benchmarks(
+    sizes: List[int],
+    patterns: Optional[List[str]] = None,
+    repeat: int = 3,
+    log=sys.stderr,
+) -> Dict[str, dict]:
+    """
+    Run the benchmarks matching 'patterns' on fixtures of each size
+
+    Returns:
+        Dict[str, dict]: Results, keyed by "<benchmark>@<size>"
+    """
+    ctx = multiprocessing.get_context("fork")
+    benchmarks = [
+        benchmark
+        for benchmark in get_benchmarks()
+        if patterns is None
+        # Square brackets in patterns are literal (as in "plot[default]")
+        or any(
+            fnmatch.fnmatchcase(benchmark.name, p.replace("[", "[[]")) for p in patterns
+        )
+    ]
+
+    results = {}
+    if patterns is None or any(fnmatch.fnmatchcase("import", p) for p in patterns):
+        results["import"] = measure_import(repeat)
+        if log is not None:
+            print(
+                f"{'import':<36}{results['import']['time']:>10.3f}s"
+                + (
+                    f"  failed: {results['import']['error']}"
+                    if results["import"]["error"]
+                    else ""
+                ),
+                file=log,
+                flush=True,
+            )
+
+    for size in sizes if benchmarks else []:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            _context.clear()
+            _context.update(get_context(SyntheticSource(size)))
+        for benchmark in benchmarks:
+            queue = ctx.Queue()
+            process = ctx.Process(target=measure, args=(benchmark, repeat, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            key = f"{benchmark.name}@{size}"
+            results[key] = result
+            if log is not None:
+                print(
+                    f"{key:<36}"
+                    + (
+                        f"{result['time']:>10.3f}s {result['peak_mb']:>10.1f}MB"
+                        if result["error"] is None
+                        else f"  failed: {result['error']}"
+                    ),
+                    file=log,
+                    flush=True,
+                )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25, log=sys.stderr):
+    """
+    Compare results with a baseline
+
+    Returns:
+        List[str]: Regressions (time or peak memory over the baseline by more than 'tolerance')
+    """
+    regressions = []
+    print(
+        f"\n{'benchmark':<36}{'time':>10}{'baseline':>10}{'ratio':>8}"
+        f"{'peak MB':>10}{'baseline':>10}{'ratio':>8}",
+        file=log,
+    )
+    for key, result in results.items():
+        base = baseline["results"].get(key)
+        if base is None or result["error"] is not None or base["error"] is not None:
+            continue
+        row = f"{key:<36}"
+        for metric in ["time", "peak_mb"]:
+            if result[metric] is None or base[metric] is None:
+                row += f"{'-':>10}{'-':>10}{'-':>8}"
+                continue
+            ratio = result[metric] / base[metric] if base[metric] else 1
+            row += f"{result[metric]:>10.3f}{base[metric]:>10.3f}{ratio:>8.2f}"
+            # Ignore regressions below measurement noise
+            noise = 0.01 if metric == "time" else 1
+            if ratio > 1 + tolerance and result[metric] - base[metric] > noise:
+                regressions.append(f"{key} {metric}: x{ratio:.2f}")
+        print(row, file=log)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Run prettymaps benchmarks on synthetic OSM fixtures"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help=f"Fixture sizes, in number of features (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        default=None,
+        help="Benchmarks to run, as glob patterns (default: all)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per benchmark (default: 3)"
+    )
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help="Baseline to compare with (default: benchmarks/baseline.json)",
+    )
+    parser.add_argument("--save", default=None, help="Save results to this file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown (or memory increase) reported as a regression (default: 0.25)",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.stages, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                dict(
+                    created=datetime.now().isoformat(timespec="seconds"),
+                    version=(
+                        prettymaps.__version__
+                        if hasattr(prettymaps, "__version__")
+                        else None
+                    ),
+                    python=platform.python_version(),
+                    machine=platform.platform(),
+                    cpus=os.cpu_count(),
+                    results=results,
+                ),
+                f,
+                indent=2,
+            )
+
+    if args.baseline and os.path.exists(args.baseline) and args.baseline != args.save:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:\n" + "\n".join(regressions), file=sys.stderr)
+            return 1
+
+    return 1 if any(result["error"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,44 @@
-from .draw import plot, multiplot, Subplot, create_preset, delete_preset, preset, presets
+import importlib
+
+# Public API, imported from its submodule on first access: 'import prettymaps' stays fast,
+# and matplotlib, geopandas and osmnx only load once plot() (or another function) is used
+_exports = {
+    "plot": "draw",
+    "multiplot": "draw",
+    "Subplot": "draw",
+    "create_preset": "draw",
+    "delete_preset": "draw",
+    "preset": "draw",
+    "presets": "draw",
+    "add_hook": "tracing",
+    "remove_hook": "tracing",
+}
+
+# Submodules, also imported on first access (as in 'prettymaps.draw.plot_gdf')
+_submodules = [
+    "draw",
+    "fetch",
+    "sources",
+    "cache",
+    "geocode",
+    "tracing",
+    "render",
+    "cli",
+    "server",
+]
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(importlib.import_module(f".{_exports[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    if name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_submodules))
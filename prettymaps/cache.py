@@ -0,0 +1,227 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import pandas as pd
+import geopandas as gp
+from pathlib import Path
+from shapely.ops import unary_union
+from typing import Optional, Union
+
+
+class LayerCache:
+    """
+    Persistent cache of the per-layer GeoDataFrames returned by prettymaps.fetch.get_gdf(),
+    stored as GeoParquet files (one per layer, requires pyarrow). Least recently used
+    entries are evicted once the cache grows beyond 'max_bytes'. Attributes:
+    - directory: cache directory
+    - max_bytes: cache size cap (in bytes)
+    - hits: number of cache hits
+    - misses: number of cache misses
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 2**30):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(
+        self, layer: str, perimeter: gp.GeoDataFrame, params: dict, source: str = ""
+    ) -> str:
+        """
+        Compute the cache key of a layer
+
+        Args:
+            layer (str): Layer name
+            perimeter (gp.GeoDataFrame): Perimeter GeoDataFrame
+            params (dict): Layer parameters affecting the fetched data (tags, custom_filter, perimeter_tolerance, ...)
+            source (str, optional): Data source identifier. Defaults to "".
+
+        Returns:
+            str: Cache key
+        """
+        h = hashlib.sha256()
+        h.update(unary_union(perimeter.geometry).wkb)
+        h.update(str(perimeter.crs).encode())
+        h.update(
+            json.dumps([layer, params, source], sort_keys=True, default=str).encode()
+        )
+        return h.hexdigest()
+
+    def _paths(self, key: str):
+        path = os.path.join(self.directory, key)
+        return f"{path}.parquet", f"{path}.json"
+
+    def get(self, key: str) -> Optional[gp.GeoDataFrame]:
+        """
+        Read a layer from the cache
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Optional[gp.GeoDataFrame]: Cached GeoDataFrame (None if not cached)
+        """
+        parquet_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            gdf = gp.read_parquet(parquet_path)
+            # Mark entry as recently used
+            os.utime(parquet_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Decode columns holding lists or mixed types (such as 'highway' or 'osmid' in street networks)
+        for column in meta["json_columns"]:
+            gdf[column] = gdf[column].map(
+                lambda x: json.loads(x) if isinstance(x, str) else x
+            )
+
+        with self._lock:
+            self.hits += 1
+        return gdf
+
+    def put(self, key: str, gdf: gp.GeoDataFrame) -> None:
+        """
+        Write a layer to the cache, evicting least recently used entries if needed
+
+        Args:
+            key (str): Cache key
+            gdf (gp.GeoDataFrame): GeoDataFrame to be cached
+        """
+        parquet_path, meta_path = self._paths(key)
+
+        # Parquet columns must have a single type: JSON-encode object columns
+        # that hold anything other than strings
+        gdf = gdf.copy()
+        json_columns = []
+        for column in gdf.columns:
+            if column == gdf.geometry.name or gdf[column].dtype != object:
+                continue
+            values = gdf[column].dropna()
+            if not all(isinstance(x, str) for x in values):
+                gdf[column] = gdf[column].map(
+                    lambda x: (
+                        json.dumps(x, default=str) if x is not None and x == x else None
+                    )
+                )
+                json_columns.append(column)
+        # Parquet only stores string column names
+        gdf.columns = [str(c) for c in gdf.columns]
+        # Same for index level names (such as element_type/osmid or u/v/key)
+        gdf.index = gdf.index.set_names(
+            [str(name) if name is not None else None for name in gdf.index.names]
+        )
+
+        # Write to temporary files first so concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        gdf.to_parquet(tmp_path)
+        os.replace(tmp_path, parquet_path)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"json_columns": json_columns}, f)
+        os.replace(tmp_path, meta_path)
+
+        self.evict()
+
+    def entries(self) -> pd.DataFrame:
+        """
+        List cache entries
+
+        Returns:
+            pd.DataFrame: DataFrame with the key, size (in bytes) and last access time of each entry
+        """
+        entries = []
+        for file in os.listdir(self.directory):
+            if not file.endswith(".parquet"):
+                continue
+            key = file[: -len(".parquet")]
+            try:
+                stat = os.stat(os.path.join(self.directory, file))
+                meta_size = os.path.getsize(self._paths(key)[1])
+            except OSError:
+                continue
+            entries.append((key, stat.st_size + meta_size, stat.st_mtime))
+        return pd.DataFrame(entries, columns=["key", "size", "last_access"])
+
+    @property
+    def size(self) -> int:
+        return int(self.entries()["size"].sum())
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache fits in 'max_bytes'
+        """
+        entries = self.entries().sort_values("last_access")
+        total = entries["size"].sum()
+        for key, size in zip(entries["key"], entries["size"]):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset hit/miss counters
+        """
+        for key in self.entries()["key"]:
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self.hits = self.misses = 0
+
+
+# Caches are kept alive so that hit/miss counters accumulate per directory
+_caches = {}
+
+
+def get_cache(
+    cache: Optional[Union[str, Path, LayerCache]] = None,
+) -> Optional[LayerCache]:
+    """
+    Resolve a layer cache
+
+    Args:
+        cache (Optional[Union[str, Path, LayerCache]], optional): None (no cache), a cache directory or a LayerCache object. Defaults to None.
+
+    Returns:
+        Optional[LayerCache]: Layer cache
+    """
+    if cache is None or isinstance(cache, LayerCache):
+        return cache
+    directory = os.path.abspath(cache)
+    if directory not in _caches:
+        _caches[directory] = LayerCache(directory)
+    return _caches[directory]
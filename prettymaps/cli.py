@@ -0,0 +1,446 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+import traceback
+from datetime import datetime
+from typing import Optional, List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Manifest columns (any other plot() parameter goes in 'overrides', as a JSON object)
+MANIFEST_COLUMNS = ["query", "preset", "radius", "overrides", "output"]
+
+# plot() parameters only supported in matplotlib mode: PNG maps using them are not drawn
+# in raster mode (see get_mode())
+MATPLOTLIB_PARAMS = ["lod", "tile_size", "fig", "ax"]
+
+# Drawing modes of batch jobs, and the output formats (file extensions) of each mode
+# (None: any format supported by matplotlib's savefig())
+MODE_FORMATS = {
+    "matplotlib": None,
+    "raster": ["png", "jpg", "jpeg", "tif", "tiff", "webp"],
+    "vector": ["svg", "pdf"],
+}
+
+
+def parse_query(query: str):
+    """
+    Parse a manifest query: "lat, lon" coordinates become a (lat, lon) tuple,
+    anything else (address or OSM id) is kept as a string
+    """
+    match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*", str(query))
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    return query
+
+
+def get_mode(params: dict, format: str) -> str:
+    """
+    Drawing mode of a map rendered to 'format' with plot() parameters 'params': their 'mode'
+    if set, or else 'raster' for PNG maps (drawn straight onto an Agg canvas, which gives the
+    same image as matplotlib mode without creating a figure) that use no MATPLOTLIB_PARAMS,
+    and 'matplotlib' otherwise
+    """
+    if params.get("mode") is not None:
+        return params["mode"]
+    if (format == "png") and not any(params.get(p) for p in MATPLOTLIB_PARAMS):
+        return "raster"
+    return "matplotlib"
+
+
+def read_manifest(path: str) -> List[dict]:
+    """
+    Read a batch manifest: a CSV file or a JSONL file (one JSON object per line)
+    with 'query', 'preset', 'radius', 'overrides' and 'output' fields.
+    Only 'query' and 'output' are mandatory.
+
+    Args:
+        path (str): Manifest path (.csv or .jsonl)
+
+    Returns:
+        List[dict]: Jobs
+    """
+    with open(path, "r", newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs = []
+    for i, row in enumerate(rows):
+        unknown = set(row) - set(MANIFEST_COLUMNS)
+        if unknown:
+            raise ValueError(
+                f"Manifest row {i + 1}: unknown columns {sorted(unknown)} (plot() parameters go in 'overrides')"
+            )
+        if not row.get("query") or not row.get("output"):
+            raise ValueError(
+                f"Manifest row {i + 1}: 'query' and 'output' are mandatory"
+            )
+        overrides = row.get("overrides") or {}
+        if isinstance(overrides, str):
+            overrides = json.loads(overrides)
+        mode = overrides.get("mode")
+        if (mode is not None) and (mode not in MODE_FORMATS):
+            raise ValueError(
+                f"Manifest row {i + 1}: 'mode' must be one of {list(MODE_FORMATS)}"
+            )
+        format = os.path.splitext(row["output"])[1][1:].lower()
+        if (mode is not None) and (MODE_FORMATS[mode] is not None):
+            if format not in MODE_FORMATS[mode]:
+                raise ValueError(
+                    f"Manifest row {i + 1}: {mode} mode only writes {MODE_FORMATS[mode]} files"
+                )
+        radius = row.get("radius")
+        jobs.append(
+            dict(
+                index=i,
+                query=parse_query(row["query"]),
+                preset=row.get("preset") or None,
+                radius=float(radius) if radius not in [None, ""] else None,
+                overrides=overrides,
+                output=row["output"],
+            )
+        )
+    return jobs
+
+
+# Parameters shared by all jobs of a worker, set by init_worker()
+_worker_params = {}
+
+
+def init_worker(params: dict) -> None:
+    """
+    Process pool initializer: import prettymaps (and matplotlib with a non-interactive backend)
+    once per worker, and resolve the shared data source, caches and gazetteer so that they are
+    opened and indexed only once per worker
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    from .sources import get_source
+    from .cache import get_cache
+    from .geocode import get_geocode_cache, get_gazetteer
+
+    get_source(params.get("source"))
+    get_cache(params.get("cache"))
+    get_geocode_cache(params.get("geocode_cache"))
+    get_gazetteer(params.get("gazetteer"))
+
+    _worker_params.clear()
+    _worker_params.update(params)
+
+
+def get_stage_timings(timings) -> dict:
+    """
+    Durations (in seconds) of each stage of a plot, and of each layer within stages
+    (summed over tiles in tiled mode), from its Plot.timings DataFrame
+    """
+    stages = timings[timings["layer"].isna()]
+    layers = timings[timings["layer"].notna()]
+    return dict(
+        stages=stages.groupby("stage", sort=False)["duration"].sum().to_dict(),
+        layers={
+            layer: rows.groupby("stage", sort=False)["duration"].sum().to_dict()
+            for layer, rows in layers.groupby("layer", sort=False)
+        },
+    )
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    Whether an error would happen again if its job were retried: invalid parameters or
+    presets (ValueError, FileNotFoundError), other than failed OpenStreetMap API responses
+    """
+    from osmnx._errors import ResponseStatusCodeError
+
+    return isinstance(error, (ValueError, FileNotFoundError)) and not isinstance(
+        error, ResponseStatusCodeError
+    )
+
+
+def render_job(job: dict, retries: int = 2, retry_delay: float = 5) -> dict:
+    """
+    Render a manifest job, retrying it up to 'retries' times (unless it fails with a
+    permanent error, see is_permanent_error())
+
+    Args:
+        job (dict): Job (as returned by read_manifest())
+        retries (int, optional): Number of retries. Defaults to 2.
+        retry_delay (float, optional): Delay before the first retry (in seconds), doubled after each retry. Defaults to 5.
+
+    Returns:
+        dict: Job report (status, attempts, timings and error). Timings hold the wall-clock
+        'plot', 'save' (except in vector mode) and 'total' durations, and the plot's 'stages' and 'layers' timings
+        (see get_stage_timings())
+    """
+    import matplotlib.image
+    from matplotlib import pyplot as plt
+    from .draw import plot
+
+    report = dict(
+        index=job["index"],
+        query=job["query"],
+        output=job["output"],
+        status="failed",
+        attempts=0,
+        timings={},
+        error=None,
+    )
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        report["attempts"] = attempt + 1
+        result = None
+        try:
+            kwargs = {**_worker_params, **job["overrides"]}
+            if job["preset"] is not None:
+                kwargs["preset"] = job["preset"]
+            if job["radius"] is not None:
+                kwargs["radius"] = job["radius"]
+            mode = get_mode(kwargs, os.path.splitext(job["output"])[1][1:].lower())
+            output_dir = os.path.dirname(os.path.abspath(job["output"]))
+            os.makedirs(output_dir, exist_ok=True)
+
+            # Vector mode writes the output file while drawing
+            t = time.perf_counter()
+            result = plot(
+                job["query"],
+                **{
+                    **kwargs,
+                    "mode": mode,
+                    "save_as": job["output"] if mode == "vector" else None,
+                    "show": True,
+                },
+            )
+            report["timings"]["plot"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            if mode == "raster":
+                matplotlib.image.imsave(
+                    job["output"], result.image, dpi=kwargs.get("dpi", 300)
+                )
+                report["timings"]["save"] = time.perf_counter() - t
+            elif mode == "matplotlib":
+                result.fig.savefig(job["output"])
+                report["timings"]["save"] = time.perf_counter() - t
+            report["timings"].update(get_stage_timings(result.timings))
+
+            report["status"] = "ok"
+            report["error"] = None
+            break
+        except Exception as e:
+            report["error"] = traceback.format_exc()
+            if is_permanent_error(e):
+                break
+            if attempt < retries:
+                time.sleep(retry_delay * 2**attempt)
+        finally:
+            if result is not None and result.fig is not None:
+                plt.close(result.fig)
+            plt.close("all")
+    report["timings"]["total"] = time.perf_counter() - start
+
+    return report
+
+
+def run_batch(
+    jobs: List[dict],
+    workers: Optional[int] = None,
+    retries: int = 2,
+    retry_delay: float = 5,
+    max_tasks_per_child: Optional[int] = None,
+    skip_existing: bool = False,
+    params: dict = {},
+    log=sys.stderr,
+) -> dict:
+    """
+    Render a list of jobs with a pool of warm worker processes
+
+    Args:
+        jobs (List[dict]): Jobs (as returned by read_manifest())
+        workers (Optional[int], optional): Number of worker processes. Defaults to None (number of CPUs).
+        retries (int, optional): Number of retries per job. Defaults to 2.
+        retry_delay (float, optional): Delay before the first retry of a job (in seconds). Defaults to 5.
+        max_tasks_per_child (Optional[int], optional): Replace workers after this many jobs (bounds memory growth). Defaults to None.
+        skip_existing (bool, optional): Whether to skip jobs whose output already exists. Defaults to False.
+        params (dict, optional): plot() parameters shared by all jobs (such as 'source' or 'cache'). Defaults to {}.
+        log (optional): Progress stream. Defaults to sys.stderr.
+
+    Returns:
+        dict: Batch report
+    """
+    started = datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+
+    reports = []
+    todo = []
+    for job in jobs:
+        if skip_existing and os.path.exists(job["output"]):
+            reports.append(
+                dict(
+                    index=job["index"],
+                    query=job["query"],
+                    output=job["output"],
+                    status="skipped",
+                    attempts=0,
+                    timings={},
+                    error=None,
+                )
+            )
+        else:
+            todo.append(job)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(params,),
+        max_tasks_per_child=max_tasks_per_child,
+    ) as executor:
+        futures = {
+            executor.submit(render_job, job, retries, retry_delay): job for job in todo
+        }
+        for n, future in enumerate(as_completed(futures)):
+            job = futures[future]
+            try:
+                report = future.result()
+            except Exception:
+                # Worker crashed (e.g. killed by the OS)
+                report = dict(
+                    index=job["index"],
+                    query=job["query"],
+                    output=job["output"],
+                    status="failed",
+                    attempts=1,
+                    timings={},
+                    error=traceback.format_exc(),
+                )
+            reports.append(report)
+            if log is not None:
+                print(
+                    f"[{n + 1}/{len(todo)}] {report['status']} {report['output']}"
+                    + (
+                        f" ({report['timings']['total']:.1f}s)"
+                        if "total" in report["timings"]
+                        else ""
+                    ),
+                    file=log,
+                    flush=True,
+                )
+
+    reports.sort(key=lambda report: report["index"])
+    return dict(
+        started=started,
+        elapsed=time.perf_counter() - start,
+        workers=workers or os.cpu_count(),
+        jobs=len(reports),
+        ok=sum(report["status"] == "ok" for report in reports),
+        skipped=sum(report["status"] == "skipped" for report in reports),
+        failed=sum(report["status"] == "failed" for report in reports),
+        reports=reports,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="prettymaps",
+        description="Render a batch of prettymaps posters from a manifest (CSV or JSONL file with 'query', 'preset', 'radius', 'overrides' and 'output' fields)",
+    )
+    parser.add_argument("manifest", help="Manifest path (.csv or .jsonl)")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--retries", type=int, default=2, help="Number of retries per job (default: 2)"
+    )
+    parser.add_argument(
+        "--retry-delay",
+        type=float,
+        default=5,
+        help="Delay before the first retry of a job, in seconds, doubled after each retry (default: 5)",
+    )
+    parser.add_argument(
+        "--max-tasks-per-child",
+        type=int,
+        default=None,
+        help="Replace worker processes after this many jobs (default: never)",
+    )
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        help="Skip jobs whose output file already exists",
+    )
+    parser.add_argument(
+        "--report",
+        default="prettymaps-report.json",
+        help="JSON report path (default: prettymaps-report.json)",
+    )
+    parser.add_argument(
+        "--source", default=None, help="Local .osm/.osm.pbf extract to read data from"
+    )
+    parser.add_argument("--cache", default=None, help="Layer cache directory")
+    parser.add_argument(
+        "--geocode-cache", default=None, help="Geocoding cache (SQLite database path)"
+    )
+    parser.add_argument("--gazetteer", default=None, help="Local gazetteer file")
+    args = parser.parse_args(argv)
+
+    jobs = read_manifest(args.manifest)
+    params = {
+        param: value
+        for param, value in dict(
+            source=args.source,
+            cache=args.cache,
+            geocode_cache=args.geocode_cache,
+            gazetteer=args.gazetteer,
+        ).items()
+        if value is not None
+    }
+    report = run_batch(
+        jobs,
+        workers=args.workers,
+        retries=args.retries,
+        retry_delay=args.retry_delay,
+        max_tasks_per_child=args.max_tasks_per_child,
+        skip_existing=args.skip_existing,
+        params=params,
+    )
+    report["manifest"] = os.path.abspath(args.manifest)
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(
+        f"{report['ok']} ok, {report['skipped']} skipped, {report['failed']} failed in {report['elapsed']:.1f}s (report: {args.report})",
+        file=sys.stderr,
+    )
+
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,21 +19,34 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import re
 import os
 import json
+import zlib
 import pathlib
-import warnings
 import matplotlib
+import matplotlib.axes
+import matplotlib.figure
 import numpy as np
-import osmnx as ox
+import shapely
 import shapely.ops
 import pandas as pd
 import geopandas as gp
 import shapely.affinity
 from copy import deepcopy
-from .fetch import get_gdfs
-from dataclasses import dataclass
-from matplotlib import pyplot as plt
+from .tracing import Tracer, get_tracer, count_vertices, count_artists
+from .fetch import (
+    get_gdfs,
+    get_gdfs_merged,
+    project,
+    resolve_source,
+    get_query_perimeter,
+    fetch_layers,
+    PerimeterContext,
+)
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib.colors import hex2color
 from matplotlib.patches import Path, PathPatch
+from matplotlib.collections import PathCollection, LineCollection
+from matplotlib.transforms import Affine2D, Bbox, TransformedBbox
 from shapely.geometry.base import BaseGeometry
 from typing import Optional, Union, Tuple, List, Dict, Any, Iterable
 from shapely.geometry import (
@@ -46,12 +59,22 @@ from shapely.geometry import (
     box,
 )
 
-try:
-    import vsketch
-except:
-    warnings.warn(
-        'Install Vsketch with "pip install git+https://github.com/abey79/vsketch@1.0.0" to enable pen plotter mode.'
-    )
+# matplotlib.pyplot, osmnx and vsketch are imported when first needed, so that importing
+# prettymaps stays fast (see benchmarks/run.py's import-time check)
+
+
+def import_vsketch():
+    """
+    Import vsketch and vpype (only needed in pen plotter mode)
+    """
+    try:
+        import vsketch
+        import vpype
+    except ImportError:
+        raise ImportError(
+            'Install Vsketch with "pip install git+https://github.com/abey79/vsketch@1.0.0" to enable pen plotter mode.'
+        )
+    return vsketch, vpype
 
 
 class Subplot:
@@ -74,22 +97,77 @@ class Plot:
     - fig: A matplotlib figure
     - ax: A matplotlib axis object
     - background: Background layer (shapely object)
+    - geometries: Processed geometry of each layer (reused by plot() when passed as 'backup', see process_layers())
+    - timings: Timing spans of each stage (rows with no layer) and of each layer within the fetch, geometry and draw stages: start and duration (in seconds), feature, vertex and artist counts (see prettymaps.tracing)
+    - image: RGBA image (raster mode only)
     """
 
     geodataframes: Dict[str, gp.GeoDataFrame]
     fig: matplotlib.figure.Figure
     ax: matplotlib.axes.Axes
     background: BaseGeometry
+    geometries: Dict[str, "LayerGeometry"] = field(default_factory=dict)
+    timings: Optional[pd.DataFrame] = None
+    image: Optional[np.ndarray] = None
+
+
+@dataclass
+class LayerGeometry:
+    """
+    Dataclass implementing a processed layer, memoized by prettymaps.plot(). Attributes:
+    - gdf: Layer GeoDataFrame
+    - params: Geometry parameters (width, union, dilate_points, dilate_lines)
+    - geometry: Processed geometry (dilated and united), or (lines, widths) for layers drawn as strokes
+    - lod: Level of detail parameters
+    - simplified: Processed geometry after level of detail (what is actually drawn)
+    - index: Position (in 'gdf') of the feature each shape of 'geometry' comes from (None for united geometries and strokes)
+    - keys: Feature key of each shape of 'simplified' (see feature_keys()), used to pick palette colors from a hash (None for united geometries and strokes)
+    """
+
+    gdf: gp.GeoDataFrame
+    params: dict
+    geometry: Union[BaseGeometry, Tuple[np.ndarray, np.ndarray]]
+    lod: Optional[dict] = None
+    simplified: Optional[Union[BaseGeometry, Tuple[np.ndarray, np.ndarray]]] = None
+    index: Optional[np.ndarray] = None
+    keys: Optional[np.ndarray] = None
+
+
+@dataclass
+class DrawSpec:
+    """
+    Dataclass implementing a layer's style resolved once for drawing (see compile_style()). Attributes:
+    - palette: Palette colors picked from for each shape (when 'fc' is not set)
+    - fc: Face color
+    - hatch_c: Hatch color
+    - kwargs: Style parameters (without 'hatch_c', and without 'fc' when it is a palette)
+    - fill_kwargs: PolygonPatch parameters of polygon fills (except 'fc')
+    - silhouette_kwargs: PolygonPatch parameters of polygon silhouettes
+    - line_kwargs: ax.plot() parameters of lines
+    """
+
+    palette: Optional[List[str]]
+    fc: Optional[str]
+    hatch_c: Optional[str]
+    kwargs: dict
+    fill_kwargs: dict
+    silhouette_kwargs: dict
+    line_kwargs: dict
 
 
 @dataclass
 class Preset:
     """
-    Dataclass implementing a prettymaps Preset object. Attributes:
+    Dataclass implementing a prettymaps Preset object (as returned by load_preset(), shared by
+    all its users and not meant to be modified). Attributes:
     - params: dictionary of prettymaps.plot() parameters
+    - draw_specs: each layer's style, compiled (see compile_style())
+    - mtime: modification time of the preset file when it was read (in nanoseconds)
     """
 
     params: dict
+    draw_specs: Dict[str, DrawSpec] = field(default_factory=dict)
+    mtime: Optional[int] = None
 
     '''
     def _ipython_display_(self):
@@ -143,6 +221,8 @@ def transform_gdfs(
     Returns:
         Dict[str, gp.GeoDataFrame]: dictionary of transformed GeoDataFrames
     """
+    import osmnx as ox
+
     # Project geometries
     gdfs = {
         name: ox.project_gdf(gdf) if len(gdf) > 0 else gdf for name, gdf in gdfs.items()
@@ -165,39 +245,184 @@ def transform_gdfs(
     return gdfs
 
 
-def PolygonPatch(shape: BaseGeometry, **kwargs) -> PathPatch:
+def get_affine(
+    gdfs: Dict[str, gp.GeoDataFrame],
+    x: float = 0,
+    y: float = 0,
+    scale_x: float = 1,
+    scale_y: float = 1,
+    rotation: float = 0,
+) -> Affine2D:
+    """
+    Compute the affine transformation (translation, scale, rotation) applied by transform_gdfs(),
+    to be applied to (projected) geometries at render time instead
+
+    Args:
+        gdfs (Dict[str, gp.GeoDataFrame]): Dictionary of GeoDataFrames
+        x (float, optional): x-axis translation. Defaults to 0.
+        y (float, optional): y-axis translation. Defaults to 0.
+        scale_x (float, optional): x-axis scale. Defaults to 1.
+        scale_y (float, optional): y-axis scale. Defaults to 1.
+        rotation (float, optional): rotation angle (in degrees). Defaults to 0.
+
+    Returns:
+        Affine2D: matplotlib affine transformation
+    """
+    affine = Affine2D().translate(x, y)
+    if (scale_x, scale_y, rotation) != (1, 1, 0) and any(
+        len(gdf) > 0 for gdf in gdfs.values()
+    ):
+        # Scale and rotate around the center of the (translated) layers' bounding box
+        bounds = np.array(
+            [project(gdf).total_bounds for gdf in gdfs.values() if len(gdf) > 0]
+        )
+        cx = (bounds[:, 0].min() + bounds[:, 2].max()) / 2 + x
+        cy = (bounds[:, 1].min() + bounds[:, 3].max()) / 2 + y
+        affine = (
+            affine.translate(-cx, -cy)
+            .scale(scale_x, scale_y)
+            .rotate_deg(rotation)
+            .translate(cx, cy)
+        )
+    return affine
+
+
+def affine_to_shapely(affine: Affine2D) -> List[float]:
+    """
+    Convert a matplotlib affine transformation to shapely.affinity.affine_transform() parameters
+
+    Args:
+        affine (Affine2D): matplotlib affine transformation
+
+    Returns:
+        List[float]: [a, b, d, e, xoff, yoff] affine transformation parameters
+    """
+    (a, b, xoff), (d, e, yoff), _ = affine.get_matrix()
+    return [a, b, d, e, xoff, yoff]
+
+
+def polygons_to_path_data(
+    geometries: Union[BaseGeometry, Iterable[BaseGeometry]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute matplotlib Path vertices and codes for all polygons contained in a
+    geometry (or array of geometries), using vectorized shapely operations
+
+    Args:
+        geometries (Union[BaseGeometry, Iterable[BaseGeometry]]): Shapely geometry or array of geometries. Multi-part geometries and collections are unpacked, non-polygon geometries are ignored
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Path vertices, Path codes and number of vertices coming from each input geometry
+    """
+    geoms = np.array(
+        [geometries] if isinstance(geometries, BaseGeometry) else list(geometries),
+        dtype=object,
+    )
+    n_geoms = len(geoms)
+    index = np.arange(n_geoms)
+
+    # Unpack multi-part geometries and collections in place, keeping track of the input geometry of each part
+    multi_types = [
+        shapely.GeometryType.MULTIPOINT,
+        shapely.GeometryType.MULTILINESTRING,
+        shapely.GeometryType.MULTIPOLYGON,
+        shapely.GeometryType.GEOMETRYCOLLECTION,
+    ]
+    while True:
+        multi = np.isin(shapely.get_type_id(geoms), multi_types)
+        if not multi.any():
+            break
+        counts = np.where(multi, shapely.get_num_geometries(geoms), 1)
+        starts = np.cumsum(counts) - counts
+        parts, parts_index = shapely.get_parts(geoms[multi], return_index=True)
+        # Position of each part within its parent geometry
+        rank = np.arange(len(parts)) - np.searchsorted(parts_index, parts_index)
+        unpacked = np.empty(counts.sum(), dtype=object)
+        unpacked[starts[~multi]] = geoms[~multi]
+        unpacked[starts[multi][parts_index] + rank] = parts
+        geoms, index = unpacked, np.repeat(index, counts)
+
+    # Keep polygons
+    polys = (
+        shapely.get_type_id(geoms) == shapely.GeometryType.POLYGON
+    ) & ~shapely.is_empty(geoms)
+    geoms, index = geoms[polys], index[polys]
+
+    # Get rings (exterior followed by interiors, for each polygon) and their coordinates
+    rings, rings_index = shapely.get_rings(geoms, return_index=True)
+    counts = shapely.get_num_coordinates(rings)
+    vertices = shapely.get_coordinates(rings)
+
+    # Ring coding
+    codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+    ends = np.cumsum(counts)
+    codes[ends - counts] = Path.MOVETO
+    codes[ends - 1] = Path.CLOSEPOLY
+
+    return (
+        vertices,
+        codes,
+        np.bincount(index[rings_index], weights=counts, minlength=n_geoms).astype(int),
+    )
+
+
+def PolygonPatch(
+    shape: Union[BaseGeometry, Iterable[BaseGeometry]], **kwargs
+) -> PathPatch:
     """_summary_
 
     Args:
-        shape (BaseGeometry): Shapely geometry
+        shape (Union[BaseGeometry, Iterable[BaseGeometry]]): Shapely geometry or array of geometries (drawn as a single compound Path)
         kwargs: parameters for matplotlib's PathPatch constructor
 
     Returns:
         PathPatch: matplotlib PatchPatch created from input shapely geometry
     """
-    # Init vertices and codes lists
-    vertices, codes = [], []
-    for geom in shape.geoms if hasattr(shape, "geoms") else [shape]:
-        for poly in geom.geoms if hasattr(geom, "geoms") else [geom]:
-            if type(poly) != Polygon:
-                continue
-            # Get polygon's exterior and interiors
-            exterior = np.array(poly.exterior.xy)
-            interiors = [np.array(interior.xy) for interior in poly.interiors]
-            # Append to vertices and codes lists
-            vertices += [exterior] + interiors
-            codes += list(
-                map(
-                    # Ring coding
-                    lambda p: [Path.MOVETO]
-                    + [Path.LINETO] * (p.shape[1] - 2)
-                    + [Path.CLOSEPOLY],
-                    [exterior] + interiors,
-                )
-            )
+    vertices, codes, _ = polygons_to_path_data(shape)
     # Generate PathPatch
-    return PathPatch(
-        Path(np.concatenate(vertices, 1).T, np.concatenate(codes)), **kwargs
+    return PathPatch(Path(vertices, codes), **kwargs)
+
+
+# plot_gdf() parameters of layers' styles that are not drawing parameters
+GEOMETRY_PARAMS = ["width", "union", "dilate_points", "dilate_lines"]
+
+
+def compile_style(style: dict) -> DrawSpec:
+    """
+    Resolve a layer's style into the parameters of each kind of artist drawn by plot_gdf(),
+    so that drawing a shape involves no dictionary work
+
+    Args:
+        style (dict): Layer style (prettymaps.plot() 'style' parameter of a layer)
+
+    Returns:
+        DrawSpec: Compiled style
+    """
+    kwargs = {k: v for k, v in style.items() if k not in GEOMETRY_PARAMS + ["palette"]}
+    hatch_c = kwargs.pop("hatch_c", None)
+    palette = style.get("palette")
+    if (palette is None) and ("fc" in kwargs) and (type(kwargs["fc"]) != str):
+        palette = kwargs.pop("fc")
+    return DrawSpec(
+        palette=palette,
+        fc=kwargs.get("fc"),
+        hatch_c=hatch_c,
+        kwargs=kwargs,
+        fill_kwargs=dict(
+            lw=0,
+            ec=hatch_c if hatch_c else kwargs.get("ec"),
+            **{k: v for k, v in kwargs.items() if k not in ["lw", "ec", "fc"]},
+        ),
+        silhouette_kwargs=dict(
+            fill=False,
+            **{k: v for k, v in kwargs.items() if k not in ["hatch", "fill"]},
+        ),
+        line_kwargs=dict(
+            c=kwargs.get("ec"),
+            **{
+                k: v for k, v in kwargs.items() if k in ["lw", "ls", "dashes", "zorder"]
+            },
+        ),
     )
 
 
@@ -213,6 +438,16 @@ def plot_gdf(
     union: bool = False,
     dilate_points: Optional[float] = None,
     dilate_lines: Optional[float] = None,
+    collections: bool = False,
+    rng: Optional[np.random.Generator] = None,
+    strokes: bool = False,
+    transform: Optional[Affine2D] = None,
+    simplify_tolerance: Optional[float] = None,
+    min_area: float = 0,
+    geometries: Optional[Union[BaseGeometry, Tuple[np.ndarray, np.ndarray]]] = None,
+    color_seed: Optional[int] = None,
+    spec: Optional[DrawSpec] = None,
+    keys: Optional[np.ndarray] = None,
     **kwargs,
 ) -> None:
     """
@@ -229,84 +464,147 @@ def plot_gdf(
         union (bool, optional): Whether to join geometries. Defaults to False.
         dilate_points (Optional[float], optional): Amount of dilation to be applied to point (1D) geometries. Defaults to None.
         dilate_lines (Optional[float], optional): Amount of dilation to be applied to line (2D) geometries. Defaults to None.
+        collections (bool, optional): Whether to draw the layer as a few matplotlib collections instead of one artist per shape (matplotlib mode only). Defaults to False.
+        rng (Optional[np.random.Generator], optional): Random number generator used to pick palette colors. Defaults to None (numpy's global random state).
+        strokes (bool, optional): Whether to draw street network layers ('streets', 'railway', 'waterway') as stroked lines instead of dilated polygons. Defaults to False.
+        transform (Optional[Affine2D], optional): Affine transformation applied to the (projected) geometries at render time. Defaults to None.
+        simplify_tolerance (Optional[float], optional): Level of detail: geometries are simplified (preserving topology) with this tolerance. Defaults to None.
+        min_area (float, optional): Level of detail: polygons smaller than this area are not drawn. Defaults to 0.
+        geometries (Optional[Union[BaseGeometry, Tuple[np.ndarray, np.ndarray]]], optional): Geometries already processed with the parameters above (skips processing): process_layer()'s output, or graph_to_strokes()'s output when drawing strokes. Defaults to None.
+        color_seed (Optional[int], optional): If provided, palette colors are picked by hashing the feature each shape comes from with this seed (see hash_colors()) instead of using 'rng', so that a feature drawn several times (such as on both sides of a tile border) always gets the same color. Defaults to None.
+        spec (Optional[DrawSpec], optional): Style already compiled from 'palette' and 'kwargs' (see compile_style()), which are then ignored. Defaults to None.
+        keys (Optional[np.ndarray], optional): Feature key of each shape of 'geometries' (LayerGeometry.keys), used with 'color_seed'. Defaults to None (a single key for the whole layer, unless 'geometries' is None: keys are then computed while processing 'gdf').
 
     Raises:
         Exception: _description_
     """
 
-    # Get hatch and hatch_c parameter
-    hatch_c = kwargs.pop("hatch_c") if "hatch_c" in kwargs else None
+    # Resolve style parameters once for the whole layer
+    if spec is None:
+        spec = compile_style({**kwargs, "palette": palette} if palette else kwargs)
+    palette, hatch_c, kwargs = spec.palette, spec.hatch_c, spec.kwargs
 
-    # Convert GDF to shapely geometries
-    geometries = gdf_to_shapely(
-        layer, gdf, width, point_size=dilate_points, line_width=dilate_lines
-    )
+    if rng is None:
+        rng = np.random
 
-    # Unite geometries
-    if union:
-        geometries = shapely.ops.unary_union(GeometryCollection([geometries]))
-
-    if (palette is None) and ("fc" in kwargs) and (type(kwargs["fc"]) != str):
-        palette = kwargs.pop("fc")
+    # Artists' transform (matplotlib mode) or geometry transform (plotter mode)
+    if mode == "matplotlib":
+        artist_transform = (
+            transform + ax.transData if transform is not None else ax.transData
+        )
+    elif transform is not None:
+        shapely_transform = affine_to_shapely(transform)
+
+    # Draw street networks as strokes (skipping dilation and union)
+    if strokes and (layer in ["streets", "railway", "waterway"]):
+        if palette and (color_seed is not None):
+            kwargs = {
+                **kwargs,
+                "fc": palette[zlib.crc32(layer.encode(), color_seed) % len(palette)],
+            }
+        elif palette:
+            kwargs = {**kwargs, "fc": rng.choice(palette)}
+        if geometries is not None:
+            lines, widths = geometries
+        else:
+            lines, widths = graph_to_strokes(gdf, width)
+            if simplify_tolerance:
+                lines = shapely.simplify(
+                    lines, simplify_tolerance, preserve_topology=True
+                )
+        if mode == "matplotlib":
+            plot_strokes(lines, widths, ax, transform=artist_transform, **kwargs)
+        elif mode == "plotter":
+            if transform is not None:
+                lines = np.array(
+                    [
+                        shapely.affinity.affine_transform(line, shapely_transform)
+                        for line in lines
+                    ],
+                    dtype=object,
+                )
+                widths = widths * np.sqrt(
+                    np.abs(np.linalg.det(transform.get_matrix()[:2, :2]))
+                )
+            plot_strokes_vsketch(lines, widths, vsk, **kwargs)
+        else:
+            raise Exception(f"Unknown mode {mode}")
+        return
+
+    # Process GDF into shapely geometries
+    if geometries is None:
+        geometries, index = process_layer(
+            layer,
+            gdf,
+            width=width,
+            union=union,
+            dilate_points=dilate_points,
+            dilate_lines=dilate_lines,
+            simplify_tolerance=simplify_tolerance,
+            min_area=min_area,
+            return_index=True,
+        )
+        keys = feature_keys(gdf)[index] if index is not None else None
+
+    # Transform geometries (plotter mode)
+    if (mode == "plotter") and (transform is not None):
+        geometries = shapely.affinity.affine_transform(geometries, shapely_transform)
+
+    if (mode == "matplotlib") and collections:
+        plot_collections(
+            geometries,
+            ax,
+            palette=palette,
+            hatch_c=hatch_c,
+            rng=rng,
+            transform=artist_transform,
+            color_seed=color_seed,
+            keys=shape_keys(layer, keys, len(getattr(geometries, "geoms", [None]))),
+            **kwargs,
+        )
+        return
 
-    for shape in geometries.geoms if hasattr(geometries, "geoms") else [geometries]:
+    shapes = list(geometries.geoms) if hasattr(geometries, "geoms") else [geometries]
+    colors = (
+        hash_colors(shape_keys(layer, keys, len(shapes)), palette, color_seed)
+        if palette and (color_seed is not None) and ("fc" not in kwargs)
+        else None
+    )
+    for i, shape in enumerate(shapes):
         if mode == "matplotlib":
             if type(shape) in [Polygon, MultiPolygon]:
                 # Plot main shape (without silhouette)
                 ax.add_patch(
                     PolygonPatch(
                         shape,
-                        lw=0,
-                        ec=(
-                            hatch_c
-                            if hatch_c
-                            else kwargs["ec"] if "ec" in kwargs else None
-                        ),
                         fc=(
-                            kwargs["fc"]
+                            spec.fc
                             if "fc" in kwargs
-                            else np.random.choice(palette) if palette else None
+                            else (
+                                (
+                                    colors[i]
+                                    if colors is not None
+                                    else rng.choice(palette)
+                                )
+                                if palette
+                                else None
+                            )
                         ),
-                        **{
-                            k: v
-                            for k, v in kwargs.items()
-                            if k not in ["lw", "ec", "fc"]
-                        },
+                        **spec.fill_kwargs,
+                        transform=artist_transform,
                     ),
                 )
                 # Plot just silhouette
                 ax.add_patch(
                     PolygonPatch(
-                        shape,
-                        fill=False,
-                        **{
-                            k: v
-                            for k, v in kwargs.items()
-                            if k not in ["hatch", "fill"]
-                        },
+                        shape, **spec.silhouette_kwargs, transform=artist_transform
                     )
                 )
             elif type(shape) == LineString:
-                ax.plot(
-                    *shape.xy,
-                    c=kwargs["ec"] if "ec" in kwargs else None,
-                    **{
-                        k: v
-                        for k, v in kwargs.items()
-                        if k in ["lw", "ls", "dashes", "zorder"]
-                    },
-                )
+                ax.plot(*shape.xy, **spec.line_kwargs, transform=artist_transform)
             elif type(shape) == MultiLineString:
                 for c in shape.geoms:
-                    ax.plot(
-                        *c.xy,
-                        c=kwargs["ec"] if "ec" in kwargs else None,
-                        **{
-                            k: v
-                            for k, v in kwargs.items()
-                            if k in ["lw", "lt", "dashes", "zorder"]
-                        },
-                    )
+                    ax.plot(*c.xy, **spec.line_kwargs, transform=artist_transform)
         elif mode == "plotter":
             if ("draw" not in kwargs) or kwargs["draw"]:
 
@@ -332,9 +630,290 @@ def plot_gdf(
             raise Exception(f"Unknown mode {mode}")
 
 
+def feature_keys(gdf: gp.GeoDataFrame) -> np.ndarray:
+    """
+    Key identifying each feature of a GeoDataFrame: a hash of its index ((element_type, osmid)
+    for OSM features), which does not depend on how the feature was clipped
+
+    Args:
+        gdf (gp.GeoDataFrame): GeoDataFrame
+
+    Returns:
+        np.ndarray: Key of each feature (uint64)
+    """
+    return pd.util.hash_pandas_object(gdf.index, index=False).to_numpy()
+
+
+def shape_keys(layer: str, keys: Optional[np.ndarray], n: int) -> np.ndarray:
+    """
+    Feature key of each of a layer's 'n' shapes: 'keys' if provided, or else (for united
+    geometries, whose shapes come from no feature in particular) a key of the layer
+    """
+    if keys is not None:
+        return keys
+    return np.full(n, zlib.crc32(layer.encode()), dtype=np.uint64)
+
+
+def hash_colors(keys: np.ndarray, palette: List[str], seed: int = 0) -> List[str]:
+    """
+    Pick a palette color for each shape from a hash of the key of the feature it comes from
+    (see feature_keys()), so that a feature always gets the same color, however it is clipped
+    (such as on both sides of a tile border)
+
+    Args:
+        keys (np.ndarray): Feature key of each shape
+        palette (List[str]): Color palette
+        seed (int, optional): Hash seed. Defaults to 0.
+
+    Returns:
+        List[str]: Color of each shape
+    """
+    return [
+        palette[zlib.crc32(key.tobytes(), seed) % len(palette)]
+        for key in np.asarray(keys, dtype=np.uint64)
+    ]
+
+
+def plot_collections(
+    geometries: BaseGeometry,
+    ax: matplotlib.axes.Axes,
+    palette: Optional[List[str]] = None,
+    hatch_c: Optional[str] = None,
+    rng: Optional[np.random.Generator] = None,
+    transform: Optional[matplotlib.transforms.Transform] = None,
+    color_seed: Optional[int] = None,
+    keys: Optional[np.ndarray] = None,
+    **kwargs,
+) -> None:
+    """
+    Plot a layer's shapely geometries using a few matplotlib collections
+    (polygon fills, polygon silhouettes and lines) instead of one artist per shape.
+    Produces the same output as plot_gdf()'s default matplotlib mode, except that
+    overlapping shapes with the same zorder have all their fills drawn before their silhouettes.
+
+    Args:
+        geometries (BaseGeometry): Layer geometries
+        ax (matplotlib.axes.Axes): matplotlib axis object
+        palette (Optional[List[str]], optional): Color palette. Defaults to None.
+        hatch_c (Optional[str], optional): Hatch color. Defaults to None.
+        rng (Optional[np.random.Generator], optional): Random number generator used to pick palette colors. Defaults to None (numpy's global random state).
+        transform (Optional[matplotlib.transforms.Transform], optional): Artists' transform. Defaults to None (ax.transData).
+        color_seed (Optional[int], optional): If provided, palette colors are picked by hashing the 'keys' of shapes with this seed (see hash_colors()) instead of using 'rng'. Defaults to None.
+        keys (Optional[np.ndarray], optional): Feature key of each shape (see shape_keys()), mandatory if 'color_seed' is provided. Defaults to None.
+        kwargs: matplotlib style parameters
+    """
+
+    if rng is None:
+        rng = np.random
+    if transform is None:
+        transform = ax.transData
+
+    shapes = np.array(
+        list(geometries.geoms) if hasattr(geometries, "geoms") else [geometries],
+        dtype=object,
+    )
+    type_ids = shapely.get_type_id(shapes)
+
+    # Polygons: one Path per shape, drawn by two collections (fill and silhouette)
+    is_polygon = np.isin(
+        type_ids, [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON]
+    )
+    polygons = shapes[is_polygon]
+    if len(polygons) > 0:
+        vertices, codes, counts = polygons_to_path_data(polygons)
+        splits = np.cumsum(counts)[:-1]
+        paths = [
+            Path(v, c)
+            for v, c in zip(np.split(vertices, splits), np.split(codes, splits))
+        ]
+
+        # Plot main shapes (without silhouette)
+        if ("fill" in kwargs) and not kwargs["fill"]:
+            facecolors = "none"
+        elif "fc" in kwargs:
+            facecolors = kwargs["fc"]
+        elif palette and (color_seed is not None):
+            facecolors = hash_colors(keys[is_polygon], palette, color_seed)
+        elif palette:
+            facecolors = rng.choice(palette, size=len(paths))
+        else:
+            facecolors = None
+        ax.add_collection(
+            PathCollection(
+                paths,
+                lw=0,
+                ec=hatch_c if hatch_c else kwargs["ec"] if "ec" in kwargs else None,
+                fc=facecolors,
+                **{
+                    k: v
+                    for k, v in kwargs.items()
+                    if k not in ["lw", "ec", "fc", "fill"]
+                },
+                transform=transform,
+            )
+        )
+        # Plot just silhouettes
+        ax.add_collection(
+            PathCollection(
+                paths,
+                fc="none",
+                **{k: v for k, v in kwargs.items() if k not in ["hatch", "fill", "fc"]},
+                transform=transform,
+            )
+        )
+
+    # Lines: a single LineCollection
+    lines = shapes[type_ids == shapely.GeometryType.LINESTRING]
+    multilines = shapes[type_ids == shapely.GeometryType.MULTILINESTRING]
+    lines = np.concatenate([lines, shapely.get_parts(multilines)])
+    if len(lines) > 0:
+        coords, index = shapely.get_coordinates(lines, return_index=True)
+        splits = np.flatnonzero(np.diff(index)) + 1
+        line_kwargs = {k: v for k, v in kwargs.items() if k in ["lw", "ls", "zorder"]}
+        if "dashes" in kwargs:
+            line_kwargs["ls"] = (0, kwargs["dashes"])
+        ax.add_collection(
+            LineCollection(
+                np.split(coords, splits),
+                colors=kwargs["ec"] if "ec" in kwargs else None,
+                capstyle=matplotlib.rcParams["lines.solid_capstyle"],
+                joinstyle=matplotlib.rcParams["lines.solid_joinstyle"],
+                transform=transform,
+                **line_kwargs,
+            )
+        )
+
+
 ##########
 
 
+class StrokeCollection(LineCollection):
+    """
+    LineCollection whose line widths are given in data units (plus an optional
+    extra width in points), so that strokes scale with the map like dilated geometries do
+    """
+
+    def __init__(self, segments, data_widths, extra_width: float = 0, **kwargs):
+        super().__init__(segments, **kwargs)
+        self.data_widths = np.asarray(data_widths, dtype=float)
+        self.extra_width = extra_width
+
+    def draw(self, renderer):
+        # Length (in pixels) of one data unit, from the scale of the affine part of the artist's transform
+        matrix = self.get_transform().get_affine().get_matrix()
+        pixels_per_unit = np.sqrt(np.abs(np.linalg.det(matrix[:2, :2])))
+        self.set_linewidths(
+            np.maximum(
+                self.data_widths * pixels_per_unit / renderer.points_to_pixels(1)
+                + self.extra_width,
+                0,
+            )
+        )
+        super().draw(renderer)
+
+
+def plot_strokes(
+    lines: np.ndarray,
+    widths: np.ndarray,
+    ax: matplotlib.axes.Axes,
+    transform: Optional[matplotlib.transforms.Transform] = None,
+    **kwargs,
+) -> None:
+    """
+    Plot street network lines as round-capped strokes, mimicking the appearance of
+    their dilated union: outline strokes (color 'ec', 'lw' points wider than the dilated lines)
+    drawn below fill strokes (color 'fc', 'lw' points narrower, as silhouettes cover half their width inside polygons).
+    Hatches are not supported, and overlapping strokes are not merged (which is noticeable with 'alpha' < 1).
+
+    Args:
+        lines (np.ndarray): LineString geometries
+        widths (np.ndarray): Dilation width of each line (in data units)
+        ax (matplotlib.axes.Axes): matplotlib axis object
+        transform (Optional[matplotlib.transforms.Transform], optional): Artists' transform. Defaults to None (ax.transData).
+        kwargs: matplotlib style parameters
+    """
+
+    if len(lines) == 0:
+        return
+
+    coords, index = shapely.get_coordinates(lines, return_index=True)
+    segments = np.split(coords, np.flatnonzero(np.diff(index)) + 1)
+    stroke_kwargs = dict(
+        capstyle="round",
+        joinstyle="round",
+        transform=transform if transform is not None else ax.transData,
+        **{k: v for k, v in kwargs.items() if k in ["alpha", "zorder"]},
+    )
+
+    # Outline
+    lw = kwargs["lw"] if "lw" in kwargs else matplotlib.rcParams["patch.linewidth"]
+    lw = lw if (("ec" not in kwargs) or (kwargs["ec"] is not None)) else 0
+    if lw:
+        ax.add_collection(
+            StrokeCollection(
+                segments,
+                2 * widths,
+                extra_width=lw,
+                colors=(
+                    kwargs["ec"]
+                    if "ec" in kwargs
+                    else matplotlib.rcParams["patch.edgecolor"]
+                ),
+                **stroke_kwargs,
+            )
+        )
+    # Fill
+    if ("fill" not in kwargs) or kwargs["fill"]:
+        ax.add_collection(
+            StrokeCollection(
+                segments,
+                2 * widths,
+                extra_width=-lw,
+                colors=(
+                    kwargs["fc"]
+                    if "fc" in kwargs
+                    else matplotlib.rcParams["patch.facecolor"]
+                ),
+                **stroke_kwargs,
+            )
+        )
+
+
+def plot_strokes_vsketch(
+    lines: np.ndarray,
+    widths: np.ndarray,
+    vsk,
+    **kwargs,
+) -> None:
+    """
+    Plot street network lines in plotter mode, using thick vsketch strokes
+    (stroke weights are multiples of the pen width)
+
+    Args:
+        lines (np.ndarray): LineString geometries
+        widths (np.ndarray): Dilation width of each line (in data units)
+        vsk (vsketch.Vsketch): Vsketch object
+        kwargs: vsketch style parameters
+    """
+
+    if ("draw" in kwargs) and not kwargs["draw"]:
+        return
+
+    vsk.stroke(kwargs["stroke"] if "stroke" in kwargs else 1)
+    pen_width = kwargs["penWidth"] if "penWidth" in kwargs else 0.3
+    vsk.penWidth(pen_width)
+    vsk.noFill()
+    if isinstance(pen_width, str):
+        _, vpype = import_vsketch()
+        pen_width = vpype.convert_length(pen_width)
+
+    # One stroke weight per street width
+    for width in np.unique(widths):
+        vsk.strokeWeight(max(1, int(round(2 * width / pen_width))))
+        vsk.geometry(MultiLineString(list(lines[widths == width])))
+    vsk.strokeWeight(1)
+
+
 def plot_legends(gdf, ax):
 
     for _, row in gdf.iterrows():
@@ -346,6 +925,35 @@ def plot_legends(gdf, ax):
 ##########
 
 
+def get_widths(
+    gdf: gp.GeoDataFrame, width: Optional[Union[dict, float]] = None
+) -> np.ndarray:
+    """
+    Get the width of each street in a GeoDataFrame containing a graph (street network).
+    If 'width' is a dictionary, each street gets the width of its highway type
+    (the first one with a known width, for streets with multiple highway types)
+
+    Args:
+        gdf (gp.GeoDataFrame): input GeoDataFrame containing graph (street network) geometries
+        width (Optional[Union[dict, float]], optional): Street widths. Either a dictionary (by highway type) or a float. Defaults to None.
+
+    Returns:
+        np.ndarray: Street widths (NaN for streets with unknown width)
+    """
+
+    if type(width) != dict:
+        return np.full(len(gdf), np.nan if width is None else width, dtype=float)
+    if "highway" not in gdf.columns:
+        return np.full(len(gdf), np.nan, dtype=float)
+
+    # One row per (street, highway type) pair
+    highway = pd.Series(gdf["highway"].to_numpy(), dtype=object).explode()
+    # Map highway types to widths and keep the first known width of each street
+    widths = highway.map(width).astype(float).groupby(level=0).first()
+
+    return widths.reindex(range(len(gdf))).to_numpy(dtype=float)
+
+
 def graph_to_shapely(gdf: gp.GeoDataFrame, width: float = 1.0) -> BaseGeometry:
     """
     Given a GeoDataFrame containing a graph (street newtork),
@@ -359,40 +967,64 @@ def graph_to_shapely(gdf: gp.GeoDataFrame, width: float = 1.0) -> BaseGeometry:
         BaseGeometry: Shapely
     """
 
-    def highway_to_width(highway):
-        if (type(highway) == str) and (highway in width):
-            return width[highway]
-        elif isinstance(highway, Iterable):
-            for h in highway:
-                if h in width:
-                    return width[h]
-            return np.nan
-        else:
-            return np.nan
+    # Get the width for each highway type
+    widths = get_widths(gdf, width)
+
+    # Remove rows with inexistent width
+    keep = ~np.isnan(widths)
+    geometries = gdf.geometry.to_numpy()[keep]
 
-    # Annotate GeoDataFrame with the width for each highway type
-    gdf["width"] = gdf.highway.map(highway_to_width) if type(width) == dict else width
+    # Dilate geometries based on their width
+    return shapely.ops.unary_union(
+        shapely.buffer(geometries, widths[keep], quad_segs=16)
+    )
+
+
+def graph_to_strokes(
+    gdf: gp.GeoDataFrame, width: Optional[Union[dict, float]] = 1.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Given a GeoDataFrame containing a graph (street network),
+    get its (projected) line geometries and the width of each one, without dilating them
+
+    Args:
+        gdf (gp.GeoDataFrame): input GeoDataFrame containing graph (street network) geometries
+        width (Optional[Union[dict, float]], optional): Street widths. Either a dictionary or a float. Defaults to 1..
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: LineString geometries and their widths
+    """
+
+    # Project gdf (layers returned by get_gdfs() already are; empty or CRS-less
+    # GeoDataFrames, which cannot be projected, are used as they are)
+    try:
+        gdf = project(gdf)
+    except ValueError:
+        pass
+
+    # Get the width for each highway type
+    widths = get_widths(gdf, width)
 
     # Remove rows with inexistent width
-    gdf.drop(gdf[gdf.width.isna()].index, inplace=True)
-
-    with warnings.catch_warnings():
-        # Supress shapely.errors.ShapelyDeprecationWarning
-        warnings.simplefilter("ignore", shapely.errors.ShapelyDeprecationWarning)
-        if not all(gdf.width.isna()):
-            # Dilate geometries based on their width
-            gdf.geometry = gdf.apply(
-                lambda row: row["geometry"].buffer(row.width), axis=1
-            )
+    keep = ~np.isnan(widths)
+    lines, index = shapely.get_parts(gdf.geometry.to_numpy()[keep], return_index=True)
+    widths = widths[keep][index]
+
+    # Keep non-empty lines
+    keep = np.isin(
+        shapely.get_type_id(lines),
+        [shapely.GeometryType.LINESTRING, shapely.GeometryType.LINEARRING],
+    ) & ~shapely.is_empty(lines)
 
-    return shapely.ops.unary_union(gdf.geometry)
+    return lines[keep], widths[keep]
 
 
 def geometries_to_shapely(
     gdf: gp.GeoDataFrame,
     point_size: Optional[float] = None,
     line_width: Optional[float] = None,
-) -> GeometryCollection:
+    return_index: bool = False,
+) -> Union[GeometryCollection, Tuple[GeometryCollection, np.ndarray]]:
     """
     Convert geometries in GeoDataFrame to shapely format
 
@@ -400,33 +1032,57 @@ def geometries_to_shapely(
         gdf (gp.GeoDataFrame): Input GeoDataFrame
         point_size (Optional[float], optional): Point geometries (1D) will be dilated by this amount. Defaults to None.
         line_width (Optional[float], optional): Line geometries (2D) will be dilated by this amount. Defaults to None.
+        return_index (bool, optional): Whether to also return the position (in 'gdf') of the feature each output geometry comes from. Defaults to False.
 
     Returns:
-        GeometryCollection: Shapely geometries computed from GeoDataFrame geometries
+        Union[GeometryCollection, Tuple[GeometryCollection, np.ndarray]]: Shapely geometries computed from GeoDataFrame geometries (and their feature positions)
     """
 
-    geoms = gdf.geometry.tolist()
-    collections = [x for x in geoms if type(x) == GeometryCollection]
-    points = [x for x in geoms if type(x) == Point] + [
-        y for x in collections for y in x.geoms if type(y) == Point
-    ]
-    lines = [x for x in geoms if type(x) in [LineString, MultiLineString]] + [
-        y
-        for x in collections
-        for y in x.geoms
-        if type(y) in [LineString, MultiLineString]
-    ]
-    polys = [x for x in geoms if type(x) in [Polygon, MultiPolygon]] + [
-        y for x in collections for y in x.geoms if type(y) in [Polygon, MultiPolygon]
-    ]
+    geoms = gdf.geometry.to_numpy()
+    index = np.arange(len(geoms))
+    # Unpack geometry collections (their parts come after the other geometries)
+    collections = shapely.get_type_id(geoms) == shapely.GeometryType.GEOMETRYCOLLECTION
+    parts, parts_index = shapely.get_parts(geoms[collections], return_index=True)
+    geoms = np.concatenate([geoms[~collections], parts])
+    index = np.concatenate([index[~collections], index[collections][parts_index]])
+
+    # Partition geometries by type
+    type_ids = shapely.get_type_id(geoms)
+    is_point = type_ids == shapely.GeometryType.POINT
+    is_line = np.isin(
+        type_ids,
+        [shapely.GeometryType.LINESTRING, shapely.GeometryType.MULTILINESTRING],
+    )
+    is_poly = np.isin(
+        type_ids, [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON]
+    )
+    points, lines, polys = geoms[is_point], geoms[is_line], geoms[is_poly]
 
     # Convert points into circles with radius "point_size"
     if point_size:
-        points = [x.buffer(point_size) for x in points] if point_size > 0 else []
+        points = (
+            shapely.buffer(points, point_size, quad_segs=16)
+            if point_size > 0
+            else points[:0]
+        )
     if line_width:
-        lines = [x.buffer(line_width) for x in lines] if line_width > 0 else []
+        lines = (
+            shapely.buffer(lines, line_width, quad_segs=16)
+            if line_width > 0
+            else lines[:0]
+        )
 
-    return GeometryCollection(list(points) + list(lines) + list(polys))
+    geometries = GeometryCollection(list(np.concatenate([points, lines, polys])))
+    if return_index:
+        index = np.concatenate(
+            [
+                index[is_point][: len(points)],
+                index[is_line][: len(lines)],
+                index[is_poly],
+            ]
+        )
+        return geometries, index
+    return geometries
 
 
 def gdf_to_shapely(
@@ -435,8 +1091,9 @@ def gdf_to_shapely(
     width: Optional[Union[dict, float]] = None,
     point_size: Optional[float] = None,
     line_width: Optional[float] = None,
+    return_index: bool = False,
     **kwargs,
-) -> GeometryCollection:
+) -> Union[GeometryCollection, Tuple[BaseGeometry, Optional[np.ndarray]]]:
     """
     Convert a dict of GeoDataFrames to a dict of shapely geometries
 
@@ -446,25 +1103,252 @@ def gdf_to_shapely(
         width (Optional[Union[dict, float]], optional): Street network width. Can be either a dictionary or a float. Defaults to None.
         point_size (Optional[float], optional): Point geometries (1D) will be dilated by this amount. Defaults to None.
         line_width (Optional[float], optional): Line geometries (2D) will be dilated by this amount. Defaults to None.
+        return_index (bool, optional): Whether to also return the feature position of each output geometry (None for street networks, which are united). Defaults to False.
 
     Returns:
-        GeometryCollection: Output GeoDataFrame
+        Union[GeometryCollection, Tuple[BaseGeometry, Optional[np.ndarray]]]: Output geometries (and their feature positions)
     """
 
     # Project gdf
     try:
-        gdf = ox.project_gdf(gdf)
+        gdf = project(gdf)
     except:
         pass
 
     if layer in ["streets", "railway", "waterway"]:
         geometries = graph_to_shapely(gdf, width)
-    else:
-        geometries = geometries_to_shapely(
-            gdf, point_size=point_size, line_width=line_width
+        return (geometries, None) if return_index else geometries
+    return geometries_to_shapely(
+        gdf, point_size=point_size, line_width=line_width, return_index=return_index
+    )
+
+
+def simplify_geometries(
+    geometries: BaseGeometry,
+    tolerance: float = 0,
+    min_area: float = 0,
+    return_index: bool = False,
+) -> Union[GeometryCollection, Tuple[GeometryCollection, np.ndarray]]:
+    """
+    Reduce the level of detail of a layer's geometries: simplify them (preserving topology)
+    and remove polygons smaller than 'min_area'
+
+    Args:
+        geometries (BaseGeometry): Layer geometries
+        tolerance (float, optional): Simplification tolerance. Defaults to 0.
+        min_area (float, optional): Minimum polygon area. Defaults to 0.
+        return_index (bool, optional): Whether to also return the position (among the parts of 'geometries') of each simplified geometry. Defaults to False.
+
+    Returns:
+        Union[GeometryCollection, Tuple[GeometryCollection, np.ndarray]]: Simplified geometries (and their positions)
+    """
+    shapes = shapely.get_parts(geometries)
+    index = np.arange(len(shapes))
+    # Cull small polygons
+    polys = np.isin(
+        shapely.get_type_id(shapes),
+        [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON],
+    )
+    large = ~(polys & (shapely.area(shapes) < min_area))
+    shapes, index = shapes[large], index[large]
+    # Simplify (Douglas-Peucker is much faster than topology-preserving simplification,
+    # which is only used for the shapes that Douglas-Peucker collapses or invalidates).
+    # Shapes that are not larger than the tolerance are kept as they are
+    if tolerance > 0:
+        bounds = shapely.bounds(shapes)
+        large = (
+            np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+            > tolerance
+        )
+        simplified = shapely.simplify(shapes[large], tolerance, preserve_topology=False)
+        invalid = ~shapely.is_valid(simplified) | shapely.is_empty(simplified)
+        simplified[invalid] = shapely.simplify(
+            shapes[large][invalid], tolerance, preserve_topology=True
         )
+        shapes[large] = simplified
+    keep = ~shapely.is_empty(shapes)
+    geometries = GeometryCollection(list(shapes[keep]))
+    return (geometries, index[keep]) if return_index else geometries
 
-    return geometries
+
+def process_layer(
+    layer: str,
+    gdf: gp.GeoDataFrame,
+    width: Optional[Union[dict, float]] = None,
+    union: bool = False,
+    dilate_points: Optional[float] = None,
+    dilate_lines: Optional[float] = None,
+    simplify_tolerance: Optional[float] = None,
+    min_area: float = 0,
+    return_index: bool = False,
+) -> Union[BaseGeometry, Tuple[BaseGeometry, Optional[np.ndarray]]]:
+    """
+    Process a layer into the shapely geometries to be drawn (dilation, union and level of detail)
+
+    Args:
+        layer (str): Layer name
+        gdf (gp.GeoDataFrame): Layer GeoDataFrame
+        width (Optional[Union[dict, float]], optional): Street widths. Either a dictionary or a float. Defaults to None.
+        union (bool, optional): Whether to join geometries. Defaults to False.
+        dilate_points (Optional[float], optional): Amount of dilation to be applied to point (1D) geometries. Defaults to None.
+        dilate_lines (Optional[float], optional): Amount of dilation to be applied to line (2D) geometries. Defaults to None.
+        simplify_tolerance (Optional[float], optional): Level of detail: simplification tolerance. Defaults to None.
+        min_area (float, optional): Level of detail: polygons smaller than this area are dropped. Defaults to 0.
+        return_index (bool, optional): Whether to also return the position (in 'gdf') of the feature each processed geometry comes from (None when geometries are united). Defaults to False.
+
+    Returns:
+        Union[BaseGeometry, Tuple[BaseGeometry, Optional[np.ndarray]]]: Processed geometries (and their feature positions)
+    """
+
+    # Convert GDF to shapely geometries
+    geometries, index = gdf_to_shapely(
+        layer,
+        gdf,
+        width,
+        point_size=dilate_points,
+        line_width=dilate_lines,
+        return_index=True,
+    )
+
+    # Unite geometries
+    if union:
+        geometries = shapely.ops.unary_union(GeometryCollection([geometries]))
+        index = None
+
+    # Apply level of detail
+    if simplify_tolerance or min_area:
+        geometries, parts = simplify_geometries(
+            geometries,
+            tolerance=simplify_tolerance or 0,
+            min_area=min_area,
+            return_index=True,
+        )
+        index = index[parts] if index is not None else None
+
+    return (geometries, index) if return_index else geometries
+
+
+def process_layers(
+    gdfs: Dict[str, gp.GeoDataFrame],
+    layers: Dict[str, dict],
+    style: Dict[str, dict],
+    strokes: bool = False,
+    lod_kwargs: dict = {},
+    geometries: Dict[str, "LayerGeometry"] = {},
+    tracer: Optional[Tracer] = None,
+) -> Dict[str, "LayerGeometry"]:
+    """
+    Process the layers to be drawn into shapely geometries (see process_layer()), or into lines
+    and widths for street network layers drawn as strokes (see graph_to_strokes()).
+    Results are memoized in two stages, reusing those stored in 'geometries' (as returned by a
+    previous call): a layer is only processed again if its GeoDataFrame or its geometry
+    parameters (width, union, dilate_points, dilate_lines) changed, and only simplified again
+    if its level of detail changed. Style-only changes (fc, ec, hatch, zorder, ...) reuse both.
+
+    Args:
+        gdfs (Dict[str, gp.GeoDataFrame]): Dictionary of GeoDataFrames
+        layers (Dict[str, dict]): prettymaps.plot() 'layers' parameter dict
+        style (Dict[str, dict]): prettymaps.plot() 'style' parameter dict
+        strokes (bool, optional): Whether street network layers are drawn as strokes. Defaults to False.
+        lod_kwargs (dict, optional): Level of detail parameters ('simplify_tolerance' and 'min_area'). Defaults to {}.
+        geometries (Dict[str, LayerGeometry], optional): Previously processed layers. Defaults to {}.
+        tracer (Optional[Tracer], optional): Records a 'geometry' span per layer. Defaults to None.
+
+    Returns:
+        Dict[str, LayerGeometry]: Processed layers
+    """
+
+    tracer = get_tracer(tracer)
+    processed = {}
+    for layer, gdf in gdfs.items():
+        if (layer not in layers) and (layer not in style):
+            continue
+        with tracer.span("geometry", layer) as span:
+            processed[layer] = process_layer_memo(
+                layer, gdf, layers, style, strokes, lod_kwargs, geometries.get(layer)
+            )
+            span["memoized"] = (layer in geometries) and (
+                processed[layer].simplified is geometries[layer].simplified
+            )
+            if tracer.counters:
+                span.update(
+                    features=len(gdf),
+                    vertices=count_vertices(processed[layer].simplified),
+                )
+
+    return processed
+
+
+def process_layer_memo(
+    layer: str,
+    gdf: gp.GeoDataFrame,
+    layers: Dict[str, dict],
+    style: Dict[str, dict],
+    strokes: bool = False,
+    lod_kwargs: dict = {},
+    memo: Optional["LayerGeometry"] = None,
+) -> "LayerGeometry":
+    """
+    Process a layer for process_layers(), reusing 'memo' (its previous result) when possible
+    """
+    layer_style = style[layer] if layer in style else {}
+    width = (
+        layers[layer]["width"]
+        if (layer in layers) and ("width" in layers[layer])
+        else None
+    )
+    as_strokes = strokes and (layer in ["streets", "railway", "waterway"])
+    params = (
+        dict(width=width, strokes=True)
+        if as_strokes
+        else dict(
+            width=width,
+            union=layer_style.get("union", False),
+            dilate_points=layer_style.get("dilate_points"),
+            dilate_lines=layer_style.get("dilate_lines"),
+        )
+    )
+
+    # 1. Geometry (dilation and union)
+    if (memo is None) or (memo.gdf is not gdf) or (memo.params != params):
+        geometry, index = (
+            (graph_to_strokes(gdf, width), None)
+            if as_strokes
+            else process_layer(layer, gdf, **params, return_index=True)
+        )
+        memo = LayerGeometry(gdf, deepcopy(params), geometry, index=index)
+
+    # 2. Level of detail
+    if memo.lod != lod_kwargs:
+        tolerance = lod_kwargs.get("simplify_tolerance")
+        min_area = lod_kwargs.get("min_area", 0)
+        index = memo.index
+        if as_strokes:
+            lines, widths = memo.geometry
+            if tolerance:
+                lines = shapely.simplify(lines, tolerance, preserve_topology=True)
+            simplified = (lines, widths)
+        elif tolerance or min_area:
+            simplified, parts = simplify_geometries(
+                memo.geometry,
+                tolerance=tolerance or 0,
+                min_area=min_area,
+                return_index=True,
+            )
+            index = index[parts] if index is not None else None
+        else:
+            simplified = memo.geometry
+        memo = LayerGeometry(
+            memo.gdf,
+            memo.params,
+            memo.geometry,
+            dict(lod_kwargs),
+            simplified,
+            memo.index,
+            feature_keys(memo.gdf)[index] if index is not None else None,
+        )
+
+    return memo
 
 
 def override_args(
@@ -516,7 +1400,9 @@ def override_params(default_dict: dict, new_dict: dict) -> dict:
 
 
 def create_background(
-    gdfs: Dict[str, gp.GeoDataFrame], style: Dict[str, dict]
+    gdfs: Dict[str, gp.GeoDataFrame],
+    style: Dict[str, dict],
+    transform: Optional[Affine2D] = None,
 ) -> Tuple[BaseGeometry, float, float, float, float, float, float]:
     """
     Create a background layer given a collection of GeoDataFrames
@@ -524,6 +1410,7 @@ def create_background(
     Args:
         gdfs (Dict[str, gp.GeoDataFrame]): Dictionary of GeoDataFrames
         style (Dict[str, dict]): Dictionary of matplotlib style parameters
+        transform (Optional[Affine2D], optional): Affine transformation applied to the (projected) perimeter. Defaults to None.
 
     Returns:
         Tuple[BaseGeometry, float, float, float, float, float, float]: background geometry, bounds, width and height
@@ -532,18 +1419,21 @@ def create_background(
     # Create background
     background_pad = 1.1
     if "background" in style and "pad" in style["background"]:
-        background_pad = style["background"].pop("pad")
+        background_pad = style["background"]["pad"]
 
+    perimeter = shapely.ops.unary_union(project(gdfs["perimeter"]).geometry)
+    if transform is not None:
+        perimeter = shapely.affinity.affine_transform(
+            perimeter, affine_to_shapely(transform)
+        )
     background = shapely.affinity.scale(
-        box(
-            *shapely.ops.unary_union(ox.project_gdf(gdfs["perimeter"]).geometry).bounds
-        ),
+        box(*perimeter.bounds),
         background_pad,
         background_pad,
     )
 
     if "background" in style and "dilate" in style["background"]:
-        background = background.buffer(style["background"].pop("dilate"))
+        background = background.buffer(style["background"]["dilate"])
 
     # Get bounds
     xmin, ymin, xmax, ymax = background.bounds
@@ -552,17 +1442,208 @@ def create_background(
     return background, xmin, ymin, xmax, ymax, dx, dy
 
 
-def draw_text(params: Dict[str, dict], background: BaseGeometry) -> None:
+def get_lod_kwargs(
+    ax: matplotlib.axes.Axes,
+    dx: float,
+    dy: float,
+    transform: Affine2D,
+    min_area: float = 0.1,
+) -> dict:
     """
-    Draw text with content and matplotlib style parameters specified by 'params' dictionary.
-    params['text'] should contain the message to be drawn
+    Level of detail parameters for the output resolution of 'ax': half a pixel simplification
+    tolerance and a minimum polygon area of 'min_area' pixels (in untransformed map units)
 
     Args:
-        params (Dict[str, dict]): matplotlib style parameters for drawing text. params['text'] should contain the message to be drawn.
-        background (BaseGeometry): Background layer
+        ax (matplotlib.axes.Axes): matplotlib axis object
+        dx (float): Width of the drawn area (in transformed map units)
+        dy (float): Height of the drawn area (in transformed map units)
+        transform (Affine2D): Affine transformation applied to the geometries at render time
+        min_area (float, optional): Minimum polygon area (in output pixels). Defaults to 0.1.
+
+    Returns:
+        dict: 'simplify_tolerance' and 'min_area' parameters of process_layer()
     """
-    # Override default osm_credit dict with provided parameters
-    params = override_params(
+    # Ground size of one output pixel
+    width_px, height_px = ax.figure.get_size_inches() * ax.figure.dpi
+    pixel_size = max(dx / width_px, dy / height_px) / np.sqrt(
+        np.abs(np.linalg.det(transform.get_matrix()[:2, :2]))
+    )
+    return dict(simplify_tolerance=pixel_size / 2, min_area=min_area * pixel_size**2)
+
+
+def get_tiles(
+    region: BaseGeometry, transform: Affine2D, tile_size: float
+) -> List[Tuple[BaseGeometry, Bbox]]:
+    """
+    Split 'region' into a grid of square tiles, aligned with the axes once 'transform' is applied
+    (so that each tile can be clipped with a rectangle at render time)
+
+    Args:
+        region (BaseGeometry): Region to be covered (projected)
+        transform (Affine2D): Affine transformation applied to the geometries at render time
+        tile_size (float): Tile side (in untransformed map units)
+
+    Returns:
+        List[Tuple[BaseGeometry, Bbox]]: Tile polygon (in untransformed map units) and clip rectangle (in transformed map units) of each tile intersecting 'region'. Clip rectangles of border tiles extend outwards, so that nothing drawn outside the grid is clipped.
+    """
+    size = tile_size * np.sqrt(np.abs(np.linalg.det(transform.get_matrix()[:2, :2])))
+    inverse = affine_to_shapely(transform.inverted())
+    xmin, ymin, xmax, ymax = shapely.affinity.affine_transform(
+        region, affine_to_shapely(transform)
+    ).bounds
+    nx = max(1, int(np.ceil((xmax - xmin) / size)))
+    ny = max(1, int(np.ceil((ymax - ymin) / size)))
+    far = (xmax - xmin) + (ymax - ymin) + size
+
+    shapely.prepare(region)
+    tiles = []
+    for i in range(nx):
+        for j in range(ny):
+            x0, y0 = xmin + i * size, ymin + j * size
+            x1, y1 = x0 + size, y0 + size
+            tile = shapely.affinity.affine_transform(box(x0, y0, x1, y1), inverse)
+            if not region.intersects(tile):
+                continue
+            clip_box = Bbox(
+                [
+                    [x0 - far if i == 0 else x0, y0 - far if j == 0 else y0],
+                    [x1 + far if i == nx - 1 else x1, y1 + far if j == ny - 1 else y1],
+                ]
+            )
+            tiles.append((tile, clip_box))
+    return tiles
+
+
+def get_max_dilation(layers: Dict[str, dict], style: Dict[str, dict]) -> float:
+    """
+    Largest dilation applied to any geometry (street widths, 'dilate_points' and 'dilate_lines')
+    """
+    dilations = [0]
+    for kwargs in layers.values():
+        width = kwargs.get("width")
+        widths = width.values() if type(width) == dict else [width]
+        dilations += [float(w) for w in widths if w is not None]
+    for kwargs in style.values():
+        dilations += [
+            float(kwargs[param])
+            for param in ["dilate_points", "dilate_lines"]
+            if kwargs.get(param) is not None
+        ]
+    return max(dilations)
+
+
+def plot_tiles(
+    perimeter: PerimeterContext,
+    layers: Dict[str, dict],
+    style: Dict[str, dict],
+    ax: matplotlib.axes.Axes,
+    tile_size: float,
+    transform: Affine2D,
+    postprocessing=None,
+    combined_fetch: bool = False,
+    source=None,
+    cache=None,
+    max_workers: Optional[int] = None,
+    tracer: Optional[Tracer] = None,
+    **kwargs,
+) -> None:
+    """
+    Fetch, process and draw layers one tile at a time, so that only one tile's data is held in
+    memory at once. Each tile's layers are fetched (and dilated) over the tile plus a margin
+    larger than any dilation, and their artists are clipped to the tile, so that tile borders
+    are not visible
+
+    Args:
+        perimeter (PerimeterContext): Plot perimeter
+        layers (Dict[str, dict]): prettymaps.plot() 'layers' parameter dict
+        style (Dict[str, dict]): prettymaps.plot() 'style' parameter dict
+        ax (matplotlib.axes.Axes): matplotlib axis object
+        tile_size (float): Tile side (in map units)
+        transform (Affine2D): Affine transformation applied to the geometries at render time
+        postprocessing (optional): Postprocessing function, applied to each tile's GeoDataFrames. Defaults to None.
+        combined_fetch (bool, optional): Whether to fetch all feature layers with a single query. Defaults to False.
+        source (optional): Data source. Defaults to None.
+        cache (optional): Layer cache. Defaults to None.
+        max_workers (Optional[int], optional): Number of layers fetched at the same time. Defaults to None.
+        tracer (Optional[Tracer], optional): Records 'fetch' and 'draw' spans per layer and tile. Defaults to None.
+        kwargs: plot_gdf() parameters shared by all layers
+    """
+
+    tracer = get_tracer(tracer)
+    layers = {layer: kwargs for layer, kwargs in layers.items() if layer != "perimeter"}
+    tolerance = max(
+        [
+            layer_kwargs.get("perimeter_tolerance", 0)
+            for layer_kwargs in layers.values()
+        ],
+        default=0,
+    )
+    margin = tolerance + 2 * get_max_dilation(layers, style) + 0.05 * tile_size
+
+    for i, (tile, clip_box) in enumerate(
+        get_tiles(perimeter.with_tolerance(tolerance), transform, tile_size)
+    ):
+        region = perimeter.geometry.intersection(
+            tile.buffer(margin, join_style="mitre")
+        )
+        if region.is_empty:
+            continue
+
+        # Fetch tile
+        gdfs = {
+            "perimeter": perimeter.gdf,
+            **fetch_layers(
+                PerimeterContext(gp.GeoDataFrame(geometry=[region], crs=perimeter.crs)),
+                layers,
+                combined_fetch=combined_fetch,
+                source=source,
+                cache=cache,
+                max_workers=max_workers,
+                tracer=tracer,
+            ),
+        }
+        if postprocessing:
+            gdfs = postprocessing(gdfs)
+
+        # Draw tile
+        artists = [ax.patches, ax.lines, ax.collections]
+        counts = [len(artist_list) for artist_list in artists]
+        for layer in gdfs:
+            if layer in layers:
+                with tracer.span("draw", layer, tile=i) as span:
+                    n = count_artists(ax) if tracer.counters else None
+                    plot_gdf(
+                        layer,
+                        gdfs[layer],
+                        ax,
+                        width=(
+                            layers[layer]["width"] if "width" in layers[layer] else None
+                        ),
+                        transform=transform,
+                        **kwargs,
+                        **(style[layer] if layer in style else {}),
+                    )
+                    if tracer.counters:
+                        span.update(
+                            features=len(gdfs[layer]),
+                            vertices=count_vertices(gdfs[layer]),
+                            artists=count_artists(ax) - n,
+                        )
+
+        # Clip the tile's artists to the tile
+        for artist_list, count in zip(artists, counts):
+            for artist in artist_list[count:]:
+                artist.set_clip_box(TransformedBbox(clip_box, ax.transData))
+
+        # Free the tile's data
+        del gdfs
+
+
+def get_credit_params(params: Dict[str, dict]) -> Dict[str, dict]:
+    """
+    Override the default credit message parameters with 'params'
+    """
+    return override_params(
         dict(
             text="\n".join(
                 [
@@ -579,6 +1660,21 @@ def draw_text(params: Dict[str, dict], background: BaseGeometry) -> None:
         ),
         params,
     )
+
+
+def draw_text(params: Dict[str, dict], background: BaseGeometry) -> None:
+    """
+    Draw text with content and matplotlib style parameters specified by 'params' dictionary.
+    params['text'] should contain the message to be drawn
+
+    Args:
+        params (Dict[str, dict]): matplotlib style parameters for drawing text. params['text'] should contain the message to be drawn.
+        background (BaseGeometry): Background layer
+    """
+    from matplotlib import pyplot as plt
+
+    # Override default osm_credit dict with provided parameters
+    params = get_credit_params(params)
     x, y, text = [params.pop(k) for k in ["x", "y", "text"]]
 
     # Get background bounds
@@ -632,6 +1728,83 @@ def create_preset(
         )
 
 
+# Compiled presets, by path (see load_preset())
+_presets = {}
+
+
+def validate_preset(params: dict, name: str = "preset") -> None:
+    """
+    Validate a preset's parameters
+
+    Args:
+        params (dict): Preset parameters
+        name (str, optional): Preset name (for error messages). Defaults to "preset".
+
+    Raises:
+        ValueError: Invalid preset
+    """
+    if not isinstance(params, dict):
+        raise ValueError(f"Preset '{name}' must be a JSON object")
+    unknown = set(params) - {"layers", "style", "circle", "radius", "dilate"}
+    if unknown:
+        raise ValueError(f"Preset '{name}' has unknown parameters {sorted(unknown)}")
+    for param in ["layers", "style"]:
+        value = params.get(param) or {}
+        if not isinstance(value, dict):
+            raise ValueError(f"Preset '{name}': '{param}' must be a JSON object")
+        for layer, kwargs in value.items():
+            if not (
+                isinstance(kwargs, dict) or (param == "layers" and kwargs == False)
+            ):
+                raise ValueError(
+                    f"Preset '{name}': '{param}' of layer '{layer}' must be a JSON object"
+                )
+    for layer, kwargs in (params.get("style") or {}).items():
+        palette = kwargs.get("palette")
+        if palette is not None and not (
+            isinstance(palette, list) and all(isinstance(c, str) for c in palette)
+        ):
+            raise ValueError(
+                f"Preset '{name}': 'palette' of layer '{layer}' must be a list of colors"
+            )
+    if params.get("circle") not in [None, True, False]:
+        raise ValueError(f"Preset '{name}': 'circle' must be a boolean")
+    for param in ["radius", "dilate"]:
+        if not isinstance(params.get(param), (type(None), bool, int, float)):
+            raise ValueError(f"Preset '{name}': '{param}' must be a number")
+
+
+def load_preset(name: str) -> Preset:
+    """
+    Load a preset from the presets folder (prettymaps/presets/): read, validated and compiled
+    once, and read again only when its file changes
+
+    Args:
+        name (str): Preset name
+
+    Returns:
+        Preset: Compiled preset (shared, not to be modified)
+    """
+    path = os.path.join(presets_directory(), f"{name}.json")
+    mtime = os.stat(path).st_mtime_ns
+    compiled = _presets.get(path)
+    if (compiled is None) or (compiled.mtime != mtime):
+        with open(path, "r") as f:
+            # Load params from JSON file
+            params = json.load(f)
+        validate_preset(params, name)
+        compiled = Preset(
+            params,
+            {
+                layer: compile_style(style)
+                for layer, style in (params.get("style") or {}).items()
+            },
+            mtime,
+        )
+        _presets[path] = compiled
+    return compiled
+
+
 def read_preset(name: str) -> Dict[str, dict]:
     """
     Read a preset from the presets folder (prettymaps/presets/)
@@ -642,11 +1815,7 @@ def read_preset(name: str) -> Dict[str, dict]:
     Returns:
         (Dict[str,dict]): parameters dictionary
     """
-    path = os.path.join(presets_directory(), f"{name}.json")
-    with open(path, "r") as f:
-        # Load params from JSON file
-        params = json.load(f)
-    return params
+    return deepcopy(load_preset(name).params)
 
 
 def delete_preset(name: str) -> None:
@@ -660,6 +1829,7 @@ def delete_preset(name: str) -> None:
     path = os.path.join(presets_directory(), f"{name}.json")
     if os.path.exists(path):
         os.remove(path)
+    _presets.pop(path, None)
 
 
 def override_preset(
@@ -691,7 +1861,7 @@ def override_preset(
         Tuple[dict, dict, Optional[float], Optional[Union[float, bool]], Optional[Union[float, bool]]]: Preset parameters overriden by additional provided parameters
     """
 
-    params = read_preset(name)
+    params = load_preset(name).params
 
     # Override preset with kwargs
     if "layers" in params:
@@ -789,10 +1959,24 @@ def presets():
 
 
 def preset(name):
-    with open(os.path.join(presets_directory(), f"{name}.json"), "r") as f:
-        # Load params from JSON file
-        params = json.load(f)
-        return Preset(params)
+    return load_preset(name)
+
+
+def get_draw_specs(style: Dict[str, dict], preset: Optional[Preset] = None):
+    """
+    Compile each layer's style (see compile_style()), reusing the preset's compiled styles
+    for layers whose style was not overridden
+    """
+    return {
+        layer: (
+            preset.draw_specs[layer]
+            if (preset is not None)
+            and (layer in preset.draw_specs)
+            and (layer_style == preset.params["style"][layer])
+            else compile_style(layer_style)
+        )
+        for layer, layer_style in style.items()
+    }
 
 
 # Plot
@@ -823,6 +2007,17 @@ def plot(
     radius=None,
     # Dilate boundary by this much
     dilate=None,
+    # Whether to fetch all feature layers with a single OSM query
+    combined_fetch=False,
+    # Data source: None (OpenStreetMap APIs), path to a local .osm/.osm.pbf extract or a DataSource object
+    source=None,
+    # Persistent layer cache: a directory or a prettymaps.cache.LayerCache object
+    cache=None,
+    # Number of layers fetched at the same time
+    max_workers=None,
+    # Persistent geocoding cache (SQLite database path) and local gazetteer file
+    geocode_cache=None,
+    gazetteer=None,
     # Whether to save result
     save_as=None,
     # Figure parameters
@@ -830,11 +2025,26 @@ def plot(
     ax=None,
     title=None,
     figsize=(12, 12),
+    dpi=300,
     constrained_layout=True,
     # Credit message parameters
     credit={},
-    # Mode ('matplotlib' or 'plotter')
+    # Mode ('matplotlib', 'plotter', 'vector' or 'raster')
     mode="matplotlib",
+    # Whether to draw each layer as a few matplotlib collections instead of one artist per shape
+    collections=False,
+    # Random seed for palette colors
+    seed=None,
+    # Whether to draw street network layers as strokes instead of dilated polygons
+    stroke_streets=False,
+    # Level of detail: simplify geometries to the output resolution and cull features
+    # smaller than 'lod_min_area' pixels
+    lod=False,
+    lod_min_area=0.1,
+    # Tiled mode: fetch and draw layers one square tile of this side (in meters) at a time
+    tile_size=None,
+    # Hook called with each timing span as soon as it ends (see prettymaps.tracing)
+    trace=None,
     # Multiplot mode
     multiplot=False,
     # Whether to display matplotlib
@@ -854,14 +2064,26 @@ def plot(
     ----------
     query : string
         The address to geocode and use as the central point around which to get the geometries
-    backup : dict
-        (Optional) feed the output from a previous 'plot()' run to save time
+    backup : Plot
+        (Optional) feed the output from a previous 'plot()' run to save time (its GeoDataFrames are reused, and so are its processed layers unless their processing parameters changed)
     postprocessing: function
         (Optional) Apply a postprocessing step to the 'layers' dict
+    combined_fetch: bool
+        (Optional) If True, merge the tags of all feature layers into a single OSM query and split the result locally
+    source: string or DataSource
+        (Optional) Where to read OSM data from. Either None (OpenStreetMap APIs), the path to a local .osm/.osm.pbf extract (indexed on first use) or a prettymaps.sources.DataSource object
+    cache: string or LayerCache
+        (Optional) Cache fetched layers on disk (as GeoParquet files) in this directory, or in the provided prettymaps.cache.LayerCache object (which allows setting a size cap)
+    max_workers: int
+        (Optional) Fetch up to this many layers at the same time. Defaults to fetching one layer at a time
+    geocode_cache: string or GeocodeCache
+        (Optional) Cache geocoding results (points and boundaries) in this SQLite database, or in the provided prettymaps.geocode.GeocodeCache object (which allows setting a TTL)
+    gazetteer: string or Gazetteer
+        (Optional) Resolve place names and OSM ids from this local file (see prettymaps.geocode.Gazetteer) before geocoding them online
     radius
         (Optional) If not None, draw the map centered around the address with this radius (in meters)
     layers: dict
-        Specify the name of each layer and the OpenStreetMap tags to fetch
+        Specify the name of each layer and the OpenStreetMap tags to fetch. Fetched GeoDataFrames only keep the columns needed to draw them (the geometry, plus 'highway' for street networks): list any other columns to keep in a layer's 'columns' parameter, or set it to True to keep all of them
     style: dict
         Drawing params for each layer (matplotlib params such as 'fc', 'ec', 'fill', etc.)
     osm_credit: dict
@@ -872,6 +2094,24 @@ def plot(
         Matplotlib axes
     title: String
         (Optional) Title for the Matplotlib figure
+    collections: bool
+        (Optional) If True, draw each layer as a few matplotlib collections (much faster to draw and save for dense maps) instead of one artist per shape
+    seed: int
+        (Optional) Seed of the palette color of each feature (a hash of the feature and the seed, see hash_colors()), so that a feature always gets the same color, whether the map is tiled or not. If None, palette colors are picked at random
+    stroke_streets: bool
+        (Optional) If True, draw the 'streets', 'railway' and 'waterway' layers as strokes with widths in map units instead of dilating and merging them into polygons (much faster for large areas, but street hatches are not supported)
+    lod: bool
+        (Optional) If True, simplify geometries to the output resolution (half a pixel tolerance, given the figure's size and dpi) and skip polygons smaller than 'lod_min_area' before drawing them (matplotlib mode only)
+    lod_min_area: float
+        (Optional) Minimum polygon area (in output pixels) drawn when 'lod' is True
+    tile_size: float
+        (Optional) If not None, split the map into square tiles of this side (in meters) and fetch, process and draw the layers one tile at a time, so that memory use is bounded by the tile size rather than the map size (matplotlib mode only, ignored when 'backup' is given). 'postprocessing' is then applied to each tile, palette colors are picked from a hash of each feature (and 'seed', or 0 if it is None), and the returned Plot only holds the perimeter GeoDataFrame
+    mode: string
+        (Optional) Drawing mode: 'matplotlib', 'plotter' (vsketch) or 'vector' (write the processed layers straight to the 'save_as' SVG or PDF file, layer by layer in zorder, without creating a matplotlib figure: memory use stays flat for dense maps. Level of detail and tiled mode are not supported, and the returned Plot has no figure) or 'raster' (draw the processed layers straight onto an Agg canvas of figsize * dpi pixels, without creating a matplotlib figure: the RGBA image is returned in the Plot's 'image' attribute, and saved to 'save_as' if provided, in the format given by its extension. Same limitations as 'vector')
+    dpi: float
+        (Optional) Output resolution (in pixels per inch) of the matplotlib figure, or of the image in raster mode. Defaults to 300
+    trace: function
+        (Optional) Called with each timing span (a dict with 'stage', 'layer', 'start', 'duration', 'features', 'vertices' and 'artists' keys) as soon as it ends. All spans are also returned in the Plot's 'timings' DataFrame
     vsketch: Vsketch
         (Optional) Vsketch object for pen plotting
     x: float
@@ -895,39 +2135,105 @@ def plot(
 
     """
 
+    from matplotlib import pyplot as plt
+
+    if (mode == "vector") and not (
+        save_as and str(save_as).lower().endswith((".svg", ".pdf"))
+    ):
+        raise ValueError("Vector mode requires 'save_as' to be an .svg or .pdf path")
+
+    tracer = Tracer(hook=trace)
+
     # 1. Manage presets
-    layers, style, circle, radius, dilate = manage_presets(
-        preset, save_preset, update_preset, layers, style, circle, radius, dilate
-    )
+    with tracer.span("presets"):
+        layers, style, circle, radius, dilate = manage_presets(
+            preset, save_preset, update_preset, layers, style, circle, radius, dilate
+        )
+        # Compile each layer's style once (reusing the preset's compiled styles)
+        loaded = update_preset if update_preset is not None else preset
+        specs = get_draw_specs(
+            style, load_preset(loaded) if loaded is not None else None
+        )
 
     # 2. Init matplotlib figure and ax
-    if (mode == "matplotlib") and (fig is None):
-        fig = plt.figure(figsize=figsize, dpi=300)
-    if (mode == "matplotlib") and (ax is None):
-        ax = plt.subplot(111, aspect="equal")
+    with tracer.span("figure"):
+        if (mode == "matplotlib") and (fig is None):
+            fig = plt.figure(figsize=figsize, dpi=dpi)
+        if (mode == "matplotlib") and (ax is None):
+            ax = plt.subplot(111, aspect="equal")
 
     # 3. Override arguments in layers' kwargs dict
     layers = override_args(layers, circle, dilate)
 
+    tiled = (tile_size is not None) and (mode == "matplotlib") and not backup
+
     if backup:
         gdfs = backup.geodataframes
+    elif tiled:
+        # 4. Get perimeter only (other layers are fetched one tile at a time)
+        with tracer.span("fetch"):
+            source = resolve_source(source, geocode_cache, gazetteer)
+            perimeter = get_query_perimeter(
+                query, layers, radius, dilate, rotation=-rotation, source=source
+            )
+            gdfs = {"perimeter": perimeter.gdf}
     else:
         # 4. Fetch geodataframes
-        gdfs = get_gdfs(query, layers, radius, dilate, -rotation)
+        with tracer.span("fetch"):
+            gdfs = get_gdfs(
+                query,
+                layers,
+                radius,
+                dilate,
+                -rotation,
+                combined_fetch=combined_fetch,
+                source=source,
+                cache=cache,
+                max_workers=max_workers,
+                geocode_cache=geocode_cache,
+                gazetteer=gazetteer,
+                tracer=tracer,
+            )
 
-        # 5. Apply transformations to GeoDataFrames (translation, scale, rotation)
-        gdfs = transform_gdfs(gdfs, x, y, scale_x, scale_y, rotation)
+    # 5. Apply a postprocessing function to the GeoDataFrames, if provided
+    if postprocessing and not tiled:
+        with tracer.span("postprocessing"):
+            gdfs = postprocessing(gdfs)
 
-    # 6. Apply a postprocessing function to the GeoDataFrames, if provided
-    if postprocessing:
-        gdfs = postprocessing(gdfs)
+    # 6. Compute transformation (translation, scale, rotation), applied at render time
+    affine = get_affine(gdfs, x, y, scale_x, scale_y, rotation)
 
     # 7. Create background GeoDataFrame and get (x,y) bounds
-    background, xmin, ymin, xmax, ymax, dx, dy = create_background(gdfs, style)
+    with tracer.span("background"):
+        background, xmin, ymin, xmax, ymax, dx, dy = create_background(
+            gdfs, style, transform=affine
+        )
+
+    # Seedable random number generator for palette colors
+    rng = np.random.default_rng(seed) if seed is not None else None
+
+    # Level of detail
+    lod_kwargs = {}
+    if lod and (mode == "matplotlib"):
+        lod_kwargs = get_lod_kwargs(ax, dx, dy, affine, min_area=lod_min_area)
+
+    # Process layers into shapely geometries (reusing those of 'backup', if still valid)
+    with tracer.span("geometry"):
+        geometries = process_layers(
+            gdfs,
+            layers,
+            style,
+            strokes=stroke_streets,
+            lod_kwargs=lod_kwargs,
+            geometries=backup.geometries if backup else {},
+            tracer=tracer,
+        )
 
     # 8. Draw layers
     if mode == "plotter":
         # 8.1. Draw layers in plotter (vsketch) mode
+        vsketch, _ = import_vsketch()
+
         #'''
         class Sketch(vsketch.SketchClass):
             def draw(self, vsk: vsketch.Vsketch):
@@ -936,19 +2242,37 @@ def plot(
 
                 for layer in gdfs:
                     if layer in layers:
-                        plot_gdf(
-                            layer,
-                            gdfs[layer],
-                            ax,
-                            width=(
-                                layers[layer]["width"]
-                                if "width" in layers[layer]
-                                else None
-                            ),
-                            mode=mode,
-                            vsk=vsk,
-                            **(style[layer] if layer in style else {}),
-                        )
+                        with tracer.span("draw", layer) as span:
+                            plot_gdf(
+                                layer,
+                                gdfs[layer],
+                                ax,
+                                width=(
+                                    layers[layer]["width"]
+                                    if "width" in layers[layer]
+                                    else None
+                                ),
+                                mode=mode,
+                                vsk=vsk,
+                                strokes=stroke_streets,
+                                transform=affine,
+                                geometries=(
+                                    geometries[layer].simplified
+                                    if layer in geometries
+                                    else None
+                                ),
+                                spec=specs.get(layer),
+                                **(style[layer] if layer in style else {}),
+                            )
+                            if tracer.counters:
+                                span.update(
+                                    features=len(gdfs[layer]),
+                                    vertices=(
+                                        count_vertices(geometries[layer].simplified)
+                                        if layer in geometries
+                                        else None
+                                    ),
+                                )
 
                 if save_as:
                     vsk.save(save_as)
@@ -961,38 +2285,115 @@ def plot(
         #'''
     elif mode == "matplotlib":
         # 8.2. Draw layers in matplotlib mode
-        for layer in gdfs:
-            if (layer in layers) or (layer in style):
-                plot_gdf(
-                    layer,
-                    gdfs[layer],
+        with tracer.span("draw"):
+            for layer in gdfs:
+                if (layer in layers) or (layer in style):
+                    with tracer.span("draw", layer) as span:
+                        artists = count_artists(ax) if tracer.counters else None
+                        plot_gdf(
+                            layer,
+                            gdfs[layer],
+                            ax,
+                            width=(
+                                layers[layer]["width"]
+                                if (layer in layers) and ("width" in layers[layer])
+                                else None
+                            ),
+                            collections=collections,
+                            rng=rng,
+                            color_seed=seed,
+                            strokes=stroke_streets,
+                            transform=affine,
+                            geometries=(
+                                geometries[layer].simplified
+                                if layer in geometries
+                                else None
+                            ),
+                            keys=(
+                                geometries[layer].keys if layer in geometries else None
+                            ),
+                            spec=specs.get(layer),
+                            **lod_kwargs,
+                            **(style[layer] if layer in style else {}),
+                        )
+                        if tracer.counters:
+                            span.update(
+                                features=len(gdfs[layer]),
+                                vertices=(
+                                    count_vertices(geometries[layer].simplified)
+                                    if layer in geometries
+                                    else None
+                                ),
+                                artists=count_artists(ax) - artists,
+                            )
+        # 8.3. Tiled mode: fetch, process and draw the other layers one tile at a time
+        if tiled:
+            with tracer.span("tiles"):
+                plot_tiles(
+                    perimeter,
+                    layers,
+                    style,
                     ax,
-                    width=(
-                        layers[layer]["width"]
-                        if (layer in layers) and ("width" in layers[layer])
-                        else None
-                    ),
-                    **(style[layer] if layer in style else {}),
+                    tile_size,
+                    affine,
+                    postprocessing=postprocessing,
+                    combined_fetch=combined_fetch,
+                    source=source,
+                    cache=cache,
+                    max_workers=max_workers,
+                    tracer=tracer,
+                    collections=collections,
+                    strokes=stroke_streets,
+                    color_seed=seed if seed is not None else 0,
+                    **lod_kwargs,
                 )
+    elif mode in ["vector", "raster"]:
+        # 8.4. Write layers straight to an SVG or PDF file, or draw them straight onto
+        # an Agg canvas (no matplotlib figure)
+        import matplotlib.image
+        from .render import Scene, write_vector, render_raster
+
+        with tracer.span("draw"):
+            scene = Scene(
+                {layer: geometry.simplified for layer, geometry in geometries.items()},
+                specs,
+                affine,
+                figsize=figsize,
+                background=background,
+                background_style=style.get("background"),
+                credit=credit if (credit != False) and (not multiplot) else None,
+                rng=rng,
+                color_seed=seed,
+                keys={layer: geometry.keys for layer, geometry in geometries.items()},
+            )
+            if mode == "vector":
+                write_vector(scene, str(save_as), tracer=tracer)
+            else:
+                image = render_raster(scene, dpi=dpi, tracer=tracer)
+        if (mode == "raster") and save_as:
+            with tracer.span("savefig"):
+                matplotlib.image.imsave(save_as, image, dpi=dpi)
     else:
         raise Exception(f"Unknown mode {mode}")
 
     # 9. Draw background
     if (mode == "matplotlib") and ("background" in style):
-        zorder = (
-            style["background"].pop("zorder") if "zorder" in style["background"] else -1
-        )
         ax.add_patch(
             PolygonPatch(
                 background,
-                **{k: v for k, v in style["background"].items() if k != "dilate"},
-                zorder=zorder,
+                **{
+                    k: v
+                    for k, v in style["background"].items()
+                    if k not in ["pad", "dilate", "zorder"]
+                },
+                zorder=style["background"].get("zorder", -1),
             )
         )
 
     # 10. Draw credit message
     if (mode == "matplotlib") and (credit != False) and (not multiplot):
-        draw_text(credit, background)
+        with tracer.span("credit"):
+            draw_text(credit, background)
 
     # 11. Ajust figure and create PIL Image
     if mode == "matplotlib":
@@ -1004,38 +2405,158 @@ def plot(
         plt.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=0, hspace=0)
         # Save result
         if save_as:
-            plt.savefig(save_as)
+            with tracer.span("savefig"):
+                plt.savefig(save_as)
         if not show:
             plt.close()
 
     # Generate plot
-    plot = Plot(gdfs, fig, ax, background)
+    plot = Plot(
+        gdfs,
+        fig,
+        ax,
+        background,
+        geometries,
+        tracer.dataframe(),
+        image if mode == "raster" else None,
+    )
 
     return plot
 
 
-def multiplot(*subplots, figsize=None, credit={}, **kwargs):
+def multiplot(*subplots, figsize=None, credit={}, max_workers=None, **kwargs):
+    """
+    Draw several subplots onto the same axes. All subplots are planned together: each layer is
+    fetched once over the union of the perimeters of the neighbouring subplots sharing it
+    (distant subplots are fetched on their own, see prettymaps.fetch.get_gdfs_merged()), and the subplots' layers are processed in parallel
+    (up to 'max_workers' at the same time) before being drawn one subplot after the other.
+    The spans of the shared fetch and processing steps are only reported to the 'trace' hook
+    (and to prettymaps.tracing.add_hook() hooks), each subplot's 'timings' cover its drawing
+
+    Args:
+        *subplots (Subplot): Subplots
+        figsize (optional): Figure size. Defaults to None.
+        credit (dict, optional): Credit message parameters. Defaults to {}.
+        max_workers (optional): Number of subplots processed (and layers fetched) at the same time. Defaults to None.
+        **kwargs: prettymaps.plot() parameters shared by all subplots
+
+    Returns:
+        List[Plot]: Subplots' results
+    """
+    from matplotlib import pyplot as plt
 
     fig = plt.figure(figsize=figsize)
     ax = plt.subplot(111, aspect="equal")
 
     mode = "plotter" if "plotter" in kwargs and kwargs["plotter"] else "matplotlib"
+    tracer = Tracer(hook=kwargs.get("trace"))
+
+    # 1. Resolve each subplot's parameters (presets are only loaded once per subplot)
+    subplots_params = []
+    for subplot in subplots:
+        params = override_params(
+            subplot.kwargs,
+            {
+                k: v
+                for k, v in kwargs.items()
+                if k != "load_preset" or "load_preset" not in subplot.kwargs
+            },
+        )
+        layers, style, circle, radius, dilate = manage_presets(
+            params.get("preset", "default"),
+            params.get("save_preset"),
+            params.get("update_preset"),
+            params.get("layers", {}),
+            params.get("style", {}),
+            params.get("circle"),
+            params.get("radius"),
+            params.get("dilate"),
+        )
+        layers = override_args(layers, circle, dilate)
+        subplots_params.append(
+            {
+                **params,
+                "layers": layers,
+                "style": style,
+                "circle": circle,
+                "radius": radius,
+                "dilate": dilate,
+                "preset": None,
+                "save_preset": None,
+                "update_preset": None,
+            }
+        )
 
+    # 2. Fetch the layers of all subplots at once (except for subplots with a backup)
+    fetched = [
+        i for i, params in enumerate(subplots_params) if not params.get("backup")
+    ]
+    if fetched:
+        shared = subplots_params[fetched[0]]
+        merged = get_gdfs_merged(
+            [subplots[i].query for i in fetched],
+            [subplots_params[i]["layers"] for i in fetched],
+            [subplots_params[i]["radius"] for i in fetched],
+            [subplots_params[i]["dilate"] for i in fetched],
+            [-subplots_params[i].get("rotation", 0) for i in fetched],
+            combined_fetch=shared.get("combined_fetch", False),
+            source=shared.get("source"),
+            cache=shared.get("cache"),
+            max_workers=max_workers,
+            geocode_cache=shared.get("geocode_cache"),
+            gazetteer=shared.get("gazetteer"),
+            tracer=tracer,
+        )
+        for i, gdfs in zip(fetched, merged):
+            subplots_params[i]["backup"] = Plot(gdfs, None, None, None)
+
+    # 3. Process the subplots' layers in parallel (as plot() would)
+    def process_subplot(params):
+        backup = params["backup"]
+        gdfs = backup.geodataframes
+        if params.get("postprocessing"):
+            gdfs = params["postprocessing"](gdfs)
+        affine = get_affine(
+            gdfs,
+            params.get("x", 0),
+            params.get("y", 0),
+            params.get("scale_x", 1),
+            params.get("scale_y", 1),
+            params.get("rotation", 0),
+        )
+        _, _, _, _, _, dx, dy = create_background(
+            gdfs, params["style"], transform=affine
+        )
+        lod_kwargs = {}
+        if params.get("lod", False) and (
+            params.get("mode", "matplotlib") == "matplotlib"
+        ):
+            lod_kwargs = get_lod_kwargs(
+                ax, dx, dy, affine, min_area=params.get("lod_min_area", 0.1)
+            )
+        geometries = process_layers(
+            gdfs,
+            params["layers"],
+            params["style"],
+            strokes=params.get("stroke_streets", False),
+            lod_kwargs=lod_kwargs,
+            geometries=backup.geometries,
+            tracer=tracer,
+        )
+        return Plot(gdfs, None, None, None, geometries)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        backups = list(executor.map(process_subplot, subplots_params))
+
+    # 4. Draw subplots
     subplots_results = [
         plot(
             subplot.query,
             ax=ax,
             multiplot=True,
-            **override_params(
-                subplot.kwargs,
-                {
-                    k: v
-                    for k, v in kwargs.items()
-                    if k != "load_preset" or "load_preset" not in subplot.kwargs
-                },
-            ),
+            **{**params, "backup": backup, "postprocessing": None},
         )
-        for subplot in subplots
+        for subplot, params, backup in zip(subplots, subplots_params, backups)
     ]
 
     if mode == "matplotlib":
@@ -1046,6 +2567,8 @@ def multiplot(*subplots, figsize=None, credit={}, **kwargs):
         # if "show" in kwargs and not kwargs["show"]:
         #    plt.close()
 
+    return subplots_results
+
 
 #
 # if credit != False:
@@ -17,10 +17,13 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import re
+import json
 import warnings
+import threading
 import numpy as np
-import osmnx as ox
+import shapely
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 from shapely.geometry import (
     box,
     Point,
@@ -29,12 +32,14 @@ from shapely.geometry import (
     LineString,
     MultiLineString,
 )
-from geopandas import GeoDataFrame
+from geopandas import GeoDataFrame, GeoSeries
 from shapely.affinity import rotate, scale
 from shapely.ops import unary_union
 from shapely.errors import ShapelyDeprecationWarning
-
-from IPython.display import display
+from .sources import get_source, parse_tags, filter_tags, NoFeaturesError
+from .cache import get_cache
+from .geocode import GeocodingSource
+from .tracing import get_tracer, count_vertices
 
 
 # Parse query (by coordinates, OSMId or name)
@@ -50,10 +55,16 @@ def parse_query(query):
 
 
 # Get circular or square boundary around point
-def get_boundary(query, radius, circle=False, rotation=0):
+# (in EPSG:4326, or in the local UTM CRS if to_latlong is False)
+def get_boundary(query, radius, circle=False, rotation=0, source=None, to_latlong=True):
+    import osmnx as ox
 
     # Get point from query
-    point = query if parse_query(query) == "coordinates" else ox.geocode(query)
+    point = (
+        query
+        if parse_query(query) == "coordinates"
+        else get_source(source).geocode(query)
+    )
     # Create GeoDataFrame from point
     boundary = ox.project_gdf(
         GeoDataFrame(geometry=[Point(point[::-1])], crs="EPSG:4326")
@@ -78,12 +89,13 @@ def get_boundary(query, radius, circle=False, rotation=0):
         )
 
     # Unproject
-    boundary = boundary.to_crs(4326)
+    if to_latlong:
+        boundary = boundary.to_crs(4326)
 
     return boundary
 
 
-# Get perimeter from query
+# Get perimeter from query (in its local UTM CRS)
 def get_perimeter(
     query,
     radius=None,
@@ -92,12 +104,21 @@ def get_perimeter(
     dilate=None,
     rotation=0,
     aspect_ratio=1,
-    **kwargs
+    source=None,
+    **kwargs,
 ):
+    import osmnx as ox
 
     if radius:
         # Perimeter is a circular or square shape
-        perimeter = get_boundary(query, radius, circle=circle, rotation=rotation)
+        perimeter = get_boundary(
+            query,
+            radius,
+            circle=circle,
+            rotation=rotation,
+            source=source,
+            to_latlong=False,
+        )
     else:
         # Perimeter is a OSM or user-provided polygon
         if parse_query(query) == "polygon":
@@ -105,26 +126,201 @@ def get_perimeter(
             perimeter = query
         else:
             # Fetch perimeter from OSM
-            perimeter = ox.geocode_to_gdf(
+            perimeter = get_source(source).geocode_to_gdf(
                 query,
                 by_osmid=by_osmid,
                 **kwargs,
             )
 
-    # Scale according to aspect ratio
+    # Project (once) to the local UTM CRS
     perimeter = ox.project_gdf(perimeter)
+
+    # Scale according to aspect ratio
     perimeter.loc[0, "geometry"] = scale(perimeter.loc[0, "geometry"], aspect_ratio, 1)
-    perimeter = perimeter.to_crs(4326)
 
     # Apply dilation
-    perimeter = ox.project_gdf(perimeter)
     if dilate is not None:
         perimeter.geometry = perimeter.geometry.buffer(dilate)
-    perimeter = perimeter.to_crs(4326)
 
     return perimeter
 
 
+# Project a GeoDataFrame to its local UTM CRS (no-op for already projected GeoDataFrames,
+# such as the ones returned by get_gdfs())
+def project(gdf):
+    import osmnx as ox
+
+    if gdf.crs is not None and gdf.crs.is_projected:
+        return gdf
+    return ox.project_gdf(gdf)
+
+
+class PerimeterContext:
+    """
+    Perimeter shared by all the layers of a plot. Its local UTM CRS is picked once and used
+    by the whole pipeline (fetched layers are projected to it right away), and its
+    tolerance-buffered variants are computed once and reused by every layer. Attributes:
+    - gdf: perimeter GeoDataFrame (projected)
+    - crs: projected CRS
+    - geometry: union of the perimeter geometries (projected)
+    """
+
+    def __init__(self, perimeter: GeoDataFrame):
+        self.gdf = project(perimeter)
+        self.crs = self.gdf.crs
+        self.geometry = unary_union(self.gdf.geometry)
+        self._lock = threading.Lock()
+        self._with_tolerance = {}
+        self._bboxes = {}
+
+    def with_tolerance(self, perimeter_tolerance=0):
+        """
+        Perimeter buffered by 'perimeter_tolerance' (projected and prepared for fast predicates)
+        """
+        with self._lock:
+            if perimeter_tolerance not in self._with_tolerance:
+                geometry = unary_union(
+                    self.gdf.geometry.buffer(perimeter_tolerance)
+                ).buffer(0)
+                shapely.prepare(geometry)
+                self._with_tolerance[perimeter_tolerance] = geometry
+            return self._with_tolerance[perimeter_tolerance]
+
+    def bbox(self, perimeter_tolerance=0):
+        """
+        Bounding box of the perimeter buffered by 'perimeter_tolerance' (in EPSG:4326, for data sources)
+        """
+        geometry = self.with_tolerance(perimeter_tolerance)
+        with self._lock:
+            if perimeter_tolerance not in self._bboxes:
+                self._bboxes[perimeter_tolerance] = box(
+                    *GeoSeries([geometry], crs=self.crs).to_crs(4326).total_bounds
+                )
+            return self._bboxes[perimeter_tolerance]
+
+    def project(self, gdf):
+        """
+        Project a fetched GeoDataFrame to the perimeter's CRS
+        """
+        if gdf.crs is None:
+            # Empty results
+            return gdf.set_crs(self.crs)
+        return gdf.to_crs(self.crs)
+
+
+def get_perimeter_context(perimeter):
+    return (
+        perimeter
+        if isinstance(perimeter, PerimeterContext)
+        else PerimeterContext(perimeter)
+    )
+
+
+# Raised by get_gdfs(on_error="raise") when some layers could not be fetched
+class LayerFetchError(Exception):
+    def __init__(self, errors):
+        # Dictionary of exceptions, by layer
+        self.errors = errors
+        super().__init__(
+            "Failed to fetch layers: "
+            + ", ".join(f"'{layer}' ({error!r})" for layer, error in errors.items())
+        )
+
+
+# get_gdf() parameters affecting the fetched data (used as layer cache keys)
+FETCH_PARAMS = ["perimeter_tolerance", "tags", "osmid", "custom_filter", "columns"]
+
+# Columns (besides the geometry) used to draw each layer: street widths are looked up
+# by highway type (see prettymaps.draw.get_widths())
+LAYER_COLUMNS = {
+    "streets": ["highway"],
+    "railway": ["highway"],
+    "waterway": ["highway"],
+}
+
+
+# Merge several tags dicts into one whose results are the union of all of them
+def merge_tags(tags_list):
+    merged = {}
+    for tags in tags_list:
+        for key, value in parse_tags(tags).items():
+            if (value is True) or (merged.get(key) is True):
+                merged[key] = True
+            else:
+                values = merged.get(key, []) + (
+                    value if isinstance(value, list) else [value]
+                )
+                # Remove duplicates while keeping the original order
+                merged[key] = list(dict.fromkeys(values))
+    return merged
+
+
+# Intersect GeoDataFrame with perimeter
+def clip_gdf(gdf, perimeter_with_tolerance):
+    if len(gdf) == 0:
+        return gdf
+    shapely.prepare(perimeter_with_tolerance)
+    geometries = gdf.geometry.to_numpy().copy()
+    # Find features intersecting the perimeter and features lying fully inside it
+    tree = shapely.STRtree(geometries)
+    intersecting = np.zeros(len(gdf), dtype=bool)
+    intersecting[tree.query(perimeter_with_tolerance, predicate="intersects")] = True
+    crossing = intersecting.copy()
+    crossing[tree.query(perimeter_with_tolerance, predicate="contains")] = False
+    # Only intersect features crossing the perimeter's boundary
+    geometries[crossing] = shapely.intersection(
+        geometries[crossing], perimeter_with_tolerance
+    )
+    gdf.geometry = geometries
+    # Drop features outside the perimeter
+    gdf.drop(
+        gdf.index[~intersecting | shapely.is_empty(geometries)],
+        inplace=True,
+    )
+    return gdf
+
+
+# Store a tag column as a categorical if its values repeat (such as highway types).
+# Columns holding lists (such as the highway types of merged street segments) are kept as is
+def compact_column(column):
+    try:
+        if column.nunique() <= len(column) / 2:
+            return column.astype("category")
+    except TypeError:
+        pass
+    return column
+
+
+# Keep only the geometry and the columns used to draw a layer (plus those listed in
+# 'columns', or all of them if 'columns' is True), with compact dtypes
+def prune_columns(layer, gdf, columns=None):
+    if columns is True:
+        return gdf
+    if isinstance(columns, str):
+        columns = [columns]
+    keep = set(LAYER_COLUMNS.get(layer, []) + list(columns or []))
+    gdf = gdf.drop(
+        columns=[
+            column
+            for column in gdf.columns
+            if column not in keep and column != gdf.geometry.name
+        ]
+    )
+    for column in gdf.columns:
+        if column != gdf.geometry.name and gdf[column].dtype == object:
+            gdf[column] = compact_column(gdf[column])
+    return gdf
+
+
+# Whether a layer can be fetched together with others in a single features query
+def is_combinable(layer, kwargs):
+    return (
+        layer not in ["streets", "railway", "waterway"]
+        and kwargs.get("osmid") is None
+        and bool(kwargs.get("tags"))
+    )
+
+
 # Get a GeoDataFrame
 def get_gdf(
     layer,
@@ -141,76 +337,417 @@ def get_gdf(
     min_height=30,
     max_height=None,
     n_curves=100,
-    **kwargs
+    source=None,
+    columns=None,
+    **kwargs,
 ):
+    source = get_source(source)
+    perimeter = get_perimeter_context(perimeter)
 
     # Apply tolerance to the perimeter
-    perimeter_with_tolerance = (
-        ox.project_gdf(perimeter).buffer(perimeter_tolerance).to_crs(4326)
-    )
-    perimeter_with_tolerance = unary_union(perimeter_with_tolerance.geometry).buffer(0)
+    perimeter_with_tolerance = perimeter.with_tolerance(perimeter_tolerance)
 
     # Fetch from perimeter's bounding box, to avoid missing some geometries
-    bbox = box(*perimeter_with_tolerance.bounds)
+    bbox = perimeter.bbox(perimeter_tolerance)
 
     try:
         if layer in ["streets", "railway", "waterway"]:
-            graph = ox.graph_from_polygon(
-                bbox,
-                retain_all=True,
-                custom_filter=custom_filter,
-                truncate_by_edge=True,
-            )
-            gdf = ox.graph_to_gdfs(graph, nodes=False)
+            gdf = source.graph_edges(bbox, custom_filter=custom_filter)
         elif layer == "coastline":
             # Fetch geometries from OSM
-            gdf = ox.features_from_polygon(
-                bbox, tags={tags: True} if type(tags) == str else tags
-            )
+            gdf = source.features(bbox, tags=parse_tags(tags))
         else:
             if osmid is None:
                 # Fetch geometries from OSM
-                gdf = ox.features_from_polygon(
-                    bbox, tags={tags: True} if type(tags) == str else tags
-                )
+                gdf = source.features(bbox, tags=parse_tags(tags))
             else:
-                gdf = ox.geocode_to_gdf(osmid, by_osmid=True)
-    except:
+                gdf = source.geocode_to_gdf(osmid, by_osmid=True)
+    except NoFeaturesError:
+        # No features in the perimeter
         gdf = GeoDataFrame(geometry=[])
+    except Exception as e:
+        gdf = GeoDataFrame(geometry=[])
+        gdf.attrs["error"] = e
 
-    # Intersect with perimeter
-    gdf.geometry = gdf.geometry.intersection(perimeter_with_tolerance)
-    # gdf = gdf[~gdf.geometry.is_empty]
-    gdf.drop(gdf[gdf.geometry.is_empty].index, inplace=True)
+    # Drop unused columns, project and intersect with perimeter
+    return clip_gdf(
+        perimeter.project(prune_columns(layer, gdf, columns)), perimeter_with_tolerance
+    )
 
-    return gdf
 
+# Get GeoDataFrames for several layers using a single features query
+def get_combined_gdfs(layers_dict, perimeter, source=None):
+    if len(layers_dict) == 0:
+        return {}
+
+    perimeter = get_perimeter_context(perimeter)
+
+    # Fetch from the bounding box of the largest perimeter tolerance
+    perimeters_with_tolerance = {
+        layer: perimeter.with_tolerance(kwargs.get("perimeter_tolerance", 0))
+        for layer, kwargs in layers_dict.items()
+    }
+    bbox = box(
+        *unary_union(
+            [
+                perimeter.bbox(kwargs.get("perimeter_tolerance", 0))
+                for kwargs in layers_dict.values()
+            ]
+        ).bounds
+    )
+
+    try:
+        gdf = get_source(source).features(
+            bbox, tags=merge_tags([kwargs["tags"] for kwargs in layers_dict.values()])
+        )
+    except NoFeaturesError:
+        # No features in the perimeter
+        gdf = GeoDataFrame(geometry=[])
+    except Exception as e:
+        gdf = GeoDataFrame(geometry=[])
+        gdf.attrs["error"] = e
+    gdf = perimeter.project(gdf)
+
+    # Split the result into one GeoDataFrame per layer by matching its tags
+    gdfs = {
+        layer: clip_gdf(
+            (
+                prune_columns(
+                    layer, filter_tags(gdf, kwargs["tags"]), kwargs.get("columns")
+                )
+                if len(gdf) > 0
+                else GeoDataFrame(geometry=[], crs=perimeter.crs)
+            ),
+            perimeters_with_tolerance[layer],
+        )
+        for layer, kwargs in layers_dict.items()
+    }
+    for layer_gdf in gdfs.values():
+        layer_gdf.attrs.update(gdf.attrs)
+
+    return gdfs
+
+
+# Resolve data source once (an extract is indexed on first use), answering geocoding
+# queries from the gazetteer / geocoding cache when possible
+def resolve_source(source=None, geocode_cache=None, gazetteer=None):
+    source = get_source(source)
+    if geocode_cache is not None or gazetteer is not None:
+        source = GeocodingSource(source, cache=geocode_cache, gazetteer=gazetteer)
+    return source
 
-# Fetch GeoDataFrames given query and a dictionary of layers
-def get_gdfs(query, layers_dict, radius, dilate, rotation=0) -> dict:
+
+# Get the perimeter of a query, shared by all its layers (in its local UTM CRS)
+def get_query_perimeter(query, layers_dict, radius, dilate, rotation=0, source=None):
 
     perimeter_kwargs = {}
     if "perimeter" in layers_dict:
         perimeter_kwargs = deepcopy(layers_dict["perimeter"])
         perimeter_kwargs.pop("dilate")
 
-    # Get perimeter
-    perimeter = get_perimeter(
-        query,
-        radius=radius,
-        rotation=rotation,
-        dilate=dilate,
-        **perimeter_kwargs,
+    return PerimeterContext(
+        get_perimeter(
+            query,
+            radius=radius,
+            rotation=rotation,
+            dilate=dilate,
+            source=source,
+            **perimeter_kwargs,
+        )
     )
 
-    # Get other layers as GeoDataFrames
-    gdfs = {"perimeter": perimeter}
-    gdfs.update(
-        {
-            layer: get_gdf(layer, perimeter, **kwargs)
+
+# Fetch the layers in 'layers_dict' (other than the perimeter itself) within a perimeter
+def fetch_layers(
+    perimeter,
+    layers_dict,
+    combined_fetch=False,
+    source=None,
+    cache=None,
+    max_workers=None,
+    on_error="warn",
+    tracer=None,
+) -> dict:
+
+    source = get_source(source)
+    cache = get_cache(cache)
+    perimeter = get_perimeter_context(perimeter)
+    tracer = get_tracer(tracer)
+
+    layers_dict = {
+        layer: kwargs for layer, kwargs in layers_dict.items() if layer != "perimeter"
+    }
+
+    # Read layers from cache
+    cached, keys = {}, {}
+    if cache is not None:
+        for layer, kwargs in layers_dict.items():
+            keys[layer] = cache.key(
+                layer,
+                perimeter.gdf,
+                {param: kwargs.get(param) for param in FETCH_PARAMS},
+                source.cache_key(),
+            )
+            with tracer.span("cache", layer) as span:
+                gdf = cache.get(keys[layer])
+                span["hit"] = gdf is not None
+                if gdf is not None:
+                    cached[layer] = gdf
+                    if tracer.counters:
+                        span.update(features=len(gdf), vertices=count_vertices(gdf))
+
+    # Layers fetched at once, with a single features query (if requested)
+    combinable = {
+        layer: kwargs
+        for layer, kwargs in layers_dict.items()
+        if combined_fetch and is_combinable(layer, kwargs) and layer not in cached
+    }
+
+    def fetch_layer(layer, kwargs):
+        with tracer.span("fetch", layer) as span:
+            gdf = get_gdf(layer, perimeter, source=source, **kwargs)
+            if tracer.counters:
+                span.update(features=len(gdf), vertices=count_vertices(gdf))
+        return gdf
+
+    def fetch_combined():
+        if not combinable:
+            return {}
+        with tracer.span("fetch", "+".join(combinable)) as span:
+            gdfs = get_combined_gdfs(combinable, perimeter, source=source)
+            if tracer.counters:
+                span.update(
+                    features=sum(len(gdf) for gdf in gdfs.values()),
+                    vertices=sum(count_vertices(gdf) for gdf in gdfs.values()),
+                )
+        return gdfs
+
+    # Fetch remaining layers, up to 'max_workers' of them at the same time
+    with ThreadPoolExecutor(max_workers=max_workers or 1) as executor:
+        combined = executor.submit(fetch_combined)
+        futures = {
+            layer: executor.submit(fetch_layer, layer, kwargs)
             for layer, kwargs in layers_dict.items()
-            if layer != "perimeter"
+            if layer not in cached and layer not in combinable
         }
-    )
+    fetched = combined.result()
+    fetched.update({layer: future.result() for layer, future in futures.items()})
+
+    # Get layers as GeoDataFrames (in the same order as 'layers_dict')
+    gdfs = {}
+    for layer in layers_dict:
+        if layer in cached:
+            gdfs[layer] = cached[layer]
+            continue
+        gdfs[layer] = fetched[layer]
+        # Write to cache (failed fetches are not cached)
+        if cache is not None and "error" not in gdfs[layer].attrs:
+            cache.put(keys[layer], gdfs[layer])
+
+    # Report layers that could not be fetched
+    errors = {
+        layer: gdf.attrs["error"] for layer, gdf in gdfs.items() if "error" in gdf.attrs
+    }
+    if errors and on_error == "raise":
+        raise LayerFetchError(errors)
+    for layer, error in errors.items():
+        warnings.warn(f"Failed to fetch layer '{layer}': {error!r}")
 
     return gdfs
+
+
+# Fetch GeoDataFrames given query and a dictionary of layers
+def get_gdfs(
+    query,
+    layers_dict,
+    radius,
+    dilate,
+    rotation=0,
+    combined_fetch=False,
+    source=None,
+    cache=None,
+    max_workers=None,
+    on_error="warn",
+    geocode_cache=None,
+    gazetteer=None,
+    tracer=None,
+) -> dict:
+
+    source = resolve_source(source, geocode_cache, gazetteer)
+    tracer = get_tracer(tracer)
+
+    # Get perimeter, shared by all layers (in its local UTM CRS)
+    with tracer.span("fetch", "perimeter") as span:
+        perimeter = get_query_perimeter(
+            query, layers_dict, radius, dilate, rotation=rotation, source=source
+        )
+        if tracer.counters:
+            span.update(
+                features=len(perimeter.gdf), vertices=count_vertices(perimeter.gdf)
+            )
+
+    return {
+        "perimeter": perimeter.gdf,
+        **fetch_layers(
+            perimeter,
+            layers_dict,
+            combined_fetch=combined_fetch,
+            source=source,
+            cache=cache,
+            max_workers=max_workers,
+            on_error=on_error,
+            tracer=tracer,
+        ),
+    }
+
+
+# Group queries whose perimeters are close enough to be fetched over a single region: two
+# groups are merged while the bounding box around both is no larger than their own bounding
+# boxes put together (i.e. they overlap or touch), and they share the same projected CRS.
+# Distant queries are kept apart, as fetching the region between them would be wasteful
+def cluster_perimeters(perimeters) -> list:
+    clusters = [
+        ([i], perimeter.bbox(), perimeter.crs) for i, perimeter in enumerate(perimeters)
+    ]
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                members_a, bbox_a, crs_a = clusters[a]
+                members_b, bbox_b, crs_b = clusters[b]
+                bbox = box(*unary_union([bbox_a, bbox_b]).bounds)
+                if crs_a == crs_b and bbox.area <= bbox_a.area + bbox_b.area:
+                    clusters[a] = (members_a + members_b, bbox, crs_a)
+                    del clusters[b]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [sorted(members) for members, _, _ in clusters]
+
+
+# Fetch GeoDataFrames for several queries (such as multiplot's subplots) at once: each layer
+# is fetched once over the union of the perimeters of the neighbouring queries sharing it (with
+# the same tags, osmid and custom_filter, see cluster_perimeters()), and then split locally
+# into one GeoDataFrame per query. Queries far from the others are fetched on their own
+def get_gdfs_merged(
+    queries,
+    layers_dicts,
+    radii,
+    dilates,
+    rotations=None,
+    combined_fetch=False,
+    source=None,
+    cache=None,
+    max_workers=None,
+    on_error="warn",
+    geocode_cache=None,
+    gazetteer=None,
+    tracer=None,
+) -> list:
+
+    source = resolve_source(source, geocode_cache, gazetteer)
+    rotations = rotations or [0] * len(queries)
+    tracer = get_tracer(tracer)
+
+    # Get perimeters
+    perimeters = []
+    for query, layers_dict, radius, dilate, rotation in zip(
+        queries, layers_dicts, radii, dilates, rotations
+    ):
+        with tracer.span("fetch", "perimeter") as span:
+            perimeters.append(
+                get_query_perimeter(
+                    query, layers_dict, radius, dilate, rotation, source
+                )
+            )
+            if tracer.counters:
+                span.update(
+                    features=len(perimeters[-1].gdf),
+                    vertices=count_vertices(perimeters[-1].gdf),
+                )
+
+    # Find which queries share each layer
+    sharing = {}
+    for i, layers_dict in enumerate(layers_dicts):
+        for layer, kwargs in layers_dict.items():
+            if layer == "perimeter":
+                continue
+            params = {
+                param: kwargs.get(param)
+                for param in FETCH_PARAMS
+                if param != "perimeter_tolerance"
+            }
+            key = (layer, json.dumps(params, sort_keys=True, default=str))
+            sharing.setdefault(key, []).append(i)
+    # Layers shared by the same (neighbouring) queries are fetched together, over the same
+    # region
+    regions = {}
+    for (layer, _), members in sharing.items():
+        for cluster in cluster_perimeters([perimeters[i] for i in members]):
+            regions.setdefault(tuple(members[j] for j in cluster), []).append(layer)
+
+    gdfs = [{} for _ in queries]
+    for members, layers in regions.items():
+        # Fetch over the union of the members' perimeters, with the largest tolerance
+        region = (
+            perimeters[members[0]]
+            if len(members) == 1
+            else PerimeterContext(
+                GeoDataFrame(
+                    geometry=[
+                        unary_union(
+                            [
+                                geometry
+                                for i in members
+                                for geometry in perimeters[i].gdf.to_crs(4326).geometry
+                            ]
+                        )
+                    ],
+                    crs=4326,
+                )
+            )
+        )
+        region_layers = {
+            layer: {
+                **layers_dicts[members[0]][layer],
+                "perimeter_tolerance": max(
+                    layers_dicts[i][layer].get("perimeter_tolerance", 0)
+                    for i in members
+                ),
+            }
+            for layer in layers
+        }
+        fetched = fetch_layers(
+            region,
+            region_layers,
+            combined_fetch=combined_fetch,
+            source=source,
+            cache=cache,
+            max_workers=max_workers,
+            on_error=on_error,
+            tracer=tracer,
+        )
+        # Split locally
+        for i in members:
+            for layer in layers:
+                gdfs[i][layer] = (
+                    fetched[layer]
+                    if len(members) == 1
+                    else clip_gdf(
+                        perimeters[i].project(fetched[layer].copy()),
+                        perimeters[i].with_tolerance(
+                            layers_dicts[i][layer].get("perimeter_tolerance", 0)
+                        ),
+                    )
+                )
+
+    # Keep the same layer order as 'layers_dicts'
+    return [
+        {
+            "perimeter": perimeter.gdf,
+            **{layer: gdfs[i][layer] for layer in layers_dict if layer != "perimeter"},
+        }
+        for i, (perimeter, layers_dict) in enumerate(zip(perimeters, layers_dicts))
+    ]
@@ -0,0 +1,294 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import pandas as pd
+import geopandas as gp
+from pathlib import Path
+from contextlib import closing
+from shapely import wkt
+from geopandas import GeoDataFrame
+from typing import Optional, Union, Tuple
+from .sources import DataSource, get_source
+
+
+class GeocodeCache:
+    """
+    Persistent cache of geocoding results (points and boundary polygons), stored in a
+    SQLite database. Entries older than 'ttl' seconds are geocoded again. Attributes:
+    - path: database path
+    - ttl: time to live of each entry (in seconds). None means entries never expire
+    - hits: number of cache hits
+    - misses: number of cache misses
+    """
+
+    def __init__(
+        self, path: Union[str, Path], ttl: Optional[float] = 30 * 24 * 60 * 60
+    ):
+        self.path = os.path.abspath(path)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self.connect()) as con, con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS geocode "
+                "(kind TEXT, query TEXT, result TEXT, created REAL, PRIMARY KEY (kind, query))"
+            )
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    def get(self, kind: str, query: str) -> Optional[str]:
+        """
+        Read a geocoding result from the cache
+
+        Args:
+            kind (str): Result kind ('point' or 'polygon')
+            query (str): Query key
+
+        Returns:
+            Optional[str]: Serialized result (None if not cached or expired)
+        """
+        with closing(self.connect()) as con:
+            row = con.execute(
+                "SELECT result, created FROM geocode WHERE kind = ? AND query = ?",
+                (kind, query),
+            ).fetchone()
+        hit = row is not None and (self.ttl is None or time.time() - row[1] < self.ttl)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if hit else None
+
+    def put(self, kind: str, query: str, result: str) -> None:
+        """
+        Write a geocoding result to the cache
+
+        Args:
+            kind (str): Result kind ('point' or 'polygon')
+            query (str): Query key
+            result (str): Serialized result
+        """
+        with closing(self.connect()) as con, con:
+            con.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)",
+                (kind, query, result, time.time()),
+            )
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset hit/miss counters
+        """
+        with closing(self.connect()) as con, con:
+            con.execute("DELETE FROM geocode")
+        self.hits = self.misses = 0
+
+
+class Gazetteer:
+    """
+    Local gazetteer resolving place names and OSM ids without network access.
+    Reads any file supported by geopandas (GeoJSON, GeoPackage, ...) or a CSV file with
+    either a 'wkt' column or 'lat'/'lon' columns. Places are looked up by their 'name'
+    column (case-insensitive) and/or 'osmid' column (such as "R2088990"). Attributes:
+    - path: gazetteer file path
+    - places: GeoDataFrame of places (in EPSG:4326)
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = os.path.abspath(path)
+        if self.path.endswith(".csv"):
+            df = pd.read_csv(self.path)
+            geometry = (
+                df.pop("wkt").map(wkt.loads)
+                if "wkt" in df.columns
+                else gp.points_from_xy(df.pop("lon"), df.pop("lat"))
+            )
+            places = GeoDataFrame(df, geometry=geometry, crs=4326)
+        else:
+            places = gp.read_file(self.path).to_crs(4326)
+        self.places = places.reset_index(drop=True)
+
+        # Lookup tables
+        self.names = (
+            {
+                normalize(name): i
+                for i, name in reversed(list(enumerate(places["name"])))
+                if isinstance(name, str)
+            }
+            if "name" in places.columns
+            else {}
+        )
+        self.osmids = (
+            {
+                str(osmid).upper(): i
+                for i, osmid in enumerate(places["osmid"])
+                if isinstance(osmid, str)
+            }
+            if "osmid" in places.columns
+            else {}
+        )
+
+    def lookup(self, query: str, by_osmid: bool = False) -> Optional[int]:
+        """
+        Find a place in the gazetteer
+
+        Args:
+            query (str): Place name or OSM id
+            by_osmid (bool, optional): Whether 'query' is an OSM id. Defaults to False.
+
+        Returns:
+            Optional[int]: Place position (None if not found)
+        """
+        if by_osmid:
+            return self.osmids.get(query.upper())
+        return self.names.get(normalize(query))
+
+    def point(self, i: int) -> Tuple[float, float]:
+        point = self.places.geometry.iloc[i]
+        if point.geom_type != "Point":
+            point = point.centroid
+        return point.y, point.x
+
+    def gdf(self, i: int) -> GeoDataFrame:
+        return self.places.iloc[[i]].reset_index(drop=True)
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+
+class GeocodingSource(DataSource):
+    """
+    Data source answering geocoding queries from a local gazetteer and/or a persistent
+    geocoding cache before falling back to another data source. Other queries are
+    forwarded to that data source. Attributes:
+    - source: wrapped data source
+    - cache: geocoding cache (optional)
+    - gazetteer: local gazetteer (optional)
+    """
+
+    def __init__(
+        self,
+        source: Optional[Union[str, Path, DataSource]] = None,
+        cache: Optional[Union[str, Path, GeocodeCache]] = None,
+        gazetteer: Optional[Union[str, Path, Gazetteer]] = None,
+    ):
+        self.source = get_source(source)
+        self.cache = get_geocode_cache(cache)
+        self.gazetteer = get_gazetteer(gazetteer)
+
+    def cache_key(self):
+        return self.source.cache_key()
+
+    def graph_edges(self, polygon, custom_filter=None):
+        return self.source.graph_edges(polygon, custom_filter=custom_filter)
+
+    def features(self, polygon, tags):
+        return self.source.features(polygon, tags)
+
+    def geocode(self, query):
+        # 1. Local gazetteer
+        if self.gazetteer is not None:
+            i = self.gazetteer.lookup(query)
+            if i is not None:
+                return self.gazetteer.point(i)
+
+        # 2. Geocoding cache
+        if self.cache is not None:
+            result = self.cache.get("point", query)
+            if result is not None:
+                return tuple(json.loads(result))
+
+        # 3. Wrapped data source
+        point = self.source.geocode(query)
+        if self.cache is not None:
+            self.cache.put("point", query, json.dumps(list(point)))
+        return point
+
+    def geocode_to_gdf(self, query, by_osmid=False, **kwargs):
+        # 1. Local gazetteer
+        if self.gazetteer is not None and not kwargs:
+            i = self.gazetteer.lookup(query, by_osmid=by_osmid)
+            if i is not None:
+                return self.gazetteer.gdf(i)
+
+        # 2. Geocoding cache
+        key = json.dumps([query, by_osmid, kwargs], sort_keys=True, default=str)
+        if self.cache is not None:
+            result = self.cache.get("polygon", key)
+            if result is not None:
+                return GeoDataFrame.from_features(json.loads(result), crs=4326)
+
+        # 3. Wrapped data source
+        gdf = self.source.geocode_to_gdf(query, by_osmid=by_osmid, **kwargs)
+        if self.cache is not None:
+            self.cache.put("polygon", key, gdf.to_crs(4326).to_json(default=str))
+        return gdf
+
+
+# Caches and gazetteers are kept alive so that files are opened and indexed only once per process
+_geocode_caches = {}
+_gazetteers = {}
+
+
+def get_geocode_cache(
+    cache: Optional[Union[str, Path, GeocodeCache]] = None,
+) -> Optional[GeocodeCache]:
+    """
+    Resolve a geocoding cache
+
+    Args:
+        cache (Optional[Union[str, Path, GeocodeCache]], optional): None (no cache), a database path or a GeocodeCache object. Defaults to None.
+
+    Returns:
+        Optional[GeocodeCache]: Geocoding cache
+    """
+    if cache is None or isinstance(cache, GeocodeCache):
+        return cache
+    path = os.path.abspath(cache)
+    if path not in _geocode_caches:
+        _geocode_caches[path] = GeocodeCache(path)
+    return _geocode_caches[path]
+
+
+def get_gazetteer(
+    gazetteer: Optional[Union[str, Path, Gazetteer]] = None,
+) -> Optional[Gazetteer]:
+    """
+    Resolve a gazetteer
+
+    Args:
+        gazetteer (Optional[Union[str, Path, Gazetteer]], optional): None (no gazetteer), a gazetteer file path or a Gazetteer object. Defaults to None.
+
+    Returns:
+        Optional[Gazetteer]: Gazetteer
+    """
+    if gazetteer is None or isinstance(gazetteer, Gazetteer):
+        return gazetteer
+    path = os.path.abspath(gazetteer)
+    if path not in _gazetteers:
+        _gazetteers[path] = Gazetteer(path)
+    return _gazetteers[path]
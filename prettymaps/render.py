@@ -0,0 +1,1108 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import io
+import zlib
+import numpy as np
+import shapely
+import matplotlib
+import matplotlib.image
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, Tuple, List, Dict, Sequence, Union
+from matplotlib.path import Path
+from matplotlib.lines import Line2D
+from matplotlib.patches import PathPatch
+from matplotlib.colors import to_rgba
+from matplotlib.transforms import Affine2D, IdentityTransform
+from shapely.geometry.base import BaseGeometry
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+
+from .tracing import Tracer, get_tracer
+from .draw import (
+    DrawSpec,
+    compile_style,
+    hash_colors,
+    shape_keys,
+    polygons_to_path_data,
+    get_credit_params,
+)
+
+# Page units per inch: pages are measured in points, like matplotlib's line widths
+POINTS_PER_INCH = 72
+
+# Number of shapes converted to page coordinates at once (bounds memory use)
+CHUNK_SIZE = 1024
+
+# Empty path, used to resolve matplotlib styles into colors and widths
+_EMPTY_PATH = Path(np.zeros((1, 2)))
+
+RGBA = Tuple[float, float, float, float]
+
+
+@dataclass(frozen=True)
+class Fill:
+    """
+    Fill style. Attributes:
+    - color: Fill color (None for no fill)
+    - hatch: matplotlib hatch pattern (such as "ooo...")
+    - hatch_color: Hatch color
+    - hatch_width: Hatch line width (in points)
+    """
+
+    color: Optional[RGBA]
+    hatch: Optional[str] = None
+    hatch_color: Optional[RGBA] = None
+    hatch_width: float = 1.0
+
+
+@dataclass(frozen=True)
+class Stroke:
+    """
+    Stroke style. Attributes:
+    - color: Stroke color
+    - width: Stroke width (in points)
+    - dashes: (offset, [on, off, ...]) dash pattern (in points), or None for solid strokes
+    - capstyle: 'butt', 'round' or 'projecting'
+    - joinstyle: 'miter', 'round' or 'bevel'
+    """
+
+    color: RGBA
+    width: float
+    dashes: Optional[Tuple[float, Tuple[float, ...]]] = None
+    capstyle: str = "butt"
+    joinstyle: str = "miter"
+
+
+def get_fill(patch: PathPatch) -> Optional[Fill]:
+    # Fill of a (template) matplotlib patch
+    color = tuple(patch.get_facecolor()) if patch.get_fill() else None
+    if color is not None and color[3] == 0:
+        color = None
+    hatch = patch.get_hatch()
+    if (color is None) and not hatch:
+        return None
+    return Fill(
+        color,
+        hatch or None,
+        tuple(
+            to_rgba(
+                (
+                    patch.get_hatchcolor()
+                    if hasattr(patch, "get_hatchcolor")
+                    else patch._hatch_color
+                ),
+                patch.get_alpha(),
+            )
+        ),
+        (
+            patch.get_hatch_linewidth()
+            if hasattr(patch, "get_hatch_linewidth")
+            else matplotlib.rcParams["hatch.linewidth"]
+        ),
+    )
+
+
+def get_stroke(artist) -> Optional[Stroke]:
+    # Stroke of a (template) matplotlib patch or line
+    if isinstance(artist, Line2D):
+        color = to_rgba(artist.get_color(), artist.get_alpha())
+        capstyle, joinstyle = (
+            (artist.get_dash_capstyle(), artist.get_dash_joinstyle())
+            if artist.is_dashed()
+            else (artist.get_solid_capstyle(), artist.get_solid_joinstyle())
+        )
+    else:
+        color = tuple(artist.get_edgecolor())
+        capstyle, joinstyle = artist.get_capstyle(), artist.get_joinstyle()
+    width = artist.get_linewidth()
+    if (width <= 0) or (color[3] == 0):
+        return None
+    offset, dashes = getattr(artist, "_dash_pattern", (0, None))
+    return Stroke(
+        tuple(color),
+        width,
+        (offset, tuple(dashes)) if dashes else None,
+        capstyle,
+        joinstyle,
+    )
+
+
+def hatch_path(
+    hatch: str, size: float = POINTS_PER_INCH
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vertices and codes of a hatch pattern's tile (a square of side 'size' points, as drawn
+    by matplotlib's backends), with curves flattened into line segments
+    """
+    vertices, codes = lines_path(Path.hatch(hatch).to_polygons(closed_only=False))
+    return vertices * size, codes
+
+
+def format_path(
+    vertices: np.ndarray, codes: np.ndarray, precision: int, pdf: bool = False
+) -> str:
+    """
+    Format path vertices (with MOVETO, LINETO and CLOSEPOLY codes) as SVG path data,
+    or as PDF path construction operators
+
+    Args:
+        vertices (np.ndarray): Vertices (in page coordinates)
+        codes (np.ndarray): matplotlib Path codes
+        precision (int): Number of decimals
+        pdf (bool, optional): Whether to output PDF operators. Defaults to False.
+
+    Returns:
+        str: Path data
+    """
+    f = f"{{:.{precision}f}}"
+    if pdf:
+        ops = {Path.MOVETO: f"{f} {f} m", Path.LINETO: f"{f} {f} l"}
+        close = "h"
+    else:
+        ops = {Path.MOVETO: f"M{f} {f}", Path.LINETO: f"L{f} {f}"}
+        close = "Z"
+    return " ".join(
+        close if code == Path.CLOSEPOLY else ops[code].format(x, y)
+        for (x, y), code in zip(vertices.tolist(), codes.tolist())
+    )
+
+
+def lines_path(lines: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate polylines' vertices into a single path's vertices and codes
+    """
+    vertices = np.concatenate(lines)
+    codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+    codes[np.cumsum([0] + [len(line) for line in lines[:-1]])] = Path.MOVETO
+    return vertices, codes
+
+
+def get_view_limits(
+    bounds: Tuple[float, float, float, float], box_aspect: float
+) -> Tuple[float, float, float, float]:
+    """
+    View limits of a matplotlib axis autoscaled to data bounds with equal aspect and
+    adjustable data limits (as plot() sets it up): default margins are added, then one of
+    the intervals is expanded or shrunk around its center to the axis' aspect ratio
+
+    Args:
+        bounds (Tuple[float, float, float, float]): Data bounds (xmin, ymin, xmax, ymax)
+        box_aspect (float): Height / width ratio of the axis
+
+    Returns:
+        Tuple[float, float, float, float]: View limits (xmin, ymin, xmax, ymax)
+    """
+    xmin, ymin, xmax, ymax = bounds
+    dx, dy = max(xmax - xmin, 1e-9), max(ymax - ymin, 1e-9)
+    xmargin = matplotlib.rcParams["axes.xmargin"] * dx
+    ymargin = matplotlib.rcParams["axes.ymargin"] * dy
+    xmin, xmax, ymin, ymax = (
+        xmin - xmargin,
+        xmax + xmargin,
+        ymin - ymargin,
+        ymax + ymargin,
+    )
+
+    # Same choice of interval as matplotlib.axes.Axes.apply_aspect()
+    xsize, ysize = xmax - xmin, ymax - ymin
+    y_expander = box_aspect * xsize / ysize - 1
+    if abs(y_expander) < 0.005:
+        return xmin, ymin, xmax, ymax
+    xr, yr = 1.05 * dx, 1.05 * dy
+    Xsize, Ysize = ysize / box_aspect, box_aspect * xsize
+    if (xsize > xr) and (ysize > yr):
+        adjust_y = (Ysize > yr and y_expander < 0) or (Xsize < xr and y_expander > 0)
+    else:
+        adjust_y = y_expander > 0
+    if adjust_y:
+        yc = (ymin + ymax) / 2
+        return xmin, yc - Ysize / 2, xmax, yc + Ysize / 2
+    xc = (xmin + xmax) / 2
+    return xc - Xsize / 2, ymin, xc + Xsize / 2, ymax
+
+
+class Writer(ABC):
+    """
+    Base class of the writers drawing a Scene (see Scene.draw()). Pages are measured in
+    points, with the origin at their bottom left corner. Writers implement begin(), path(),
+    text() and end()
+    """
+
+    @abstractmethod
+    def begin(self, width: float, height: float, facecolor: RGBA) -> None: ...
+
+    @abstractmethod
+    def path(
+        self,
+        vertices: np.ndarray,
+        codes: np.ndarray,
+        fill: Optional[Fill],
+        stroke: Optional[Stroke],
+    ) -> None:
+        """
+        Draw a path: fill it (nonzero winding rule), then hatch it, then stroke it
+        """
+
+    def shape(
+        self,
+        vertices: np.ndarray,
+        codes: np.ndarray,
+        fill: Optional[Fill],
+        stroke: Optional[Stroke],
+    ) -> None:
+        """
+        Draw a layer's shape: its fill and its silhouette, which matplotlib draws as two
+        patches (see prettymaps.draw.plot_gdf()). Drawn as a single path by default
+        """
+        self.path(vertices, codes, fill, stroke)
+
+    @abstractmethod
+    def text(
+        self,
+        x: float,
+        y: float,
+        lines: List[str],
+        size: float,
+        color: RGBA,
+        family: str,
+        ha: str,
+        va: str,
+        box: Optional[Tuple[Optional[RGBA], Optional[RGBA]]],
+        params: dict,
+    ) -> None:
+        """
+        Draw (monospace) text lines anchored at (x, y), with an optional (face, edge) colored box.
+        'params' holds all the matplotlib text parameters the other arguments were resolved from
+        """
+
+    @abstractmethod
+    def end(self) -> None: ...
+
+
+class Scene:
+    """
+    Processed layers of a map, styled and ordered as prettymaps.plot() draws them in matplotlib
+    mode, to be drawn by a Writer without creating any matplotlib artist. Shapes are converted
+    to page coordinates one chunk at a time, as they are drawn. Attributes:
+    - width, height: Page size (in points)
+    - matrix: Affine transformation from (projected) map coordinates to page coordinates
+    - items: (zorder, layer, draw function) of each group of shapes, in drawing order
+    """
+
+    def __init__(
+        self,
+        geometries: Dict[str, object],
+        specs: Dict[str, DrawSpec],
+        transform: Affine2D,
+        figsize: Tuple[float, float] = (12, 12),
+        background: Optional[BaseGeometry] = None,
+        background_style: Optional[dict] = None,
+        credit: Optional[dict] = None,
+        rng: Optional[np.random.Generator] = None,
+        color_seed: Optional[int] = None,
+        keys: Optional[Dict[str, Optional[np.ndarray]]] = None,
+    ):
+        """
+        Args:
+            geometries (Dict[str, object]): Geometry to draw for each layer, in drawing order (LayerGeometry.simplified: a shapely geometry, or (lines, widths) for layers drawn as strokes)
+            specs (Dict[str, DrawSpec]): Compiled style of each layer (see prettymaps.draw.compile_style())
+            transform (Affine2D): Affine transformation applied to the (projected) geometries
+            figsize (Tuple[float, float], optional): Page size (in inches). Defaults to (12, 12).
+            background (Optional[BaseGeometry], optional): Background (in transformed coordinates), which positions the credit message. Defaults to None.
+            background_style (Optional[dict], optional): Background style (prettymaps.plot() 'style' parameter of the 'background' layer), if the background is drawn. Defaults to None.
+            credit (Optional[dict], optional): Credit message parameters (see prettymaps.draw.draw_text()), if drawn. Defaults to None.
+            rng (Optional[np.random.Generator], optional): Random number generator used to pick palette colors. Defaults to None (numpy's global random state).
+            color_seed (Optional[int], optional): If provided, palette colors are picked by hashing the feature of each shape (see prettymaps.draw.hash_colors()). Defaults to None.
+            keys (Optional[Dict[str, Optional[np.ndarray]]], optional): Feature key of each shape of each layer (LayerGeometry.keys), used with 'color_seed'. Defaults to None.
+        """
+        self.width = figsize[0] * POINTS_PER_INCH
+        self.height = figsize[1] * POINTS_PER_INCH
+        self.transform = transform
+        self.rng = rng if rng is not None else np.random
+        self.color_seed = color_seed
+        self.items = []
+        self.bounds = []
+
+        affine = transform.get_matrix()
+        keys = keys or {}
+        for layer, geometry in geometries.items():
+            self.add_layer(
+                layer,
+                geometry,
+                specs.get(layer) or compile_style({}),
+                affine,
+                keys.get(layer),
+            )
+        if (background is not None) and (background_style is not None):
+            self.add_background(background, background_style)
+
+        # Page transformation: the view limits of plot()'s matplotlib axis
+        if not self.bounds:
+            self.bounds.append(np.array([0, 0, 1, 1]))
+        xmin, ymin = np.min([b[:2] for b in self.bounds], axis=0)
+        xmax, ymax = np.max([b[2:] for b in self.bounds], axis=0)
+        xmin, ymin, xmax, ymax = get_view_limits(
+            (xmin, ymin, xmax, ymax), self.height / self.width
+        )
+        self.page = (
+            Affine2D()
+            .translate(-xmin, -ymin)
+            .scale(self.width / (xmax - xmin), self.height / (ymax - ymin))
+        )
+        self.matrix = (transform + self.page).get_matrix()
+        self.points_per_unit = np.sqrt(np.abs(np.linalg.det(self.matrix[:2, :2])))
+
+        # Credit message (drawn in zorder too, as a matplotlib text artist would be)
+        if credit is not None:
+            self.credit = get_credit_params(credit)
+            self.credit_bounds = (
+                background.bounds
+                if background is not None
+                else (xmin, ymin, xmax, ymax)
+            )
+            self.items.append(
+                (
+                    self.credit.pop("zorder", 3),
+                    "credit",
+                    lambda writer: self.draw_credit(writer),
+                )
+            )
+
+        # Stable sort: shapes with the same zorder are drawn in the order they were added
+        self.items.sort(key=lambda item: item[0])
+
+    def to_page(self, vertices: np.ndarray) -> np.ndarray:
+        return vertices @ self.matrix[:2, :2].T + self.matrix[:2, 2]
+
+    def add_bounds(self, geometries: np.ndarray, affine: Optional[np.ndarray]) -> None:
+        # Bounds of the transformed geometries (computed one chunk of shapes at a time)
+        for start in range(0, len(geometries), CHUNK_SIZE):
+            coords = shapely.get_coordinates(geometries[start : start + CHUNK_SIZE])
+            if len(coords) == 0:
+                continue
+            if affine is not None:
+                coords = coords @ affine[:2, :2].T + affine[:2, 2]
+            self.bounds.append(np.concatenate([coords.min(axis=0), coords.max(axis=0)]))
+
+    def add_layer(
+        self,
+        layer: str,
+        geometry,
+        spec: DrawSpec,
+        affine: np.ndarray,
+        keys: Optional[np.ndarray] = None,
+    ):
+        kwargs = spec.kwargs
+
+        # Street networks drawn as strokes (see prettymaps.draw.plot_strokes())
+        if isinstance(geometry, tuple):
+            lines, widths = geometry
+            if len(lines) == 0:
+                return
+            self.add_bounds(np.asarray(lines), affine)
+            if spec.palette and (self.color_seed is not None):
+                fc = spec.palette[
+                    zlib.crc32(layer.encode(), self.color_seed) % len(spec.palette)
+                ]
+            elif spec.palette:
+                fc = self.rng.choice(spec.palette)
+            else:
+                fc = kwargs.get("fc", matplotlib.rcParams["patch.facecolor"])
+            lw = kwargs.get("lw", matplotlib.rcParams["patch.linewidth"])
+            lw = lw if (("ec" not in kwargs) or (kwargs["ec"] is not None)) else 0
+            alpha = kwargs.get("alpha")
+            strokes = []
+            if lw:
+                ec = kwargs.get("ec", matplotlib.rcParams["patch.edgecolor"])
+                strokes.append((to_rgba(ec, alpha), lw))
+            if kwargs.get("fill", True):
+                strokes.append((to_rgba(fc, alpha), -lw))
+            self.items.append(
+                (
+                    kwargs.get("zorder", 2),
+                    layer,
+                    lambda writer: self.draw_strokes(writer, lines, widths, strokes),
+                )
+            )
+            return
+
+        shapes = np.array(
+            list(geometry.geoms) if hasattr(geometry, "geoms") else [geometry],
+            dtype=object,
+        )
+        keys = shape_keys(layer, keys, len(shapes))
+        nonempty = ~shapely.is_empty(shapes)
+        shapes, keys = shapes[nonempty], keys[nonempty]
+        if len(shapes) == 0:
+            return
+        self.add_bounds(shapes, affine)
+        type_ids = shapely.get_type_id(shapes)
+
+        # Polygons: a fill (and hatch) patch and a silhouette patch per shape
+        is_polygon = np.isin(
+            type_ids, [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON]
+        )
+        polygons = shapes[is_polygon]
+        if len(polygons) > 0:
+            # Palette colors are picked in the same order as plot_gdf() does
+            colors = None
+            if ("fc" not in kwargs) and spec.palette:
+                if self.color_seed is not None:
+                    colors = hash_colors(
+                        keys[is_polygon], spec.palette, self.color_seed
+                    )
+                else:
+                    colors = [self.rng.choice(spec.palette) for _ in polygons]
+            fill_patch = PathPatch(
+                _EMPTY_PATH, fc=spec.fc if "fc" in kwargs else None, **spec.fill_kwargs
+            )
+            silhouette = get_stroke(PathPatch(_EMPTY_PATH, **spec.silhouette_kwargs))
+            self.items.append(
+                (
+                    fill_patch.get_zorder(),
+                    layer,
+                    lambda writer: self.draw_polygons(
+                        writer, polygons, fill_patch, colors, silhouette
+                    ),
+                )
+            )
+
+        # Lines
+        lines = shapes[
+            np.isin(
+                type_ids,
+                [shapely.GeometryType.LINESTRING, shapely.GeometryType.MULTILINESTRING],
+            )
+        ]
+        if len(lines) > 0:
+            line = Line2D([], [], **spec.line_kwargs)
+            stroke = get_stroke(line)
+            if stroke is not None:
+                self.items.append(
+                    (
+                        line.get_zorder(),
+                        layer,
+                        lambda writer: self.draw_lines(
+                            writer, shapely.get_parts(lines), stroke
+                        ),
+                    )
+                )
+
+    def add_background(self, background: BaseGeometry, style: dict) -> None:
+        self.add_bounds(np.array([background]), None)
+        patch = PathPatch(
+            _EMPTY_PATH,
+            **{k: v for k, v in style.items() if k not in ["pad", "dilate", "zorder"]},
+            zorder=style.get("zorder", -1),
+        )
+        fill, stroke = get_fill(patch), get_stroke(patch)
+        vertices, codes, _ = polygons_to_path_data(background)
+        self.items.append(
+            (
+                patch.get_zorder(),
+                "background",
+                lambda writer: writer.path(
+                    self.page.transform(vertices), codes, fill, stroke
+                ),
+            )
+        )
+
+    def draw_polygons(
+        self,
+        writer: Writer,
+        polygons: np.ndarray,
+        fill_patch: PathPatch,
+        colors: Optional[List[str]],
+        silhouette: Optional[Stroke],
+    ) -> None:
+        fill = get_fill(fill_patch)
+        fills = {}
+        alpha = fill_patch.get_alpha()
+        for start in range(0, len(polygons), CHUNK_SIZE):
+            chunk = polygons[start : start + CHUNK_SIZE]
+            vertices, codes, counts = polygons_to_path_data(chunk)
+            vertices = self.to_page(vertices)
+            ends = np.cumsum(counts)
+            for i, (end, count) in enumerate(zip(ends, counts)):
+                if count == 0:
+                    continue
+                if colors is not None:
+                    color = colors[start + i]
+                    if color not in fills:
+                        fills[color] = Fill(
+                            to_rgba(color, alpha),
+                            *(
+                                (fill.hatch, fill.hatch_color, fill.hatch_width)
+                                if fill is not None
+                                else ()
+                            ),
+                        )
+                    shape_fill = fills[color]
+                else:
+                    shape_fill = fill
+                writer.shape(
+                    vertices[end - count : end],
+                    codes[end - count : end],
+                    shape_fill,
+                    silhouette,
+                )
+
+    def draw_lines(self, writer: Writer, lines: np.ndarray, stroke: Stroke) -> None:
+        for start in range(0, len(lines), CHUNK_SIZE):
+            coords, index = shapely.get_coordinates(
+                lines[start : start + CHUNK_SIZE], return_index=True
+            )
+            if len(coords) == 0:
+                continue
+            segments = np.split(
+                self.to_page(coords), np.flatnonzero(np.diff(index)) + 1
+            )
+            writer.path(*lines_path(segments), None, stroke)
+
+    def draw_strokes(
+        self,
+        writer: Writer,
+        lines: np.ndarray,
+        widths: np.ndarray,
+        strokes: List[Tuple[RGBA, float]],
+    ) -> None:
+        coords, index = shapely.get_coordinates(lines, return_index=True)
+        segments = np.split(self.to_page(coords), np.flatnonzero(np.diff(index)) + 1)
+        line_widths = np.asarray(widths)[np.unique(index)]
+        # Outline strokes (all of them) below fill strokes, one path per stroke width
+        for color, extra_width in strokes:
+            for width in np.unique(line_widths):
+                stroke_width = max(2 * width * self.points_per_unit + extra_width, 0)
+                if stroke_width == 0:
+                    continue
+                writer.path(
+                    *lines_path(
+                        [s for s, w in zip(segments, line_widths) if w == width]
+                    ),
+                    None,
+                    Stroke(color, stroke_width, None, "round", "round"),
+                )
+
+    def draw_credit(self, writer: Writer) -> None:
+        params = dict(self.credit)
+        xmin, ymin, xmax, ymax = self.credit_bounds
+        x, y = self.page.transform(
+            [
+                [
+                    np.interp(params.pop("x"), [0, 1], [xmin, xmax]),
+                    np.interp(params.pop("y"), [0, 1], [ymin, ymax]),
+                ]
+            ]
+        )[0]
+        bbox = params.get("bbox")
+        writer.text(
+            x,
+            y,
+            str(params.pop("text")).split("\n"),
+            params.get(
+                "fontsize", params.get("size", matplotlib.rcParams["font.size"])
+            ),
+            to_rgba(
+                params.get("color", params.get("c", matplotlib.rcParams["text.color"]))
+            ),
+            params.get("fontfamily", "monospace"),
+            params.get("horizontalalignment", params.get("ha", "left")),
+            params.get("verticalalignment", params.get("va", "baseline")),
+            (
+                (
+                    to_rgba(bbox["fc"]) if bbox.get("fc") is not None else None,
+                    to_rgba(bbox["ec"]) if bbox.get("ec") is not None else None,
+                )
+                if bbox
+                else None
+            ),
+            params,
+        )
+
+    def draw(self, writer: Writer, tracer: Optional[Tracer] = None) -> None:
+        """
+        Draw the scene with a writer (in zorder, streaming shapes to the writer)
+
+        Args:
+            writer (Writer): Writer
+            tracer (Optional[Tracer], optional): Records a 'draw' span per group of shapes (with its layer). Defaults to None.
+        """
+        tracer = get_tracer(tracer)
+        facecolor = matplotlib.rcParams["savefig.facecolor"]
+        if isinstance(facecolor, str) and facecolor == "auto":
+            facecolor = matplotlib.rcParams["figure.facecolor"]
+        writer.begin(self.width, self.height, to_rgba(facecolor))
+        for _, layer, draw in self.items:
+            with tracer.span("draw", layer):
+                draw(writer)
+        writer.end()
+
+
+def svg_color(color: RGBA) -> str:
+    return "#{:02x}{:02x}{:02x}".format(*[int(round(c * 255)) for c in color[:3]])
+
+
+SVG_CAPSTYLES = {"butt": "butt", "round": "round", "projecting": "square"}
+
+
+class SVGWriter(Writer):
+    """
+    Writes a scene as an SVG file, streaming each shape to the file as it is drawn.
+    Coordinates are written with 'precision' decimals (in points)
+    """
+
+    def __init__(self, file, precision: int = 2):
+        self.file = file
+        self.precision = precision
+        self.patterns = {}
+        self.n_paths = 0
+
+    def begin(self, width: float, height: float, facecolor: RGBA) -> None:
+        self.height = height
+        self.file.write(
+            '<?xml version="1.0" encoding="utf-8" standalone="no"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{width:g}pt" height="{height:g}pt" viewBox="0 0 {width:g} {height:g}" version="1.1">\n'
+            f'<rect width="{width:g}" height="{height:g}" {self.fill_attributes(Fill(facecolor))}/>\n'
+            # Page coordinates have their origin at the bottom left corner
+            f'<g transform="matrix(1 0 0 -1 0 {height:g})">\n'
+        )
+
+    def fill_attributes(self, fill: Optional[Fill]) -> str:
+        if fill is None or fill.color is None:
+            return 'fill="none"'
+        attributes = f'fill="{svg_color(fill.color)}"'
+        if fill.color[3] < 1:
+            attributes += f' fill-opacity="{fill.color[3]:g}"'
+        return attributes
+
+    def stroke_attributes(self, stroke: Optional[Stroke]) -> str:
+        if stroke is None:
+            return 'stroke="none"'
+        attributes = (
+            f'stroke="{svg_color(stroke.color)}" stroke-width="{stroke.width:g}" '
+            f'stroke-linecap="{SVG_CAPSTYLES[stroke.capstyle]}" '
+            f'stroke-linejoin="{stroke.joinstyle}"'
+        )
+        if stroke.color[3] < 1:
+            attributes += f' stroke-opacity="{stroke.color[3]:g}"'
+        if stroke.dashes is not None:
+            offset, dashes = stroke.dashes
+            attributes += f' stroke-dasharray="{" ".join(f"{d:g}" for d in dashes)}"'
+            if offset:
+                attributes += f' stroke-dashoffset="{offset:g}"'
+        return attributes
+
+    def hatch_pattern(self, fill: Fill) -> str:
+        key = (fill.hatch, fill.hatch_color, fill.hatch_width)
+        if key not in self.patterns:
+            pattern_id = f"h{len(self.patterns)}"
+            vertices, codes = hatch_path(fill.hatch)
+            size = POINTS_PER_INCH
+            self.file.write(
+                f'<defs><pattern id="{pattern_id}" patternUnits="userSpaceOnUse" '
+                f'width="{size}" height="{size}">'
+                f'<path d="{format_path(vertices, codes, self.precision)}" '
+                f"{self.fill_attributes(Fill(fill.hatch_color))} "
+                f"{self.stroke_attributes(Stroke(fill.hatch_color, fill.hatch_width))}/>"
+                "</pattern></defs>\n"
+            )
+            self.patterns[key] = pattern_id
+        return self.patterns[key]
+
+    def path(self, vertices, codes, fill, stroke) -> None:
+        data = format_path(vertices, codes, self.precision)
+        if fill is None or not fill.hatch:
+            self.file.write(
+                f'<path d="{data}" {self.fill_attributes(fill)} {self.stroke_attributes(stroke)}/>\n'
+            )
+            return
+        # Hatched path: fill, hatch and stroke the same path data
+        pattern_id = self.hatch_pattern(fill)
+        path_id = f"p{self.n_paths}"
+        self.n_paths += 1
+        opacity = (
+            f' fill-opacity="{fill.hatch_color[3]:g}"'
+            if fill.hatch_color[3] < 1
+            else ""
+        )
+        self.file.write(
+            f'<defs><path id="{path_id}" d="{data}"/></defs>'
+            f'<use xlink:href="#{path_id}" {self.fill_attributes(fill)} stroke="none"/>'
+            f'<use xlink:href="#{path_id}" fill="url(#{pattern_id})"{opacity} stroke="none"/>'
+            + (
+                f'<use xlink:href="#{path_id}" fill="none" {self.stroke_attributes(stroke)}/>'
+                if stroke is not None
+                else ""
+            )
+            + "\n"
+        )
+
+    def text(self, x, y, lines, size, color, family, ha, va, box, params) -> None:
+        y = self.height - y
+        line_height = 1.2 * size
+        width = 0.6 * size * max(len(line) for line in lines)
+        height = line_height * len(lines)
+        left = x - {"left": 0, "center": width / 2, "right": width}.get(ha, 0)
+        top = y - {"top": 0, "center": height / 2}.get(va, height)
+        self.file.write("</g>\n")
+        if box is not None:
+            pad = 0.3 * size
+            self.file.write(
+                f'<rect x="{left - pad:g}" y="{top - pad:g}" width="{width + 2 * pad:g}" '
+                f'height="{height + 2 * pad:g}" {self.fill_attributes(Fill(box[0]))} '
+                f"{self.stroke_attributes(Stroke(box[1], 1) if box[1] else None)}/>\n"
+            )
+        self.file.write(
+            f'<text font-family="{escape(family)}, monospace" font-size="{size:g}" '
+            f'fill="{svg_color(color)}" xml:space="preserve">'
+            + "".join(
+                f'<tspan x="{left:g}" y="{top + (i + 0.8) * line_height:g}">{escape(line)}</tspan>'
+                for i, line in enumerate(lines)
+            )
+            + "</text>\n"
+            f'<g transform="matrix(1 0 0 -1 0 {self.height:g})">\n'
+        )
+
+    def end(self) -> None:
+        self.file.write("</g>\n</svg>\n")
+
+
+def escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+PDF_CAPSTYLES = {"butt": 0, "round": 1, "projecting": 2}
+PDF_JOINSTYLES = {"miter": 0, "round": 1, "bevel": 2}
+
+
+class PDFWriter(Writer):
+    """
+    Writes a scene as a single page PDF file, streaming each shape to the (compressed) page
+    content stream as it is drawn. Coordinates are written with 'precision' decimals (in points)
+    """
+
+    def __init__(self, file, precision: int = 2):
+        self.file = file
+        self.precision = precision
+        self.offsets = {}
+        self.alphas = {}
+        self.patterns = {}
+        self.position = 0
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.position += len(data)
+
+    def write_object(self, number: int, content: bytes) -> None:
+        self.offsets[number] = self.position
+        self.write(f"{number} 0 obj\n".encode() + content + b"\nendobj\n")
+
+    def content(self, operators: str) -> None:
+        # Append operators to the page content stream
+        data = self.compressor.compress((operators + "\n").encode("latin-1"))
+        self.length += len(data)
+        self.write(data)
+
+    def begin(self, width: float, height: float, facecolor: RGBA) -> None:
+        # Objects: 1 catalog, 2 pages, 3 page, 4 content stream, 5 its length, 6 resources,
+        # 7 font, then graphics states and hatch patterns
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self.write_object(2, b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+        self.write_object(
+            3,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:g} {height:g}] "
+            "/Contents 4 0 R /Resources 6 0 R >>".encode(),
+        )
+        self.offsets[4] = self.position
+        self.write(b"4 0 obj\n<< /Length 5 0 R /Filter /FlateDecode >>\nstream\n")
+        self.compressor = zlib.compressobj()
+        self.length = 0
+        self.content(f"q {self.color(facecolor, 'rg')} 0 0 {width:g} {height:g} re f Q")
+
+    def color(self, color: RGBA, operator: str) -> str:
+        return f"{color[0]:.4g} {color[1]:.4g} {color[2]:.4g} {operator}"
+
+    def alpha(self, fill: float, stroke: float) -> str:
+        if fill == 1 and stroke == 1:
+            return ""
+        key = (round(fill, 4), round(stroke, 4))
+        if key not in self.alphas:
+            self.alphas[key] = f"A{len(self.alphas)}"
+        return f"/{self.alphas[key]} gs "
+
+    def stroke_state(self, stroke: Stroke) -> str:
+        state = (
+            f"{self.color(stroke.color, 'RG')} {stroke.width:g} w "
+            f"{PDF_CAPSTYLES[stroke.capstyle]} J {PDF_JOINSTYLES[stroke.joinstyle]} j"
+        )
+        if stroke.dashes is not None:
+            offset, dashes = stroke.dashes
+            state += f" [{' '.join(f'{d:g}' for d in dashes)}] {offset:g} d"
+        return state
+
+    def path(self, vertices, codes, fill, stroke) -> None:
+        data = format_path(vertices, codes, self.precision, pdf=True)
+        fill_color = fill.color if fill is not None else None
+        if fill_color is not None and (stroke is None or not fill.hatch):
+            # Fill (and stroke) at once
+            self.content(
+                f"q {self.alpha(fill_color[3], stroke.color[3] if stroke else 1)}"
+                f"{self.color(fill_color, 'rg')} "
+                + (f"{self.stroke_state(stroke)} " if stroke else "")
+                + f"{data} {'B' if stroke else 'f'} Q"
+            )
+            if fill is not None and fill.hatch:
+                self.hatch(data, fill)
+            return
+        if fill_color is not None:
+            self.content(
+                f"q {self.alpha(fill_color[3], 1)}{self.color(fill_color, 'rg')} {data} f Q"
+            )
+        if fill is not None and fill.hatch:
+            self.hatch(data, fill)
+        if stroke is not None:
+            self.content(
+                f"q {self.alpha(1, stroke.color[3])}{self.stroke_state(stroke)} {data} S Q"
+            )
+
+    def hatch(self, data: str, fill: Fill) -> None:
+        key = (fill.hatch, fill.hatch_width)
+        if key not in self.patterns:
+            self.patterns[key] = f"H{len(self.patterns)}"
+        self.content(
+            f"q {self.alpha(fill.hatch_color[3], 1)}/CS0 cs "
+            f"{fill.hatch_color[0]:.4g} {fill.hatch_color[1]:.4g} {fill.hatch_color[2]:.4g} "
+            f"/{self.patterns[key]} scn {data} f Q"
+        )
+
+    def text(self, x, y, lines, size, color, family, ha, va, box, params) -> None:
+        line_height = 1.2 * size
+        width = 0.6 * size * max(len(line) for line in lines)
+        height = line_height * len(lines)
+        left = x - {"left": 0, "center": width / 2, "right": width}.get(ha, 0)
+        top = y + {"top": 0, "center": height / 2}.get(va, height)
+        if box is not None:
+            pad = 0.3 * size
+            rect = f"{left - pad:g} {top - height - pad:g} {width + 2 * pad:g} {height + 2 * pad:g} re"
+            if box[0] is not None:
+                self.content(f"q {self.color(box[0], 'rg')} {rect} f Q")
+            if box[1] is not None:
+                self.content(f"q {self.stroke_state(Stroke(box[1], 1))} {rect} S Q")
+        text = " ".join(
+            f"{left:g} {top - (i + 0.8) * line_height:g} Td ({pdf_string(line)}) Tj "
+            f"{-left:g} {-(top - (i + 0.8) * line_height):g} Td"
+            for i, line in enumerate(lines)
+        )
+        self.content(f"q BT {self.color(color, 'rg')} /F1 {size:g} Tf {text} ET Q")
+
+    def end(self) -> None:
+        data = self.compressor.flush()
+        self.length += len(data)
+        self.write(data)
+        self.write(b"\nendstream\nendobj\n")
+        self.write_object(5, str(self.length).encode())
+
+        # Resources
+        number = 8
+        states, patterns = {}, {}
+        for (fill, stroke), name in self.alphas.items():
+            self.write_object(
+                number, f"<< /Type /ExtGState /ca {fill:g} /CA {stroke:g} >>".encode()
+            )
+            states[name] = number
+            number += 1
+        for (hatch, width), name in self.patterns.items():
+            vertices, codes = hatch_path(hatch)
+            tile = f"{width:g} w {format_path(vertices, codes, self.precision, pdf=True)} B"
+            size = POINTS_PER_INCH
+            self.write_object(
+                number,
+                (
+                    f"<< /Type /Pattern /PatternType 1 /PaintType 2 /TilingType 1 "
+                    f"/BBox [0 0 {size} {size}] /XStep {size} /YStep {size} "
+                    f"/Resources << >> /Length {len(tile)} >>\nstream\n{tile}\nendstream"
+                ).encode(),
+            )
+            patterns[name] = number
+            number += 1
+        self.write_object(
+            7,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        )
+        self.write_object(
+            6,
+            (
+                "<< /Font << /F1 7 0 R >> /ColorSpace << /CS0 [/Pattern /DeviceRGB] >> "
+                f"/ExtGState << {' '.join(f'/{n} {i} 0 R' for n, i in states.items())} >> "
+                f"/Pattern << {' '.join(f'/{n} {i} 0 R' for n, i in patterns.items())} >> >>"
+            ).encode(),
+        )
+
+        # Cross-reference table
+        xref = self.position
+        self.write(f"xref\n0 {number}\n0000000000 65535 f \n".encode())
+        for i in range(1, number):
+            self.write(f"{self.offsets[i]:010d} 00000 n \n".encode())
+        self.write(
+            f"trailer\n<< /Size {number} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        )
+
+
+def pdf_string(text: str) -> str:
+    text = text.encode("cp1252", errors="replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class AggWriter(Writer):
+    """
+    Draws a scene onto an Agg canvas (the renderer behind matplotlib's PNG output) with 'dpi'
+    pixels per inch, drawing each shape as it is received. Attributes:
+    - renderer: matplotlib RendererAgg (its RGBA buffer holds the image once drawn)
+    """
+
+    def __init__(self, dpi: float = 300):
+        self.dpi = dpi
+        self.renderer = None
+
+    def begin(self, width: float, height: float, facecolor: RGBA) -> None:
+        self.renderer = RendererAgg(
+            int(round(width * self.dpi / POINTS_PER_INCH)),
+            int(round(height * self.dpi / POINTS_PER_INCH)),
+            self.dpi,
+        )
+        self.transform = Affine2D().scale(self.dpi / POINTS_PER_INCH)
+        self.path(
+            np.array([[0, 0], [width, 0], [width, height], [0, height], [0, 0]]),
+            np.array([Path.MOVETO] + [Path.LINETO] * 3 + [Path.CLOSEPOLY]),
+            Fill(facecolor),
+            None,
+        )
+
+    def new_gc(self, fill: Optional[Fill], stroke: Optional[Stroke]):
+        # Graphics context set up as matplotlib patches and lines set theirs up
+        gc = self.renderer.new_gc()
+        gc.set_antialiased(True)
+        if stroke is not None:
+            gc.set_linewidth(stroke.width)
+            gc.set_foreground(stroke.color, isRGBA=True)
+            gc.set_capstyle(stroke.capstyle)
+            gc.set_joinstyle(stroke.joinstyle)
+            gc.set_dashes(*(stroke.dashes or (0, None)))
+        else:
+            gc.set_linewidth(0)
+        if (fill is not None) and fill.hatch:
+            gc.set_hatch(fill.hatch)
+            gc.set_hatch_color(fill.hatch_color)
+            gc.set_hatch_linewidth(fill.hatch_width)
+        return gc
+
+    def path(self, vertices, codes, fill, stroke) -> None:
+        gc = self.new_gc(fill, stroke)
+        self.renderer.draw_path(
+            gc,
+            Path(vertices, codes),
+            self.transform,
+            fill.color if fill is not None else None,
+        )
+        gc.restore()
+
+    def shape(self, vertices, codes, fill, stroke) -> None:
+        # Separate fill (without stroke) and silhouette paths, snapped to pixels as
+        # matplotlib snaps them (depending on their line width)
+        if fill is not None:
+            self.path(vertices, codes, fill, None)
+        if stroke is not None:
+            self.path(vertices, codes, None, stroke)
+
+    def text(self, x, y, lines, size, color, family, ha, va, box, params) -> None:
+        # Lay out and draw the text as a matplotlib text artist (which only needs a bare
+        # figure, for its dpi)
+        artist = Text(
+            x * self.dpi / POINTS_PER_INCH,
+            y * self.dpi / POINTS_PER_INCH,
+            "\n".join(lines),
+            transform=IdentityTransform(),
+            **params,
+        )
+        artist.set_figure(Figure(dpi=self.dpi))
+        artist.draw(self.renderer)
+
+    def end(self) -> None:
+        pass
+
+
+def render_raster(
+    scene: Scene,
+    dpi: float = 300,
+    format: Optional[str] = None,
+    tracer: Optional[Tracer] = None,
+) -> Union[np.ndarray, bytes]:
+    """
+    Draw a scene onto an Agg canvas, without creating a matplotlib figure
+
+    Args:
+        scene (Scene): Scene
+        dpi (float, optional): Pixels per inch of the scene's page size. Defaults to 300.
+        format (Optional[str], optional): If provided, encode the image in this format (such as 'png'). Defaults to None.
+        tracer (Optional[Tracer], optional): Records a 'draw' span per group of shapes. Defaults to None.
+
+    Returns:
+        Union[np.ndarray, bytes]: (height, width, 4) RGBA image, or encoded image if 'format' is provided
+    """
+    writer = AggWriter(dpi)
+    scene.draw(writer, tracer)
+    image = np.asarray(writer.renderer.buffer_rgba())
+    return encode_image(image, format, dpi) if format is not None else image
+
+
+def encode_image(image: np.ndarray, format: str = "png", dpi: float = 300) -> bytes:
+    """
+    Encode an RGBA image (such as render_raster()'s output) in a raster format
+    """
+    buffer = io.BytesIO()
+    matplotlib.image.imsave(buffer, image, format=format, dpi=dpi)
+    return buffer.getvalue()
+
+
+def write_vector(
+    scene: Scene, path: str, precision: int = 2, tracer: Optional[Tracer] = None
+) -> None:
+    """
+    Write a scene as an SVG or PDF file (depending on the extension of 'path'), streaming
+    shapes to the file layer by layer in zorder, so that memory use does not grow with the
+    number of shapes
+
+    Args:
+        scene (Scene): Scene
+        path (str): Output path (.svg or .pdf)
+        precision (int, optional): Number of decimals of coordinates (in points). Defaults to 2.
+        tracer (Optional[Tracer], optional): Records a 'draw' span per group of shapes. Defaults to None.
+    """
+    if path.lower().endswith(".svg"):
+        with open(path, "w", encoding="utf-8") as f:
+            scene.draw(SVGWriter(f, precision), tracer)
+    elif path.lower().endswith(".pdf"):
+        with open(path, "wb") as f:
+            scene.draw(PDFWriter(f, precision), tracer)
+    else:
+        raise ValueError(f"Unsupported vector format: {path} (use .svg or .pdf)")
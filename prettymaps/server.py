@@ -0,0 +1,515 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import traceback
+from copy import deepcopy
+from collections import OrderedDict
+from typing import Optional, List
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+from .cli import init_worker as init_batch_worker, parse_query, get_mode
+
+# Output formats and their content types
+FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "pdf": "application/pdf",
+}
+
+# Request fields that are not prettymaps.plot() parameters
+RENDER_FIELDS = ["format", "dpi"]
+
+# plot() parameters that cannot be sent as JSON, or that would write to the server's disk
+FORBIDDEN_PARAMS = [
+    "postprocessing",
+    "fig",
+    "ax",
+    "backup",
+    "vsketch",
+    "save_as",
+    "save_preset",
+    "update_preset",
+    "source",
+    "cache",
+    "geocode_cache",
+    "gazetteer",
+]
+
+# Directory of the presets requests may load (by name)
+PRESETS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "presets")
+
+# plot() parameters that change which layers are fetched
+FETCH_PARAMS = ["combined_fetch", "rotation"]
+
+
+class ServerBusy(Exception):
+    """
+    Raised when a render request arrives while the render queue is full
+    """
+
+
+class LRU(OrderedDict):
+    """
+    Dictionary holding up to 'size' items, evicting the least recently used ones
+    """
+
+    def __init__(self, size: int):
+        super().__init__()
+        self.size = size
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.size:
+            self.popitem(last=False)
+
+
+# Worker state, set by init_worker(): shared plot() parameters, resolved presets and
+# recently fetched (and processed) layers
+_worker_params = {}
+_presets = LRU(64)
+_layers = LRU(8)
+
+
+def init_worker(params: dict, layers_cache_size: int = 8) -> None:
+    """
+    Process pool initializer: resolve the shared data source and caches (see
+    prettymaps.cli.init_worker()), and import prettymaps and create a figure once,
+    so that the first request does not pay for them
+    """
+    init_batch_worker(params)
+
+    from matplotlib import pyplot as plt
+    from . import draw
+
+    plt.close(plt.figure())
+
+    _worker_params.clear()
+    _worker_params.update(params)
+    _presets.clear()
+    _layers.clear()
+    _layers.size = layers_cache_size
+
+
+def preset_names() -> List[str]:
+    """
+    Names of the presets requests may load: those in the presets folder (prettymaps/presets/)
+    """
+    return sorted(
+        file[: -len(".json")]
+        for file in os.listdir(PRESETS_DIRECTORY)
+        if file.endswith(".json")
+    )
+
+
+def resolve_preset(params: dict) -> dict:
+    """
+    Resolve the preset of a request's plot() parameters (once per distinct preset and overrides)
+    """
+    from .draw import manage_presets
+
+    keys = ["preset", "layers", "style", "circle", "radius", "dilate"]
+    key = json.dumps([params.get(k) for k in keys], sort_keys=True, default=str)
+    resolved = _presets.get(key)
+    if resolved is None:
+        layers, style, circle, radius, dilate = manage_presets(
+            params.get("preset", "default"),
+            None,
+            None,
+            params.get("layers", {}),
+            params.get("style", {}),
+            params.get("circle"),
+            params.get("radius"),
+            params.get("dilate"),
+        )
+        resolved = dict(
+            preset=None,
+            layers=layers,
+            style=style,
+            circle=circle,
+            radius=radius,
+            dilate=dilate,
+        )
+        _presets.put(key, resolved)
+    return {**params, **deepcopy(resolved)}
+
+
+def render_request(request: dict) -> bytes:
+    """
+    Render a request in a worker process. Layers fetched for the same query, layers and
+    fetch parameters as a recent request are reused (see prettymaps.plot()'s 'backup')
+
+    Args:
+        request (dict): Request (plot() parameters, plus 'format' and 'dpi')
+
+    Returns:
+        bytes: Rendered map
+    """
+    from matplotlib import pyplot as plt
+    from .draw import plot, Plot
+    from .render import encode_image
+
+    params = resolve_preset(
+        {k: v for k, v in request.items() if k not in RENDER_FIELDS + ["query"]}
+    )
+    query = request["query"]
+    format = request.get("format", "png")
+    mode = get_mode(params, format)
+    if (mode == "raster") and request.get("dpi"):
+        # Draw the image at the requested resolution (matplotlib figures are saved at it)
+        params["dpi"] = request["dpi"]
+
+    # Layers are not kept for tiled plots (their Plot only holds the perimeter)
+    key = None
+    if params.get("tile_size") is None:
+        key = json.dumps(
+            [query]
+            + [params.get(k) for k in ["layers", "circle", "radius", "dilate"]]
+            + [params.get(k) for k in FETCH_PARAMS],
+            sort_keys=True,
+            default=str,
+        )
+
+    result = None
+    try:
+        result = plot(
+            query,
+            **{
+                **_worker_params,
+                **params,
+                "mode": mode,
+                "backup": _layers.get(key) if key is not None else None,
+                "save_as": None,
+                "show": True,
+            },
+        )
+        if key is not None:
+            _layers.put(
+                key, Plot(result.geodataframes, None, None, None, result.geometries)
+            )
+        if mode == "raster":
+            return encode_image(result.image, format, params.get("dpi", 300))
+        buffer = io.BytesIO()
+        result.fig.savefig(buffer, format=format, dpi=request.get("dpi"))
+        return buffer.getvalue()
+    finally:
+        if result is not None and result.fig is not None:
+            plt.close(result.fig)
+        plt.close("all")
+
+
+def parse_request(body: bytes) -> dict:
+    """
+    Parse and validate a render request: a JSON object with a 'query' (address, OSM id or
+    [lat, lon] coordinates), an optional 'format' ('png', 'svg' or 'pdf') and 'dpi', and any
+    other prettymaps.plot() parameter ('preset' must name one of preset_names()). PNG maps are drawn in raster mode unless the request
+    sets 'mode' (see prettymaps.cli.get_mode())
+
+    Raises:
+        ValueError: Invalid request
+    """
+    request = json.loads(body)
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+    if not request.get("query"):
+        raise ValueError("'query' is mandatory")
+    forbidden = sorted(set(request) & set(FORBIDDEN_PARAMS))
+    if forbidden:
+        raise ValueError(f"Parameters {forbidden} are not allowed")
+    # Presets are loaded by name from the presets folder: paths would read any JSON file
+    preset = request.get("preset", "default")
+    if preset is not None and (
+        not isinstance(preset, str) or preset not in preset_names()
+    ):
+        raise ValueError(f"'preset' must be one of {preset_names()}")
+    request.setdefault("format", "png")
+    if request["format"] not in FORMATS:
+        raise ValueError(f"'format' must be one of {list(FORMATS)}")
+    if request.get("mode") not in [None, "matplotlib", "raster"]:
+        raise ValueError("'mode' must be 'matplotlib' or 'raster'")
+    if (request.get("mode") == "raster") and (request["format"] != "png"):
+        raise ValueError("Raster mode only renders 'png' maps")
+
+    query = request["query"]
+    if isinstance(query, list) and len(query) == 2:
+        request["query"] = tuple(query)
+    elif isinstance(query, str):
+        request["query"] = parse_query(query)
+    else:
+        raise ValueError("'query' must be a string or [lat, lon] coordinates")
+    return request
+
+
+class RenderService:
+    """
+    Renders requests with a pool of warm worker processes. Identical requests in flight
+    are rendered once, and at most 'max_pending' distinct requests are queued or running
+    at once (further requests raise ServerBusy). Attributes:
+    - stats: number of rendered, failed, coalesced and rejected requests
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: int = 16,
+        layers_cache_size: int = 8,
+        params: dict = {},
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.layers_cache_size = layers_cache_size
+        self.params = params
+        self.stats = dict(rendered=0, failed=0, coalesced=0, rejected=0)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._in_flight = {}
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_worker,
+            initargs=(self.params, self.layers_cache_size),
+        )
+
+    def submit(self, request: dict) -> Future:
+        """
+        Submit a request (as returned by parse_request()), or join an identical one in flight
+
+        Raises:
+            ServerBusy: 'max_pending' requests are already queued or running
+        """
+        key = json.dumps(request, sort_keys=True, default=str)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            if not self._slots.acquire(blocking=False):
+                self.stats["rejected"] += 1
+                raise ServerBusy()
+            try:
+                future = self._executor.submit(render_request, request)
+            except BrokenProcessPool:
+                # A worker crashed (e.g. killed by the OS): start a new pool
+                self._executor.shutdown(wait=False)
+                self._executor = self._new_executor()
+                future = self._executor.submit(render_request, request)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda future: self._done(key, future))
+        return future
+
+    def _done(self, key: str, future: Future) -> None:
+        with self._lock:
+            del self._in_flight[key]
+            self.stats["failed" if future.exception() else "rendered"] += 1
+        self._slots.release()
+
+    def status(self) -> dict:
+        with self._lock:
+            return dict(
+                workers=self._executor._max_workers,
+                max_pending=self.max_pending,
+                in_flight=len(self._in_flight),
+                **self.stats,
+            )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler: 'POST /render' renders a request (see parse_request()) and returns the map,
+    'GET /status' returns the render service's status
+    """
+
+    # Set by serve()
+    service: RenderService = None
+    timeout_seconds: Optional[float] = None
+
+    def send_json(self, status: int, content: dict, headers: dict = {}) -> None:
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            return self.send_json(404, dict(error="Not found"))
+        self.send_json(200, self.service.status())
+
+    def do_POST(self):
+        if self.path != "/render":
+            return self.send_json(404, dict(error="Not found"))
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = parse_request(self.rfile.read(length))
+        except ValueError as e:
+            return self.send_json(400, dict(error=str(e)))
+
+        start = time.perf_counter()
+        try:
+            content = self.service.submit(request).result(self.timeout_seconds)
+        except ServerBusy:
+            return self.send_json(
+                503, dict(error="Render queue is full"), {"Retry-After": "1"}
+            )
+        except TimeoutError:
+            return self.send_json(504, dict(error="Render timed out"))
+        except (ValueError, KeyError) as e:
+            # Invalid plot() parameters
+            return self.send_json(400, dict(error=str(e)))
+        except Exception as e:
+            # Tracebacks are logged, not sent: they show the server's paths and files
+            self.log_error("Render failed: %r", e)
+            traceback.print_exc(file=sys.stderr)
+            return self.send_json(500, dict(error="Render failed"))
+
+        self.send_response(200)
+        self.send_header("Content-Type", FORMATS[request["format"]])
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("X-Render-Time", f"{time.perf_counter() - start:.3f}")
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: Optional[int] = None,
+    max_pending: int = 16,
+    layers_cache_size: int = 8,
+    timeout: Optional[float] = None,
+    params: dict = {},
+) -> None:
+    """
+    Serve render requests over HTTP until interrupted
+
+    Args:
+        host (str, optional): Host to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on. Defaults to 8000.
+        workers (Optional[int], optional): Number of worker processes. Defaults to None (number of CPUs).
+        max_pending (int, optional): Maximum number of requests queued or running at once. Defaults to 16.
+        layers_cache_size (int, optional): Number of recently fetched maps whose layers each worker keeps in memory. Defaults to 8.
+        timeout (Optional[float], optional): Maximum time a client waits for its map (in seconds). Defaults to None.
+        params (dict, optional): plot() parameters shared by all requests (such as 'source' or 'cache'). Defaults to {}.
+    """
+    service = RenderService(workers, max_pending, layers_cache_size, params)
+    handler = type(
+        "Handler",
+        (RenderHandler,),
+        dict(service=service, timeout_seconds=timeout),
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving prettymaps on http://{host}:{port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="prettymaps-server",
+        description="Serve prettymaps renders over HTTP ('POST /render' with a JSON object of plot() parameters, plus 'format' and 'dpi')",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port (default: 8000)")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=16,
+        help="Maximum number of requests queued or running at once, further requests get a 503 response (default: 16)",
+    )
+    parser.add_argument(
+        "--layers-cache-size",
+        type=int,
+        default=8,
+        help="Number of recently fetched maps whose layers each worker keeps in memory (default: 8)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Maximum time a client waits for its map, in seconds (default: no limit)",
+    )
+    parser.add_argument(
+        "--source", default=None, help="Local .osm/.osm.pbf extract to read data from"
+    )
+    parser.add_argument("--cache", default=None, help="Layer cache directory")
+    parser.add_argument(
+        "--geocode-cache", default=None, help="Geocoding cache (SQLite database path)"
+    )
+    parser.add_argument("--gazetteer", default=None, help="Local gazetteer file")
+    args = parser.parse_args(argv)
+
+    params = {
+        param: value
+        for param, value in dict(
+            source=args.source,
+            cache=args.cache,
+            geocode_cache=args.geocode_cache,
+            gazetteer=args.gazetteer,
+        ).items()
+        if value is not None
+    }
+    serve(
+        args.host,
+        args.port,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        layers_cache_size=args.layers_cache_size,
+        timeout=args.timeout,
+        params=params,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,604 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import json
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import shapely
+from abc import ABC, abstractmethod
+from pathlib import Path
+from geopandas import GeoDataFrame
+from typing import Optional, Union, Tuple, List, Dict
+
+# Same filter used by osmnx's graph_from_polygon() for the "all" network type
+DEFAULT_GRAPH_FILTER = (
+    '["highway"]["area"!~"yes"]["highway"!~"abandoned|construction|no|planned|platform|'
+    'proposed|raceway|razed"]'
+)
+
+
+def parse_tags(tags: Union[str, dict]) -> dict:
+    """
+    Normalize a layer's 'tags' parameter into an osmnx tags dict
+
+    Args:
+        tags (Union[str, dict]): Either a single OSM key or a dict of tags
+
+    Returns:
+        dict: osmnx tags dict
+    """
+    return {tags: True} if type(tags) == str else tags
+
+
+def filter_tags(gdf: GeoDataFrame, tags: Union[str, dict]) -> GeoDataFrame:
+    """
+    Select the features matching at least one of the given tags
+    (same semantics as osmnx's features_from_* tags filter)
+
+    Args:
+        gdf (GeoDataFrame): Input GeoDataFrame, with one column per OSM key
+        tags (Union[str, dict]): osmnx tags dict
+
+    Returns:
+        GeoDataFrame: Matching features
+    """
+    mask = pd.Series(False, index=gdf.index)
+    for key, value in parse_tags(tags).items():
+        if key not in gdf.columns:
+            continue
+        if value is True:
+            mask |= gdf[key].notna()
+        elif isinstance(value, str):
+            mask |= gdf[key] == value
+        elif isinstance(value, list):
+            mask |= gdf[key].isin(value)
+    gdf = gdf[mask]
+    if len(gdf) == 0:
+        return GeoDataFrame(geometry=[], crs=gdf.crs)
+    # Remove columns only used by features from other layers
+    return gdf.dropna(axis="columns", how="all").copy()
+
+
+def parse_custom_filter(custom_filter: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Parse an Overpass QL tag filter (such as '["highway"~"primary|secondary"]')
+    into a list of (key, operator, value) conditions
+
+    Args:
+        custom_filter (str): Overpass QL tag filter
+
+    Returns:
+        List[Tuple[str, str, Optional[str]]]: List of conditions
+    """
+    conditions = re.findall(
+        r'\[\s*"([^"]+)"\s*(?:(!?[=~])\s*"([^"]*)"\s*(?:,\s*i)?)?\s*\]', custom_filter
+    )
+    return [
+        (key, op or "exists", value if op else None) for key, op, value in conditions
+    ]
+
+
+def filter_custom(gdf: GeoDataFrame, custom_filter: Union[str, list]) -> GeoDataFrame:
+    """
+    Select the features matching an Overpass QL tag filter.
+    A list of filters selects the union of their results.
+
+    Args:
+        gdf (GeoDataFrame): Input GeoDataFrame, with one column per OSM key
+        custom_filter (Union[str, list]): Overpass QL tag filter(s)
+
+    Returns:
+        GeoDataFrame: Matching features
+    """
+    filters = custom_filter if isinstance(custom_filter, list) else [custom_filter]
+    mask = pd.Series(False, index=gdf.index)
+    for f in filters:
+        f_mask = pd.Series(True, index=gdf.index)
+        for key, op, value in parse_custom_filter(f):
+            column = (
+                gdf[key].astype("string")
+                if key in gdf.columns
+                else pd.Series(pd.NA, index=gdf.index, dtype="string")
+            )
+            if op == "exists":
+                f_mask &= column.notna()
+            elif op == "=":
+                f_mask &= (column == value).fillna(False)
+            elif op == "!=":
+                f_mask &= (column != value).fillna(True)
+            elif op == "~":
+                f_mask &= column.str.contains(value, regex=True).fillna(False)
+            elif op == "!~":
+                f_mask &= ~column.str.contains(value, regex=True).fillna(False)
+        mask |= f_mask
+    return gdf[mask.astype(bool)]
+
+
+class NoFeaturesError(ValueError):
+    """
+    Raised by data sources when no features match a query
+    """
+
+
+class DataSource(ABC):
+    """
+    Base class for prettymaps data sources.
+    A data source answers the queries issued by prettymaps.fetch:
+    - graph_edges: street network edges (streets, railway, waterway layers)
+    - features: OSM features matching a tags dict
+    - geocode: (lat, lon) point of a query
+    - geocode_to_gdf: boundary polygon of a query (by name or OSM id)
+    graph_edges and features raise NoFeaturesError when nothing matches.
+    """
+
+    def cache_key(self) -> str:
+        # Identifies the data served by this source (used by prettymaps.cache)
+        return type(self).__name__
+
+    @abstractmethod
+    def graph_edges(
+        self, polygon: shapely.Geometry, custom_filter: Optional[str] = None
+    ) -> GeoDataFrame: ...
+
+    @abstractmethod
+    def features(self, polygon: shapely.Geometry, tags: dict) -> GeoDataFrame: ...
+
+    @abstractmethod
+    def geocode(self, query: str) -> Tuple[float, float]: ...
+
+    @abstractmethod
+    def geocode_to_gdf(
+        self, query: str, by_osmid: bool = False, **kwargs
+    ) -> GeoDataFrame: ...
+
+
+class OverpassSource(DataSource):
+    """
+    Data source fetching everything from the OpenStreetMap APIs through osmnx (default)
+    """
+
+    def graph_edges(self, polygon, custom_filter=None):
+        import osmnx as ox
+
+        try:
+            graph = ox.graph_from_polygon(
+                polygon,
+                retain_all=True,
+                custom_filter=custom_filter,
+                truncate_by_edge=True,
+            )
+        except ox._errors.InsufficientResponseError as e:
+            raise NoFeaturesError(str(e)) from e
+        return ox.graph_to_gdfs(graph, nodes=False)
+
+    def features(self, polygon, tags):
+        import osmnx as ox
+
+        try:
+            return ox.features_from_polygon(polygon, tags=parse_tags(tags))
+        except ox._errors.InsufficientResponseError as e:
+            raise NoFeaturesError(str(e)) from e
+
+    def geocode(self, query):
+        import osmnx as ox
+
+        return ox.geocode(query)
+
+    def geocode_to_gdf(self, query, by_osmid=False, **kwargs):
+        import osmnx as ox
+
+        return ox.geocode_to_gdf(query, by_osmid=by_osmid, **kwargs)
+
+
+# Columns of an extract's on-disk index that are not OSM keys: OSM ids, geometries, parsing
+# order and bounding boxes (see ExtractSource)
+INDEX_COLUMNS = [
+    "element_type",
+    "osmid",
+    "geometry",
+    "_position",
+    "_xmin",
+    "_ymin",
+    "_xmax",
+    "_ymax",
+]
+
+
+class ExtractSource(DataSource):
+    """
+    Data source reading from a local .osm / .osm.pbf extract, without network access.
+    The extract is parsed once into an on-disk index (requires pyarrow): a GeoParquet file,
+    next to the extract (or at 'index_path'), holding its features sorted along a Hilbert
+    curve in row groups of 'row_group_size' features, with their bounding boxes. The index
+    is rebuilt when the extract changes.
+
+    Only the index's footer stays in memory: the bounding box and OSM keys of each row group,
+    read from the column statistics. Queries read and decode the row groups they need, so
+    the memory used by a process grows with the area it renders, not with the extract
+    (building the index still parses the whole extract in memory, once). The index only
+    holds plain data, so it is safe to share between processes and users.
+    Attributes:
+    - path: path to the .osm / .osm.pbf extract
+    - index_path: path to the on-disk index
+    - row_group_size: number of features per row group of the index
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        index_path: Optional[str] = None,
+        row_group_size: int = 4096,
+    ):
+        self.path = os.path.abspath(path)
+        self.index_path = index_path or f"{self.path}.prettymaps-index.parquet"
+        self.row_group_size = row_group_size
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> dict:
+        # Layers may be fetched concurrently: load the index only once
+        with self._lock:
+            if self._index is None:
+                self._index = self.load_index()
+        return self._index
+
+    def signature(self) -> Tuple[float, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime, stat.st_size
+
+    def cache_key(self):
+        return f"{type(self).__name__}:{self.path}:{self.signature()}"
+
+    def load_index(self) -> dict:
+        """
+        Read the on-disk index's footer, building the index if it is missing or outdated
+
+        Returns:
+            dict: Extract index (footer metadata, and bounding box and OSM keys of each row group)
+        """
+        import pyarrow.parquet as pq
+
+        try:
+            metadata = pq.read_metadata(self.index_path)
+            meta = json.loads(metadata.metadata[b"prettymaps"])
+            if meta["signature"] == list(self.signature()):
+                return self.read_footer(metadata, meta)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        self.build_index()
+        metadata = pq.read_metadata(self.index_path)
+        return self.read_footer(metadata, json.loads(metadata.metadata[b"prettymaps"]))
+
+    def read_footer(self, metadata, meta: dict) -> dict:
+        """
+        Get the bounding box and OSM keys of each row group of the index from its footer
+
+        Args:
+            metadata (pyarrow.parquet.FileMetaData): Index footer
+            meta (dict): prettymaps metadata of the index (signature and JSON-encoded columns)
+
+        Returns:
+            dict: Extract index
+        """
+        columns = metadata.schema.names
+        row_groups = [metadata.row_group(i) for i in range(metadata.num_row_groups)]
+
+        def statistics(column):
+            j = columns.index(column)
+            return [row_group.column(j).statistics for row_group in row_groups]
+
+        bounds = np.array(
+            [
+                [stats.min for stats in statistics("_xmin")],
+                [stats.min for stats in statistics("_ymin")],
+                [stats.max for stats in statistics("_xmax")],
+                [stats.max for stats in statistics("_ymax")],
+            ],
+            dtype=float,
+        ).reshape(4, -1)
+        # OSM keys: whether each row group has features with that key
+        keys = {
+            column: np.array(
+                [
+                    stats.null_count < row_group.num_rows
+                    for stats, row_group in zip(statistics(column), row_groups)
+                ],
+                dtype=bool,
+            )
+            for column in columns
+            if column not in INDEX_COLUMNS
+        }
+        return dict(
+            metadata=metadata,
+            bounds=bounds.T,
+            keys=keys,
+            json_columns=meta["json_columns"],
+        )
+
+    def build_index(self) -> None:
+        """
+        Parse the extract and write its on-disk index
+        """
+        import osmnx as ox
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.path.endswith(".pbf"):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                xml_path = os.path.join(tmp_dir, "extract.osm")
+                pbf_to_xml(self.path, xml_path)
+                gdf = ox.features_from_xml(xml_path)
+        else:
+            gdf = ox.features_from_xml(self.path)
+        gdf = gdf.reset_index()
+        # Keep the parsing order, used to sort query results
+        gdf["_position"] = np.arange(len(gdf))
+
+        # Sort along a Hilbert curve, so that each row group covers a small area
+        gdf = gdf.iloc[
+            np.argsort(gdf.geometry.hilbert_distance().values, kind="stable")
+        ]
+        bounds = shapely.bounds(gdf.geometry.values)
+
+        # Parquet columns must have a single type: JSON-encode object columns that hold
+        # anything other than strings (such as the nodes of ways)
+        df = pd.DataFrame(gdf)
+        df["geometry"] = shapely.to_wkb(gdf.geometry.values)
+        json_columns = []
+        for column in df.columns:
+            if column == "geometry" or df[column].dtype != object:
+                continue
+            if not all(isinstance(x, str) for x in df[column].dropna()):
+                df[column] = df[column].map(
+                    lambda x: (
+                        json.dumps(x, default=str) if x is not None and x == x else None
+                    )
+                )
+                json_columns.append(column)
+        for i, column in enumerate(["_xmin", "_ymin", "_xmax", "_ymax"]):
+            df[column] = bounds[:, i]
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        geo = dict(
+            version="1.0.0",
+            primary_column="geometry",
+            columns=dict(
+                geometry=dict(
+                    encoding="WKB",
+                    geometry_types=sorted(gdf.geom_type.unique()),
+                    bbox=list(gdf.total_bounds),
+                )
+            ),
+        )
+        meta = dict(signature=list(self.signature()), json_columns=json_columns)
+        table = table.replace_schema_metadata(
+            {
+                **table.schema.metadata,
+                b"geo": json.dumps(geo),
+                b"prettymaps": json.dumps(meta),
+            }
+        )
+
+        # Write to a temporary file first so that concurrent readers never see a partial index
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path))
+        os.close(fd)
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size)
+        os.replace(tmp_path, self.index_path)
+
+    def to_gdf(self, table) -> GeoDataFrame:
+        """
+        Decode features read from the index
+
+        Args:
+            table (pyarrow.Table): Index rows
+
+        Returns:
+            GeoDataFrame: Features (in EPSG:4326), in the extract's order
+        """
+        df = table.to_pandas().sort_values("_position")
+        # Missing tags are NaN, as in osmnx's results
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].where(df[column].notna(), np.nan)
+        df["geometry"] = shapely.from_wkb(df["geometry"].values)
+        for column in self.index["json_columns"]:
+            df[column] = df[column].map(
+                lambda x: json.loads(x) if isinstance(x, str) else x
+            )
+        return GeoDataFrame(
+            df.drop(
+                columns=[c for c in INDEX_COLUMNS if c.startswith("_")]
+            ).reset_index(drop=True),
+            geometry="geometry",
+            crs=4326,
+        )
+
+    def query(self, polygon, keys: Optional[List[str]] = None) -> GeoDataFrame:
+        """
+        Get the indexed features intersecting 'polygon', optionally restricted to the ones
+        having at least one of the OSM keys in 'keys'
+
+        Args:
+            polygon (shapely.Geometry): Query geometry
+            keys (Optional[List[str]], optional): OSM keys. Defaults to None.
+
+        Returns:
+            GeoDataFrame: Features (in EPSG:4326)
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.compute as pc
+
+        index = self.index
+        xmin, ymin, xmax, ymax = polygon.bounds
+        bounds = index["bounds"]
+        # Read row groups whose bounding box intersects the query's (and having the keys)
+        selected = (
+            (bounds[:, 0] <= xmax)
+            & (bounds[:, 2] >= xmin)
+            & (bounds[:, 1] <= ymax)
+            & (bounds[:, 3] >= ymin)
+        )
+        if keys is not None:
+            selected &= np.any(
+                [index["keys"][key] for key in keys if key in index["keys"]]
+                + [np.zeros(len(bounds), dtype=bool)],
+                axis=0,
+            )
+        if selected.any():
+            table = pq.ParquetFile(
+                self.index_path, metadata=index["metadata"]
+            ).read_row_groups(np.flatnonzero(selected).tolist())
+        else:
+            table = index["metadata"].schema.to_arrow_schema().empty_table()
+
+        # Keep features whose bounding box intersects the query's (and having the keys)
+        mask = pc.and_(
+            pc.and_(
+                pc.less_equal(table["_xmin"], xmax),
+                pc.greater_equal(table["_xmax"], xmin),
+            ),
+            pc.and_(
+                pc.less_equal(table["_ymin"], ymax),
+                pc.greater_equal(table["_ymax"], ymin),
+            ),
+        )
+        if keys is not None:
+            has_keys = pa.array(np.zeros(len(table), dtype=bool))
+            for key in keys:
+                if key in index["keys"]:
+                    has_keys = pc.or_(has_keys, pc.is_valid(table[key]))
+            mask = pc.and_(mask, has_keys)
+        gdf = self.to_gdf(table.filter(mask))
+        # Keep features intersecting the query
+        gdf = gdf[shapely.intersects(gdf.geometry.values, polygon)]
+        if len(gdf) > 0:
+            gdf = gdf.dropna(axis="columns", how="all")
+        return gdf.set_index(["element_type", "osmid"])
+
+    def graph_edges(self, polygon, custom_filter=None):
+        # Restrict to ways having at least one of the filters' keys
+        filters = (
+            [DEFAULT_GRAPH_FILTER]
+            if custom_filter is None
+            else custom_filter if isinstance(custom_filter, list) else [custom_filter]
+        )
+        keys = list({key for f in filters for key, _, _ in parse_custom_filter(f)})
+        gdf = self.query(polygon, keys)
+        gdf = gdf[gdf.geom_type.isin(["LineString", "MultiLineString"])]
+        gdf = filter_custom(gdf, filters)
+        if len(gdf) == 0:
+            raise NoFeaturesError(f"No graph edges found in {self.path}")
+        return gdf
+
+    def features(self, polygon, tags):
+        tags = parse_tags(tags)
+        gdf = filter_tags(self.query(polygon, list(tags)), tags)
+        if len(gdf) == 0:
+            raise NoFeaturesError(f"No features matching {tags} found in {self.path}")
+        return gdf
+
+    def lookup(self, query: str, by_osmid: bool = False) -> GeoDataFrame:
+        """
+        Find a feature by OSM id ("R123", "W456", "N789") or by exact name
+
+        Args:
+            query (str): OSM id or name
+            by_osmid (bool, optional): Whether 'query' is an OSM id. Defaults to False.
+
+        Returns:
+            GeoDataFrame: Matching feature (in EPSG:4326)
+        """
+        import pyarrow.parquet as pq
+
+        element_types = {"N": "node", "W": "way", "R": "relation"}
+        if by_osmid:
+            if not re.fullmatch("[NWR][0-9]+", query):
+                raise ValueError(f"OSM id {query} not found in {self.path}")
+            filters = [
+                ("element_type", "=", element_types[query[0]]),
+                ("osmid", "=", int(query[1:])),
+            ]
+        elif "name" in self.index["keys"]:
+            filters = [("name", "=", query)]
+        else:
+            raise ValueError(f"{query} not found in {self.path}")
+        matches = self.to_gdf(pq.read_table(self.index_path, filters=filters))
+        if len(matches) == 0:
+            raise ValueError(
+                f"{'OSM id ' if by_osmid else ''}{query} not found in {self.path}"
+            )
+        # Prefer (multi)polygon results, as osmnx's geocode_to_gdf() does
+        polygons = matches[matches.geom_type.isin(["Polygon", "MultiPolygon"])]
+        matches = polygons if len(polygons) > 0 else matches
+        return matches.iloc[[0]].reset_index(drop=True)
+
+    def geocode(self, query):
+        point = self.lookup(query).geometry.iloc[0].representative_point()
+        return point.y, point.x
+
+    def geocode_to_gdf(self, query, by_osmid=False, **kwargs):
+        return self.lookup(query, by_osmid=by_osmid)
+
+
+def pbf_to_xml(pbf_path: str, xml_path: str) -> None:
+    """
+    Convert a .osm.pbf extract into OSM XML (requires pyosmium)
+
+    Args:
+        pbf_path (str): Input .osm.pbf path
+        xml_path (str): Output .osm path
+    """
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError(
+            'Install pyosmium with "pip install osmium" to read .osm.pbf extracts.'
+        )
+
+    writer = osmium.SimpleWriter(xml_path)
+    try:
+        osmium.apply(pbf_path, writer)
+    finally:
+        writer.close()
+
+
+# Data sources are kept alive so that each extract is indexed only once per process
+_sources = {}
+
+
+def get_source(source: Optional[Union[str, Path, DataSource]] = None) -> DataSource:
+    """
+    Resolve a data source
+
+    Args:
+        source (Optional[Union[str, Path, DataSource]], optional): None (OpenStreetMap APIs), path to a local extract or a DataSource object. Defaults to None.
+
+    Returns:
+        DataSource: Data source
+    """
+    if isinstance(source, DataSource):
+        return source
+    key = None if source is None else os.path.abspath(source)
+    if key not in _sources:
+        _sources[key] = OverpassSource() if source is None else ExtractSource(source)
+    return _sources[key]
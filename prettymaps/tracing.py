@@ -0,0 +1,149 @@
+"""
+Prettymaps - A minimal Python library to draw pretty maps from OpenStreetMap Data
+Copyright (C) 2021 Marcelo Prates
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import time
+import warnings
+import threading
+import numpy as np
+import pandas as pd
+import shapely
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+# Span fields (in Plot.timings column order)
+SPAN_FIELDS = [
+    "stage",
+    "layer",
+    "start",
+    "duration",
+    "features",
+    "vertices",
+    "artists",
+]
+
+# Hooks called with every span of every plot (see add_hook())
+_hooks: List[Callable[[dict], None]] = []
+
+
+def add_hook(hook: Callable[[dict], None]) -> None:
+    """
+    Register a hook called with every timing span (a dict with 'stage', 'layer', 'start',
+    'duration', 'features', 'vertices' and 'artists' keys) as soon as it ends, for every plot.
+    Hooks may be called from several threads at once (layers are fetched in parallel).
+    Exceptions raised by hooks are reported as warnings, and do not interrupt the plot
+
+    Args:
+        hook (Callable[[dict], None]): Hook
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[dict], None]) -> None:
+    """
+    Unregister a hook registered with add_hook()
+    """
+    _hooks.remove(hook)
+
+
+class Tracer:
+    """
+    Records timing spans of a plot's stages (and of each layer within stages). Attributes:
+    - spans: recorded spans, in the order they ended
+    - hook: optional hook called with each span as soon as it ends (in addition to add_hook()'s)
+    - counters: whether spans are given counters ('features', 'vertices', 'artists'), which
+      callers only compute when set
+    """
+
+    def __init__(
+        self, hook: Optional[Callable[[dict], None]] = None, counters: bool = True
+    ):
+        self.spans = []
+        self.hook = hook
+        self.counters = counters
+        self.t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str, layer: Optional[str] = None, **attrs) -> Iterator[dict]:
+        """
+        Time the enclosed block. The yielded span can be updated with counters
+        ('features', 'vertices', 'artists') or any other attribute
+
+        Args:
+            stage (str): Stage name
+            layer (Optional[str], optional): Layer name. Defaults to None.
+        """
+        span = dict(
+            stage=stage,
+            layer=layer,
+            start=time.perf_counter() - self.t0,
+            duration=None,
+            features=None,
+            vertices=None,
+            artists=None,
+            **attrs,
+        )
+        try:
+            yield span
+        finally:
+            span["duration"] = time.perf_counter() - self.t0 - span["start"]
+            with self._lock:
+                self.spans.append(span)
+            # A failing hook must neither abort the plot nor hide the stage's own error
+            for hook in ([self.hook] if self.hook is not None else []) + _hooks:
+                try:
+                    hook(span)
+                except Exception as e:
+                    warnings.warn(f"Tracing hook {hook!r} failed: {e!r}")
+
+    def dataframe(self) -> pd.DataFrame:
+        """
+        Recorded spans as a DataFrame (one row per span, sorted by start time)
+        """
+        with self._lock:
+            spans = list(self.spans)
+        df = pd.DataFrame(spans)
+        for field in SPAN_FIELDS:
+            if field not in df.columns:
+                df[field] = None
+        df = df[SPAN_FIELDS + [c for c in df.columns if c not in SPAN_FIELDS]]
+        return df.sort_values("start", kind="stable").reset_index(drop=True)
+
+
+def get_tracer(tracer: Optional[Tracer] = None) -> Tracer:
+    # Spans of untraced calls are recorded by a throwaway tracer (global hooks still get them),
+    # whose counters are skipped unless there are global hooks
+    return tracer if tracer is not None else Tracer(counters=bool(_hooks))
+
+
+def count_vertices(geometries) -> int:
+    """
+    Number of vertices of a GeoDataFrame, a geometry (array) or a (lines, widths) tuple
+    """
+    if isinstance(geometries, tuple):
+        geometries = geometries[0]
+    if hasattr(geometries, "geometry"):
+        geometries = geometries.geometry.values
+    return int(np.sum(shapely.get_num_coordinates(np.asarray(geometries))))
+
+
+def count_artists(ax) -> int:
+    """
+    Number of artists (patches, lines and collections) of a matplotlib axis
+    """
+    return len(ax.patches) + len(ax.lines) + len(ax.collections)
@@ -26,5 +26,11 @@ setup(
     ],
     package_dir={"prettymaps": "prettymaps"},
     package_data={"prettymaps": ["presets/*.json"]},
+    entry_points={
+        "console_scripts": [
+            "prettymaps=prettymaps.cli:main",
+            "prettymaps-server=prettymaps.server:main",
+        ]
+    },
     python_requires=">=3.11",
 )